@@ -1,16 +1,83 @@
+import os
+import hashlib
+import itertools
+import json
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 import pandas as pd
 import numpy as np
 from sklearn.preprocessing import StandardScaler
 from sklearn.pipeline import Pipeline
 from sklearn.linear_model import LogisticRegression
-from sklearn.ensemble import RandomForestClassifier, VotingClassifier, StackingClassifier
-from xgboost import XGBClassifier
-from lightgbm import LGBMClassifier
-from sklearn.model_selection import cross_val_score, StratifiedKFold, GridSearchCV
-from sklearn.base import BaseEstimator, ClassifierMixin
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import StratifiedKFold
+from sklearn.base import ClassifierMixin, clone
+from sklearn.utils import _safe_indexing
+from sklearn.utils.metaestimators import _BaseComposition
+from scipy.optimize import minimize
+from .utils import params_signature, data_signature
 
 
-class CustomVoter(BaseEstimator, ClassifierMixin):
+def _fit_estimator(model, X, y):
+    """Fit one base estimator and return it (a worker process returns a fitted copy)."""
+    return model.fit(X, y)
+
+
+def _predict_proba_estimator(model, X):
+    return model.predict_proba(X)
+
+
+def _vote(probas, normalized_weights):
+    """Weighted average of the (n_estimators, n_samples, n_classes) probabilities of the base estimators."""
+    weights_reshaped = normalized_weights.reshape(-1, 1, 1)
+    weighted_probas = probas * weights_reshaped
+    return np.sum(weighted_probas, axis=0)
+
+
+def _meta_features(probas):
+    """Input of the stacked meta-learner: P(class 1) of every estimator (binary) or all the probabilities."""
+    if probas.shape[2] == 2:
+        return probas[:, :, 1].T
+    return probas.transpose(1, 0, 2).reshape(probas.shape[1], -1)
+
+
+# Estimators whose n_jobs has no effect (deprecated for LogisticRegression since scikit-learn 1.8)
+_NO_THREADS = (LogisticRegression,)
+
+
+def _with_threads(model, n_threads):
+    """
+    A clone of an estimator or pipeline with every n_jobs parameter (e.g.
+    model__n_jobs) set to n_threads, skipping the _NO_THREADS estimators; the
+    model itself when it has no such parameter.
+    """
+    params = model.get_params()
+    keys = []
+    for key in params:
+        if key == 'n_jobs' or key.endswith('__n_jobs'):
+            owner = model if key == 'n_jobs' else params[key[:-len('__n_jobs')]]
+            if not isinstance(owner, _NO_THREADS):
+                keys.append(key)
+    if not keys:
+        return model
+    return clone(model).set_params(**{key: n_threads for key in keys})
+
+
+def _view_columns(X, view):
+    """Column names of X[view] (FeatureViews, MultiIndex DataFrame or dict of DataFrames), None if unknown."""
+    if hasattr(X, 'columns') and callable(X.columns):
+        return list(X.columns(view))
+    if isinstance(X, pd.DataFrame):
+        return list(X[view].columns)
+    if isinstance(X, dict) and isinstance(X[view], pd.DataFrame):
+        return list(X[view].columns)
+    return None
+
+
+# Feature view of each estimator of the notebook ensemble, used when CustomVoter gets no views
+DEFAULT_VIEWS = {'lr_pca': 'main', 'rf': 'tree', 'xgb': 'tree'}
+
+
+class CustomVoter(_BaseComposition, ClassifierMixin):
     """
     Custom ensemble voting classifier that handles different feature sets for different models.
     
@@ -23,22 +90,112 @@ class CustomVoter(BaseEstimator, ClassifierMixin):
         List of base estimators to use for voting
     weights : array-like, optional
         Weights for each estimator. If None, equal weights are used
+    n_jobs : int, optional
+        Number of base estimators fitted / queried concurrently (1 = one after
+        another, -1 = all of them at once)
+    thread_budget : int or dict, optional
+        Threads of each base estimator (its n_jobs parameters, e.g. the
+        model__n_jobs of the RF and XGB pipelines): a dict name -> threads, or
+        a total number of threads split evenly between the estimators running
+        at the same time. If None, the CPU count is split when n_jobs != 1 and
+        the estimators are left as they are otherwise. The budget is applied to
+        clones of the estimators (the ones passed are not modified) and skips
+        LogisticRegression, whose n_jobs has no effect
+    backend : str, optional
+        'threads' (default, the base models release the GIL while they fit)
+        or 'processes'
+    views : dict, optional
+        Feature view of each estimator, name -> view name. X is anything that
+        returns a view with X[view]: a FeatureViews (one matrix for all the
+        views), a DataFrame with MultiIndex columns (view, column) or a dict of
+        DataFrames. If None, DEFAULT_VIEWS is used. The columns of every view
+        are recorded at fit and predictions on views with other columns (or
+        the same columns in another order) raise a ValueError
+    final_estimator : estimator, optional
+        Stacking mode: a meta-learner trained on the out-of-fold probabilities
+        of the base estimators replaces the weighted vote (weights are ignored)
+    stack_cv : int or 'prefit', optional
+        Folds of the out-of-fold probabilities the meta-learner is trained on
+        (default 5); 'prefit' uses final_estimator as it is, e.g. fitted by
+        OOFCache.fit_final_estimator
     """
     
-    def __init__(self, estimators, weights=None):
+    def __init__(self, estimators, weights=None, n_jobs=1, thread_budget=None, backend='threads', views=None,
+                 final_estimator=None, stack_cv=5):
         self.estimators = estimators
         self.weights = weights
+        self.views = views
+        self.final_estimator = final_estimator
+        self.stack_cv = stack_cv
+        self.n_jobs = n_jobs
+        self.thread_budget = thread_budget
+        self.backend = backend
         self.normalized_weights_ = None
         self.trained_models_ = {}
 
+    def _view_inputs(self, X_combined_fold, fit=False):
+        """
+        Input of every estimator, by name: X_combined_fold[its view].
+
+        With fit=True the columns of every view are recorded in view_columns_,
+        otherwise they are checked against them (the base estimators are
+        fitted on bare arrays, which do not check the column names).
+        """
+        views = DEFAULT_VIEWS if self.views is None else self.views
+        inputs = {}
+        if fit:
+            self.view_columns_ = {}
+        for name, _ in self.estimators:
+            if name not in views:
+                raise ValueError(f"No feature view for estimator '{name}': add it to the views parameter")
+            columns = _view_columns(X_combined_fold, views[name])
+            if fit:
+                self.view_columns_[name] = columns
+            else:
+                expected = getattr(self, 'view_columns_', {}).get(name)
+                if expected is not None and columns is not None and columns != expected:
+                    raise ValueError(f"The columns of view '{views[name]}' of estimator '{name}' differ from the "
+                                     f"ones it was fitted on (names or order)")
+            inputs[name] = X_combined_fold[views[name]]
+        return inputs
+
+    def _n_workers(self):
+        if self.n_jobs is None or self.n_jobs < 0:
+            return len(self.estimators)
+        return max(1, min(self.n_jobs, len(self.estimators)))
+
+    def _map(self, fn, tasks):
+        """Run fn on every (model, X[, y]) task, concurrently if n_jobs != 1; results in task order."""
+        n_workers = self._n_workers()
+        if n_workers <= 1:
+            return [fn(*task) for task in tasks]
+        if self.backend not in ('threads', 'processes'):
+            raise ValueError(f"backend must be 'threads' or 'processes', got '{self.backend}'")
+        executor = ThreadPoolExecutor if self.backend == 'threads' else ProcessPoolExecutor
+        with executor(max_workers=n_workers) as pool:
+            return list(pool.map(fn, *zip(*tasks)))
+
+    def _thread_budget(self):
+        """Threads of every estimator, by name (empty: leave the estimators as they are)."""
+        if isinstance(self.thread_budget, dict):
+            return dict(self.thread_budget)
+        total = self.thread_budget
+        if total is None:
+            if self._n_workers() <= 1:
+                return {}
+            total = os.cpu_count() or 1
+        per_estimator = max(1, total // self._n_workers())
+        return {name: per_estimator for name, _ in self.estimators}
+
     def fit(self, X_combined_fold, y_fold):
         """
         Fit the ensemble model on the training data.
         
         Parameters:
         -----------
-        X_combined_fold : dict
-            Dictionary containing different feature representations:
+        X_combined_fold : FeatureViews, MultiIndex DataFrame or dict
+            Different feature representations, selected with X_combined_fold[view]
+            (see the views parameter), e.g.:
             - 'main': Features for logistic regression with PCA
             - 'tree': Features for tree-based models
         y_fold : array-like
@@ -55,15 +212,26 @@ class CustomVoter(BaseEstimator, ClassifierMixin):
         else:
             self.normalized_weights_ = np.array(self.weights) / np.sum(self.weights)
         
+        self.final_estimator_ = None
+        if self.final_estimator is not None:
+            if self.stack_cv == 'prefit':
+                self.final_estimator_ = self.final_estimator
+            else:
+                cv = StratifiedKFold(n_splits=self.stack_cv, shuffle=True, random_state=0)
+                probas, _ = out_of_fold_probas(self, X_combined_fold, y_fold, cv)
+                self.final_estimator_ = clone(self.final_estimator).fit(_meta_features(probas), y_fold)
+
         self.trained_models_ = {} 
-        X_data_map = {
-            'lr_pca': X_combined_fold['main'],
-            'rf': X_combined_fold['tree'],
-            'xgb': X_combined_fold['tree']
-        }
+        X_data_map = self._view_inputs(X_combined_fold, fit=True)
         
-        for name, model_pipeline in self.estimators:
-            fitted_model = model_pipeline.fit(X_data_map[name], y_fold)
+        # the thread budget goes to clones, the estimators passed by the caller keep their parameters
+        budget = self._thread_budget()
+        models = [(name, _with_threads(model_pipeline, budget[name]) if name in budget else model_pipeline)
+                  for name, model_pipeline in self.estimators]
+
+        tasks = [(model_pipeline, X_data_map[name], y_fold) for name, model_pipeline in models]
+        fitted_models = self._map(_fit_estimator, tasks)
+        for (name, _), fitted_model in zip(self.estimators, fitted_models):
             self.trained_models_[name] = fitted_model
             
         return self
@@ -74,39 +242,42 @@ class CustomVoter(BaseEstimator, ClassifierMixin):
         
         Parameters:
         -----------
-        X_combined_fold : dict
-            Dictionary containing different feature representations
+        X_combined_fold : FeatureViews, MultiIndex DataFrame or dict
+            Different feature representations, selected with X_combined_fold[view]
             
         Returns:
         --------
         array-like : Weighted average class probabilities
         """
-        all_probas = []
-        X_data_map = {
-            'lr_pca': X_combined_fold['main'],
-            'rf': X_combined_fold['tree'],
-            'xgb': X_combined_fold['tree']
-        }
-        
-        for name, model in self.trained_models_.items():
-            probas = model.predict_proba(X_data_map[name])
-            all_probas.append(probas)
-            
-        probas_array = np.array(all_probas)
-        weights_reshaped = self.normalized_weights_.reshape(-1, 1, 1)
-        weighted_probas = probas_array * weights_reshaped
-        final_probas = np.sum(weighted_probas, axis=0)
+        probas_array = self.base_probas(X_combined_fold)
+        if getattr(self, 'final_estimator_', None) is not None:
+            return self.final_estimator_.predict_proba(_meta_features(probas_array))
+        final_probas = _vote(probas_array, self.normalized_weights_)
         
         return final_probas
 
+    def base_probas(self, X_combined_fold):
+        """
+        Class probabilities of every base estimator.
+
+        Returns:
+        --------
+        np.ndarray : (n_estimators, n_samples, n_classes), in the order of estimators
+        """
+        X_data_map = self._view_inputs(X_combined_fold)
+        
+        tasks = [(model, X_data_map[name]) for name, model in self.trained_models_.items()]
+        all_probas = self._map(_predict_proba_estimator, tasks)
+        return np.array(all_probas)
+
     def predict(self, X_combined_fold):
         """
         Predict class labels using the ensemble model.
         
         Parameters:
         -----------
-        X_combined_fold : dict
-            Dictionary containing different feature representations
+        X_combined_fold : FeatureViews, MultiIndex DataFrame or dict
+            Different feature representations, selected with X_combined_fold[view]
             
         Returns:
         --------
@@ -122,16 +293,16 @@ class CustomVoter(BaseEstimator, ClassifierMixin):
         Parameters:
         -----------
         deep : bool, optional
-            Whether to return parameters of sub-estimators
+            Whether to return parameters of sub-estimators: every base
+            estimator by name and its parameters as <name>__<param> (e.g.
+            rf__model__max_depth), and those of final_estimator as
+            final_estimator__<param>, as VotingClassifier does
             
         Returns:
         --------
         dict : Parameter names and their values
         """
-        return {
-            "estimators": self.estimators,
-            "weights": self.weights
-        }
+        return self._get_params('estimators', deep=deep)
 
     def set_params(self, **params):
         """
@@ -140,16 +311,166 @@ class CustomVoter(BaseEstimator, ClassifierMixin):
         Parameters:
         -----------
         **params : dict
-            Parameter names and their new values
+            Parameter names and their new values, nested ones included (see
+            get_params); a base estimator is replaced with <name>=estimator
             
         Returns:
         --------
         self : CustomVoter
             Updated estimator instance
         """
-        if 'estimators' in params:
-            self.estimators = params['estimators']
-        if 'weights' in params:
-            self.weights = params['weights']
+        return self._set_params('estimators', **params)
+
+
+def out_of_fold_probas(voter, X, y, cv):
+    """
+    Out-of-fold class probabilities of every base estimator of a CustomVoter.
+
+    For every (train, test) split of cv a clone of voter is fitted on the train
+    rows and its base estimators predict the test rows.
+
+    Returns:
+    --------
+    tuple : (probas, folds), probas of shape (n_estimators, n_samples, n_classes)
+            and the fold index of every sample
+    """
+    y = np.asarray(y)
+    voter = clone(voter).set_params(final_estimator=None)  # only the base estimators are needed
+    probas = None
+    folds = np.full(len(y), -1)
+    for k, (train, test) in enumerate(cv.split(np.zeros((len(y), 1)), y)):
+        fold_voter = clone(voter).fit(_safe_indexing(X, train), y[train])
+        fold_probas = fold_voter.base_probas(_safe_indexing(X, test))
+        if probas is None:
+            probas = np.zeros((fold_probas.shape[0], len(y), fold_probas.shape[2]))
+        probas[:, test] = fold_probas
+        folds[test] = k
+    return probas, folds
+
+
+def _simplex_grid(n_estimators, step):
+    """Every weight vector with entries in multiples of step summing to 1."""
+    n_steps = int(round(1 / step))
+    for cuts in itertools.combinations_with_replacement(range(n_steps + 1), n_estimators - 1):
+        bounds = (0,) + cuts + (n_steps,)
+        yield np.diff(bounds) / n_steps
+
+
+class OOFCache:
+    """
+    Out-of-fold predictions of the base estimators of a CustomVoter, computed once.
+
+    fit(X, y) runs the same StratifiedKFold as evaluate_model (shuffle,
+    random_state=0) and stores the out-of-fold predict_proba of every base
+    estimator; with a path the matrices are saved to an .npz file and loaded
+    back when the estimators, views, data and folds are the same. Every
+    re-weighting is then a weighted sum of the cached matrices:
+
+    - score(weights): per-fold accuracy (mean, std) of the weighted vote, the
+      numbers evaluate_model returns for CustomVoter(weights=weights);
+    - optimize_weights: best weights on a grid over the simplex (accuracy) or
+      with scipy (log loss);
+    - stacking_score / fit_final_estimator: a meta-learner trained on the
+      out-of-fold probabilities (see CustomVoter final_estimator).
+
+    Parameters:
+    -----------
+    voter : CustomVoter
+        Ensemble whose base estimators are cross-validated (its weights are ignored)
+    cv_splits : int, optional
+        Number of folds
+    path : str, optional
+        .npz file of the cache
+    """
+
+    def __init__(self, voter, cv_splits=10, path=None):
+        self.voter = voter
+        self.cv_splits = cv_splits
+        self.path = path
+
+    def _key(self, X, y):
+        """Hash of the estimators, views, data and folds."""
+        return hashlib.sha256(json.dumps({
+            'estimators': params_signature(self.voter.estimators), 'views': self.voter.views,
+            'cv_splits': self.cv_splits, 'data': data_signature(X, y)
+        }, sort_keys=True, default=str).encode()).hexdigest()
+
+    def fit(self, X, y):
+        """Compute the out-of-fold probabilities, or load them from path if they are cached."""
+        self.y_ = np.asarray(y)
+        self.names_ = [name for name, _ in self.voter.estimators]
+        key = self._key(X, self.y_)
+        if self.path is not None and os.path.exists(self.path):
+            with np.load(self.path) as archive:
+                if str(archive['key']) == key:
+                    self.probas_, self.folds_ = archive['probas'], archive['folds']
+                    return self
+
+        cv = StratifiedKFold(n_splits=self.cv_splits, shuffle=True, random_state=0)
+        self.probas_, self.folds_ = out_of_fold_probas(self.voter, X, self.y_, cv)
+        if self.path is not None:
+            tmp_path = f'{self.path}.tmp.npz'
+            np.savez(tmp_path, key=key, probas=self.probas_, folds=self.folds_)
+            os.replace(tmp_path, self.path)
         return self
-    
\ No newline at end of file
+
+    def vote_proba(self, weights):
+        """Out-of-fold probabilities of the weighted vote."""
+        return _vote(self.probas_, np.array(weights) / np.sum(weights))
+
+    def _fold_scores(self, predictions):
+        correct = predictions == self.y_
+        return np.array([correct[self.folds_ == k].mean() for k in range(self.cv_splits)])
+
+    def score(self, weights):
+        """(mean, std) of the per-fold accuracy of the weighted vote, as evaluate_model."""
+        scores = self._fold_scores(np.argmax(self.vote_proba(weights), axis=1))
+        return np.mean(scores), np.std(scores)
+
+    def optimize_weights(self, method='grid', step=0.05):
+        """
+        Best weights of the vote on the cached predictions.
+
+        method='grid' tries every weight vector with entries in multiples of
+        step and keeps the best mean accuracy; method='scipy' minimizes the log
+        loss of the vote over the simplex (SLSQP).
+
+        Returns:
+        --------
+        tuple : (weights, mean accuracy, std)
+        """
+        if method == 'grid':
+            best = None
+            for weights in _simplex_grid(len(self.names_), step):
+                mean, std = self.score(weights)
+                if best is None or mean > best[1]:
+                    best = (weights, mean, std)
+            return best
+        if method != 'scipy':
+            raise ValueError(f"method must be 'grid' or 'scipy', got '{method}'")
+
+        n = len(self.names_)
+        true_probas = self.probas_[:, np.arange(len(self.y_)), self.y_.astype(int)]
+
+        def log_loss(weights):
+            return -np.mean(np.log(np.clip(weights @ true_probas, 1e-15, None)))
+
+        result = minimize(log_loss, np.ones(n) / n, method='SLSQP', bounds=[(0, 1)] * n,
+                          constraints={'type': 'eq', 'fun': lambda weights: np.sum(weights) - 1})
+        weights = np.clip(result.x, 0, None)
+        weights = weights / weights.sum()
+        return (weights,) + self.score(weights)
+
+    def stacking_score(self, final_estimator):
+        """(mean, std) per-fold accuracy of a meta-learner cross-validated on the cached out-of-fold probabilities."""
+        meta = _meta_features(self.probas_)
+        scores = []
+        for k in range(self.cv_splits):
+            train, test = self.folds_ != k, self.folds_ == k
+            model = clone(final_estimator).fit(meta[train], self.y_[train])
+            scores.append(np.mean(model.predict(meta[test]) == self.y_[test]))
+        return np.mean(scores), np.std(scores)
+
+    def fit_final_estimator(self, final_estimator):
+        """A meta-learner fitted on all the cached out-of-fold probabilities (for CustomVoter(stack_cv='prefit'))."""
+        return clone(final_estimator).fit(_meta_features(self.probas_), self.y_)
@@ -4,13 +4,15 @@ from .logistic_regression import (
     create_model_pipeline,
     create_model_pipeline_PCA,
     create_model_pipeline_poly,
-
+    to_sparse_matrix
 )
 
 from .utils import (
     train_and_predict, 
     perform_grid_search, 
     evaluate_model,
+    params_signature,
+    data_signature,
     top_correlated_features,
     make_submission
 
@@ -23,15 +25,21 @@ from .Rf_and_xgb import (
 )
 
 from .Heterogeneus_ensembles import (
-    CustomVoter
+    CustomVoter,
+    DEFAULT_VIEWS,
+    OOFCache,
+    out_of_fold_probas
 )
 
+from .feature_views import FeatureViews
+
 __all__ = [
     # Logistic_Regression
     'plot_pca_variance',
     'create_model_pipeline',
     'create_model_pipeline_PCA',
     'create_model_pipeline_poly',
+    'to_sparse_matrix',
 
     # random_forest and xgboost
     'create_model_pipeline_rf',
@@ -41,11 +49,17 @@ __all__ = [
 
     # heterogeneus_ensembles
     'CustomVoter',
+    'DEFAULT_VIEWS',
+    'OOFCache',
+    'out_of_fold_probas',
+    'FeatureViews',
 
     #utils
     'train_and_predict',
     'perform_grid_search',
     'evaluate_model',
+    'params_signature',
+    'data_signature',
     'top_correlated_features',
     'make_submission'
 ]
\ No newline at end of file
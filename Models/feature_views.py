@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+
+
+class FeatureViews:
+    """
+    Several feature views of the same battles stored in one contiguous matrix.
+
+    The notebook feeds CustomVoter a MultiIndex DataFrame (pd.concat of the
+    'main' and 'tree' frames), which stores the columns shared by the views
+    twice and copies them again every time a view is sliced out. Here every
+    distinct column is stored once in a single column-major (Fortran order)
+    float64 matrix. A column is shared when several views have a column with
+    the same name, which must then hold the same values (ValueError
+    otherwise), so the layout depends only on the column names: train and test
+    views built from frames with the same columns have the same layout.
+
+    views[name] returns the columns of a view in the order of the frame it was
+    built from, so that it matches X[name] of the MultiIndex frame. The columns
+    are stored in order of first appearance, which makes the first view a
+    zero-copy, still contiguous NumPy slice; a view whose columns are not
+    stored contiguously and in its order is gathered with an index array (a
+    copy), see is_contiguous.
+
+    Rows are selected with views[rows, ...] (the way scikit-learn indexes the
+    folds of cross_val_score): the result shares the layout and copies only the
+    selected rows of the matrix once.
+
+    Args:
+        views: dict view name -> DataFrame, all with the same rows in the same order.
+    """
+
+    def __init__(self, views: dict):
+        frames = {name: df for name, df in views.items()}
+        lengths = {len(df) for df in frames.values()}
+        if len(lengths) > 1:
+            raise ValueError(f"The views must have the same number of rows, got {sorted(lengths)}")
+        names = list(frames)
+
+        # distinct columns by name, in order of first appearance
+        stored = {}      # column name -> (position, view that stored it)
+        for name in names:
+            for column in frames[name].columns:
+                if column not in stored:
+                    stored[column] = (len(stored), name)
+                elif not np.array_equal(frames[stored[column][1]][column].to_numpy(dtype=np.float64),
+                                        frames[name][column].to_numpy(dtype=np.float64), equal_nan=True):
+                    raise ValueError(f"Column '{column}' has different values in views "
+                                     f"'{stored[column][1]}' and '{name}': rename it in one of them")
+
+        self.values = np.empty((lengths.pop() if lengths else 0, len(stored)), dtype=np.float64, order='F')
+        for column, (position, name) in stored.items():
+            self.values[:, position] = frames[name][column].to_numpy(dtype=np.float64)
+        self.stored_columns = list(stored)
+        self.view_names = names
+        self._layout = {}
+        for name in names:
+            positions = np.array([stored[column][0] for column in frames[name].columns], dtype=np.intp)
+            contiguous = len(positions) > 0 and np.array_equal(positions, np.arange(positions[0], positions[0] + len(positions)))
+            self._layout[name] = slice(positions[0], positions[-1] + 1) if contiguous else positions
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> 'FeatureViews':
+        """Build the views from a DataFrame with MultiIndex columns (view, column), as built in the notebook."""
+        return cls({name: df[name] for name in df.columns.get_level_values(0).unique()})
+
+    def _with_values(self, values: np.ndarray) -> 'FeatureViews':
+        views = object.__new__(FeatureViews)
+        views.values = values
+        views.stored_columns = self.stored_columns
+        views.view_names = self.view_names
+        views._layout = self._layout
+        return views
+
+    @property
+    def shape(self) -> tuple:
+        """(n_rows, number of distinct stored columns)."""
+        return self.values.shape
+
+    def __len__(self) -> int:
+        return self.values.shape[0]
+
+    @property
+    def nbytes(self) -> int:
+        return self.values.nbytes
+
+    def __getitem__(self, key):
+        """views['main'] -> the view as an (n_rows, n_columns) array; views[rows, ...] -> the selected rows."""
+        if isinstance(key, str):
+            if key not in self._layout:
+                raise KeyError(f"Unknown view '{key}', available: {self.view_names}")
+            return self.values[:, self._layout[key]]
+        rows = key[0] if isinstance(key, tuple) else key
+        return self._with_values(np.asfortranarray(self.values[rows]))
+
+    def columns(self, name: str) -> list[str]:
+        """Column names of a view, in the order of views[name] (the order of the frame of the view)."""
+        layout = self._layout[name]
+        positions = range(layout.start, layout.stop) if isinstance(layout, slice) else layout
+        return [self.stored_columns[p] for p in positions]
+
+    def is_contiguous(self, name: str) -> bool:
+        """True if views[name] is a zero-copy slice of the matrix."""
+        return isinstance(self._layout[name], slice)
+
+    def frame(self, name: str) -> pd.DataFrame:
+        """A view as a DataFrame (a copy), e.g. to inspect it or to match get_feature_importance."""
+        return pd.DataFrame(self[name], columns=self.columns(name))
@@ -3,8 +3,10 @@ import numpy as np
 import matplotlib.pyplot as plt
 from sklearn.decomposition import PCA
 from sklearn.linear_model import LogisticRegression
-from sklearn.preprocessing import StandardScaler
+from sklearn.preprocessing import StandardScaler, FunctionTransformer
 from sklearn.pipeline import Pipeline
+from sklearn.compose import ColumnTransformer
+from scipy import sparse as sp
 from sklearn.model_selection import cross_val_score, StratifiedKFold
 from sklearn.model_selection import GridSearchCV
 from sklearn.metrics import confusion_matrix, ConfusionMatrixDisplay
@@ -40,7 +42,75 @@ def plot_pca_variance(X):
     return evr_cumsum
 
 
-def create_model_pipeline_PCA(n_components=11, c_value=1.0, random_state=0):
+def to_sparse_matrix(X):
+    """
+    Converts the features to a scipy.sparse CSR matrix, keeping the column order.
+
+    The pd.SparseDtype columns (e.g. pokemon_encoding(one_hot=True, sparse=True))
+    are converted from their stored entries, never densified; the dense
+    columns become CSR blocks. A scipy.sparse input is returned as CSR.
+
+    Args:
+        X (pd.DataFrame | scipy.sparse matrix | np.ndarray): The input features.
+
+    Returns:
+        scipy.sparse.csr_matrix: The features, as float64.
+    """
+    if sp.issparse(X):
+        return sp.csr_matrix(X, dtype=np.float64)
+    if not isinstance(X, pd.DataFrame):
+        return sp.csr_matrix(np.asarray(X, dtype=np.float64))
+
+    is_sparse = np.array([isinstance(dtype, pd.SparseDtype) for dtype in X.dtypes])
+    blocks, order = [], []
+    if (~is_sparse).any():
+        blocks.append(sp.csr_matrix(X.loc[:, ~is_sparse].to_numpy(dtype=np.float64)))
+        order.extend(np.flatnonzero(~is_sparse))
+    if is_sparse.any():
+        blocks.append(X.loc[:, is_sparse].sparse.to_coo().astype(np.float64))
+        order.extend(np.flatnonzero(is_sparse))
+    matrix = sp.hstack(blocks, format='csr')
+    # back to the column order of X
+    return matrix[:, np.argsort(order)]
+
+
+def _dense_columns(X):
+    """Columns of X that are stored dense (none of a scipy.sparse matrix)."""
+    if sp.issparse(X):
+        return []
+    if isinstance(X, pd.DataFrame):
+        return [c for c, dtype in X.dtypes.items() if not isinstance(dtype, pd.SparseDtype)]
+    return list(range(X.shape[1]))
+
+
+def _sparse_columns(X):
+    """Columns of X that are stored sparse (all the columns of a scipy.sparse matrix)."""
+    if sp.issparse(X):
+        return list(range(X.shape[1]))
+    if isinstance(X, pd.DataFrame):
+        return [c for c, dtype in X.dtypes.items() if isinstance(dtype, pd.SparseDtype)]
+    return []
+
+
+def _sparse_steps():
+    """
+    First step of a linear pipeline on sparse input: the dense columns are
+    standardized as in the dense pipelines, the sparse ones are converted to
+    CSR and only scaled to unit variance (centering would densify them).
+    The output is the CSR hstack of the two blocks, dense columns first.
+    """
+    return [
+        ('scaler', ColumnTransformer([
+            ('dense', StandardScaler(), _dense_columns),
+            ('sparse', Pipeline([
+                ('to_sparse', FunctionTransformer(to_sparse_matrix, accept_sparse=True)),
+                ('scaler', StandardScaler(with_mean=False)),
+            ]), _sparse_columns),
+        ], sparse_threshold=1.0)),
+    ]
+
+
+def create_model_pipeline_PCA(n_components=11, c_value=1.0, random_state=0, sparse=False):
     """
     Creates a scikit-learn pipeline that bundles preprocessing and the model.
 
@@ -49,20 +119,33 @@ def create_model_pipeline_PCA(n_components=11, c_value=1.0, random_state=0):
     2. Perform PCA, reducing to `n_components`.
     3. Fit a Logistic Regression model.
 
+    With sparse=True the input (DataFrame with sparse columns or scipy.sparse
+    matrix) is never densified: the dense columns are standardized, the sparse
+    ones only scaled (see _sparse_steps) and PCA centers the CSR matrix
+    implicitly (svd_solver='covariance_eigh'), so the components are the
+    same as with dense input.
+
     Args:
         n_components (int): The number of principal components to keep.
         random_state (int): A random state for reproducibility.
+        sparse (bool): Accept sparse input without densifying it.
 
     Returns:
         sklearn.pipeline.Pipeline: The unfitted model pipeline.
     """
     
     # Create a list of (name, transformer) tuples
-    steps = [
-        ('scaler', StandardScaler()),
-        ('pca', PCA(n_components=n_components, random_state=random_state)),
-        ('model', LogisticRegression(C=c_value, random_state=random_state))
-    ]
+    if sparse:
+        steps = _sparse_steps() + [
+            ('pca', PCA(n_components=n_components, svd_solver='covariance_eigh', random_state=random_state)),
+            ('model', LogisticRegression(C=c_value, random_state=random_state))
+        ]
+    else:
+        steps = [
+            ('scaler', StandardScaler()),
+            ('pca', PCA(n_components=n_components, random_state=random_state)),
+            ('model', LogisticRegression(C=c_value, random_state=random_state))
+        ]
     
     # Create the pipeline
     pipeline = Pipeline(steps)
@@ -70,7 +153,7 @@ def create_model_pipeline_PCA(n_components=11, c_value=1.0, random_state=0):
     return pipeline
 
 
-def create_model_pipeline(c_value=1.0, random_state=0):
+def create_model_pipeline(c_value=1.0, random_state=0, sparse=False):
     """
     Creates a scikit-learn pipeline that bundles preprocessing and the model.
 
@@ -78,18 +161,28 @@ def create_model_pipeline(c_value=1.0, random_state=0):
     1. Scale the data using StandardScaler.
     2. Fit a Logistic Regression model.
 
+    With sparse=True the input (DataFrame with sparse columns or scipy.sparse
+    matrix) is never densified: the dense columns are standardized, the sparse
+    ones only scaled (see _sparse_steps). The unpenalized intercept absorbs
+    the missing shift, so the model is the same as with dense input (up to
+    the solver tolerance).
+
     Args:
         random_state (int): A random state for reproducibility.
+        sparse (bool): Accept sparse input without densifying it.
 
     Returns:
         sklearn.pipeline.Pipeline: The unfitted model pipeline.
     """
     
     # Create a list of (name, transformer) tuples
-    steps = [
-        ('scaler', StandardScaler()),
-        ('model', LogisticRegression(C=c_value,random_state=random_state))
-    ]
+    if sparse:
+        steps = _sparse_steps() + [('model', LogisticRegression(C=c_value, random_state=random_state))]
+    else:
+        steps = [
+            ('scaler', StandardScaler()),
+            ('model', LogisticRegression(C=c_value,random_state=random_state))
+        ]
     
     # Create the pipeline
     pipeline = Pipeline(steps)
@@ -97,7 +190,7 @@ def create_model_pipeline(c_value=1.0, random_state=0):
     return pipeline
 
 
-def create_model_pipeline_poly(c_value=1.0, degree=2, max_iter=1000, random_state=0):
+def create_model_pipeline_poly(c_value=1.0, degree=2, max_iter=1000, random_state=0, sparse=False):
     """
     Creates a scikit-learn pipeline that bundles preprocessing and the model.
 
@@ -106,8 +199,16 @@ def create_model_pipeline_poly(c_value=1.0, degree=2, max_iter=1000, random_stat
     2. Generate polynomial features.
     3. Fit a Logistic Regression model.
 
+    With sparse=True the input (DataFrame with sparse columns or scipy.sparse
+    matrix) is never densified: the dense columns are standardized, the sparse
+    ones only scaled (see _sparse_steps) and the polynomial features are
+    computed on the CSR matrix. The products of uncentered columns are not a
+    shift of the centered ones, so this is a different model from the dense
+    pipeline (same features, differently regularized).
+
     Args:
         random_state (int): A random state for reproducibility.
+        sparse (bool): Accept sparse input without densifying it.
 
     Returns:
         sklearn.pipeline.Pipeline: The unfitted model pipeline.
@@ -117,11 +218,17 @@ def create_model_pipeline_poly(c_value=1.0, degree=2, max_iter=1000, random_stat
 
 
     # Create a list of (name, transformer) tuples
-    steps = [
-        ('scaler', StandardScaler()),
-        ('poly_features', PolynomialFeatures(degree=degree, include_bias=False)),
-        ('model', LogisticRegression(C=c_value, random_state=random_state, max_iter=max_iter))
-    ]
+    if sparse:
+        steps = _sparse_steps() + [
+            ('poly_features', PolynomialFeatures(degree=degree, include_bias=False)),
+            ('model', LogisticRegression(C=c_value, random_state=random_state, max_iter=max_iter))
+        ]
+    else:
+        steps = [
+            ('scaler', StandardScaler()),
+            ('poly_features', PolynomialFeatures(degree=degree, include_bias=False)),
+            ('model', LogisticRegression(C=c_value, random_state=random_state, max_iter=max_iter))
+        ]
     
     # Create the pipeline
     pipeline = Pipeline(steps)
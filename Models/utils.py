@@ -1,13 +1,26 @@
+import os
+import time
+import json
+import hashlib
+import tracemalloc
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.metrics import get_scorer
+from sklearn.utils import _safe_indexing
 from sklearn.decomposition import PCA
 from sklearn.linear_model import LogisticRegression
 from sklearn.preprocessing import StandardScaler
 from sklearn.pipeline import Pipeline
-from sklearn.model_selection import cross_val_score, StratifiedKFold
-from sklearn.model_selection import GridSearchCV
+from sklearn.model_selection import StratifiedKFold
+from sklearn.model_selection import GridSearchCV, ParameterGrid
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401, enables HalvingGridSearchCV
+from sklearn.model_selection import HalvingGridSearchCV
 from sklearn.metrics import confusion_matrix, ConfusionMatrixDisplay
+from .feature_views import FeatureViews
+
 
 def train_and_predict(pipeline, X_train, Y_train, X_test, test_battle_ids):
     """
@@ -38,63 +51,323 @@ def train_and_predict(pipeline, X_train, Y_train, X_test, test_battle_ids):
     return submission
 
 
-def perform_grid_search(pipeline, param_grid, X_train, Y_train, cv_splits=5):
+def _fit_and_score(pipeline, X_train, Y_train, train, test):
+    """Accuracy of the pipeline fitted on the train rows and scored on the test rows."""
+    pipeline.fit(_safe_indexing(X_train, train), _safe_indexing(Y_train, train))
+    return get_scorer('accuracy')(pipeline, _safe_indexing(X_train, test), _safe_indexing(Y_train, test))
+
+
+def _score_candidates(pipeline, candidates, X_train, Y_train, splits, n_jobs):
+    """Accuracy of every candidate (params dict) on every (train, test) split: list of score lists."""
+    tasks = [(i, train, test) for i in range(len(candidates)) for train, test in splits]
+    results = Parallel(n_jobs=n_jobs)(
+        delayed(_fit_and_score)(clone(pipeline).set_params(**candidates[i]), X_train, Y_train, train, test)
+        for i, train, test in tasks)
+    scores = [[] for _ in candidates]
+    for (i, _, _), score in zip(tasks, results):
+        scores[i].append(score)
+    return scores
+
+
+def _pruned_search(pipeline, param_grid, X_train, Y_train, cv, prune_after, prune_margin, n_jobs):
+    """
+    Grid search that scores every configuration on the first prune_after folds,
+    drops the ones whose mean accuracy is more than prune_margin below the best,
+    and runs the remaining folds only for the survivors.
+
+    Returns (best params, best mean accuracy, its std, number of fits).
+    """
+    candidates = list(ParameterGrid(param_grid))
+    splits = list(cv.split(X_train, Y_train))
+    scores = _score_candidates(pipeline, candidates, X_train, Y_train, splits[:prune_after], n_jobs)
+    best = max(np.mean(candidate_scores) for candidate_scores in scores)
+    alive = [i for i in range(len(candidates)) if np.mean(scores[i]) >= best - prune_margin]
+    print(f"Pruned {len(candidates) - len(alive)} of {len(candidates)} candidates after {prune_after} folds")
+
+    rest = _score_candidates(pipeline, [candidates[i] for i in alive], X_train, Y_train, splits[prune_after:], n_jobs)
+    for i, candidate_scores in zip(alive, rest):
+        scores[i].extend(candidate_scores)
+    n_fits = len(candidates) * prune_after + len(alive) * (len(splits) - prune_after)
+
+    # highest mean accuracy, first candidate in grid order on ties (as GridSearchCV)
+    best_index = max(alive, key=lambda i: (np.mean(scores[i]), -i))
+    return candidates[best_index], np.mean(scores[best_index]), np.std(scores[best_index]), n_fits
+
+
+def _halving_min_resources(param_grid, n_samples, cv_splits, factor):
+    """
+    First-round samples of the halving search: the 'exhaust' value of
+    HalvingGridSearchCV (the last round uses about all the samples), raised so
+    that the training folds of the first round have 1.5 times the largest
+    n_components of the grid (PCA cannot fit fewer samples than components).
+    """
+    n_candidates = len(ParameterGrid(param_grid))
+    n_rounds = 1 + int(np.floor(np.log(n_candidates) / np.log(factor) + 1e-9))
+    exhaust = n_samples // factor ** (n_rounds - 1)
+    components = [value for grid in (param_grid if isinstance(param_grid, list) else [param_grid])
+                  for key, values in grid.items() if key.endswith('n_components')
+                  for value in values if isinstance(value, (int, np.integer))]
+    needed = int(np.ceil(1.5 * max(components, default=0) * cv_splits / (cv_splits - 1)))
+    return min(n_samples, max(exhaust, needed, 2 * cv_splits * 2))
+
+
+def _halving_search(pipeline, param_grid, X_train, Y_train, cv, factor, halving_resource, min_resources,
+                    aggressive_elimination, n_jobs):
+    """
+    Successive halving (HalvingGridSearchCV). The best configuration is the
+    best of the last round (as HalvingGridSearchCV.best_index_), with the
+    cross-validation accuracy of that round, which uses n_resources_[-1]
+    samples (about all of them with the default min_resources).
+
+    Returns (best params, best mean accuracy, its std, number of fits, fit cost
+    in full-data fits).
+    """
+    n_samples = len(Y_train)
+    cv_splits = cv.get_n_splits()
+    if min_resources is None:
+        min_resources = _halving_min_resources(param_grid, n_samples, cv_splits, factor) \
+            if halving_resource == 'n_samples' else 'exhaust'
+    grid_search = HalvingGridSearchCV(
+        estimator=pipeline,
+        param_grid=param_grid,
+        scoring='accuracy',
+        cv=cv,
+        factor=factor,
+        resource=halving_resource,
+        min_resources=min_resources,
+        max_resources='auto' if halving_resource == 'n_samples' else pipeline.get_params()[halving_resource],
+        aggressive_elimination=aggressive_elimination,
+        refit=False,
+        random_state=0,
+        n_jobs=n_jobs,
+        verbose=1
+    )
+    grid_search.fit(X_train, Y_train)
+
+    results = grid_search.cv_results_
+    n_fits = len(results['params']) * cv_splits
+    full = n_samples if halving_resource == 'n_samples' else grid_search.max_resources_
+    fit_cost = float(np.sum(results['n_resources'])) * cv_splits / full
+
+    best = grid_search.best_index_
+    return results['params'][best], results['mean_test_score'][best], results['std_test_score'][best], n_fits, fit_cost
+
+
+def perform_grid_search(pipeline, param_grid, X_train, Y_train, cv_splits=5, search='grid', factor=3,
+                        halving_resource='n_samples', min_resources=None, aggressive_elimination=False,
+                        prune_after=2, prune_margin=0.01, return_report=False):
     """
     Performs a grid search to find the best hyperparameters for the pipeline.
 
+    search selects the strategy:
+    - 'grid': exhaustive GridSearchCV, every configuration on every fold;
+    - 'halving': successive halving (HalvingGridSearchCV): all the configurations
+      start with min_resources of halving_resource (the training samples, or
+      an integer parameter such as 'model__n_estimators', up to its value in
+      the pipeline) and only the best
+      1 / factor of them go on to the next round with factor times more; the
+      best configuration of the last round wins. Every configuration is fitted
+      at least once per fold and the survivors again in every round, so halving
+      makes more fits than 'grid', on subsets: it only lowers the fit cost (in
+      full-data fits) when the first rounds are much smaller than the data, and
+      its small first rounds are noisy, which makes it useful on large training
+      sets only. Use 'prune' to cut the number of fits;
+    - 'prune': every configuration runs on the first prune_after folds, those
+      more than prune_margin (accuracy) below the best are dropped, the
+      others run on the remaining folds.
+    The best score is a cross-validation accuracy on all the samples for 'grid'
+    and 'prune', and on the samples of the last round for 'halving'; the best
+    pipeline is refitted on all the data in every mode.
+
     Args:
         pipeline (sklearn.pipeline.Pipeline): The base pipeline to tune.
         param_grid (dict): The dictionary of parameters to search.
         X_train (pd.DataFrame): The training features.
         Y_train (pd.Series or np.array): The training target.
         cv_splits (int): Number of cross-validation splits.
+        search (str): 'grid', 'halving' or 'prune'.
+        factor (int): Halving: fraction of configurations kept at every round (1 / factor).
+        halving_resource (str): Halving: 'n_samples' or an integer parameter of the pipeline.
+        min_resources (int or str): Halving: resource of the first round (int, 'exhaust' or 'smallest',
+            see HalvingGridSearchCV). If None, the 'exhaust' value raised to fit the largest PCA n_components.
+        aggressive_elimination (bool): Halving: eliminate candidates at min_resources until the last round
+            has at most factor of them (see HalvingGridSearchCV).
+        prune_after (int): Prune: folds run by every configuration before pruning (1 <= prune_after < cv_splits).
+        prune_margin (float): Prune: accuracy margin below the best after which a configuration is dropped.
+        return_report (bool): Also return a dict with best_params, best_score, best_std, n_fits, fit_cost and wall_s.
 
     Returns:
-        sklearn.pipeline.Pipeline: The best-performing pipeline found.
+        sklearn.pipeline.Pipeline: The best-performing pipeline found
+        (and the report with return_report=True).
     """
     cv = StratifiedKFold(n_splits=cv_splits, shuffle=True, random_state=0)
-    
-    grid_search = GridSearchCV(
-        estimator=pipeline,
-        param_grid=param_grid,
-        scoring='accuracy',
-        cv=cv,
-        n_jobs=-1,
-        verbose=1
-    )
-    
-    grid_search.fit(X_train, Y_train)
-    
-    best_index = grid_search.best_index_
-    best_std = grid_search.cv_results_['std_test_score'][best_index]
+    start = time.perf_counter()
+
+    if search == 'prune':
+        if not 1 <= prune_after < cv_splits:
+            raise ValueError(f"prune_after must be between 1 and cv_splits - 1 ({cv_splits - 1}), got {prune_after}")
+        best_params, best_score, best_std, n_fits = _pruned_search(pipeline, param_grid, X_train, Y_train, cv,
+                                                                   prune_after, prune_margin, n_jobs=-1)
+        fit_cost = n_fits
+        best_estimator = clone(pipeline).set_params(**best_params).fit(X_train, Y_train)
+    elif search == 'halving':
+        best_params, best_score, best_std, n_fits, fit_cost = _halving_search(
+            pipeline, param_grid, X_train, Y_train, cv, factor, halving_resource, min_resources,
+            aggressive_elimination, n_jobs=-1)
+        best_estimator = clone(pipeline).set_params(**best_params).fit(X_train, Y_train)
+    elif search == 'grid':
+        grid_search = GridSearchCV(
+            estimator=pipeline,
+            param_grid=param_grid,
+            scoring='accuracy',
+            cv=cv,
+            n_jobs=-1,
+            verbose=1
+        )
+        grid_search.fit(X_train, Y_train)
+
+        best_params, best_score = grid_search.best_params_, grid_search.best_score_
+        best_std = grid_search.cv_results_['std_test_score'][grid_search.best_index_]
+        n_fits = fit_cost = len(grid_search.cv_results_['params']) * cv_splits
+        best_estimator = grid_search.best_estimator_
+    else:
+        raise ValueError(f"search must be 'grid', 'halving' or 'prune', got '{search}'")
+    wall_s = time.perf_counter() - start
 
     print("\nGrid Search Complete.")
-    print(f"Best parameters found: {grid_search.best_params_}")
-    print(f"Best cross-validation accuracy: {grid_search.best_score_:.8f}")
+    print(f"Best parameters found: {best_params}")
+    print(f"Best cross-validation accuracy: {best_score:.8f}")
     print(f"Best CV accuracy std dev: {best_std:.8f}")
+    print(f"Total fits: {n_fits} ({fit_cost:.1f} full-data fits), wall time: {wall_s:.2f} s")
     
     
-    return grid_search.best_estimator_
+    if return_report:
+        return best_estimator, {'best_params': best_params, 'best_score': best_score, 'best_std': best_std,
+                                'n_fits': n_fits, 'fit_cost': fit_cost, 'wall_s': wall_s}
+    return best_estimator
 
 
-def evaluate_model(pipeline, X_train, Y_train, cv_splits=5):
+def params_signature(estimator):
+    """
+    JSON-serializable description of an estimator: its class and parameters,
+    nested estimators (pipeline steps, CustomVoter estimators) included.
+    """
+    if hasattr(estimator, 'get_params') and not isinstance(estimator, type):
+        return {'class': type(estimator).__name__,
+                'params': {k: params_signature(v) for k, v in estimator.get_params(deep=False).items()}}
+    if isinstance(estimator, (list, tuple)):
+        return [params_signature(v) for v in estimator]
+    if isinstance(estimator, dict):
+        return {str(k): params_signature(v) for k, v in estimator.items()}
+    if estimator is None or isinstance(estimator, (bool, int, float, str)):
+        return estimator
+    return repr(estimator)
+
+
+def data_signature(X, y) -> str:
+    """Hash of the features (DataFrame, FeatureViews or array) and of the target."""
+    digest = hashlib.sha256()
+    if isinstance(X, FeatureViews):
+        digest.update(np.ascontiguousarray(X.values).tobytes())
+        digest.update(json.dumps({name: X.columns(name) for name in X.view_names}, default=str).encode())
+    elif isinstance(X, pd.DataFrame):
+        digest.update(pd.util.hash_pandas_object(X, index=False).to_numpy().tobytes())
+        digest.update(str(list(X.columns)).encode())
+    else:
+        digest.update(np.ascontiguousarray(X).tobytes())
+    digest.update(np.ascontiguousarray(y).tobytes())
+    return digest.hexdigest()
+
+
+def _run_fold(pipeline, X_train, Y_train, train, test, fold, trace_memory, checkpoint_path):
+    """Fit and score one fold; the record is written to checkpoint_path (if any) as soon as it is done."""
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    pipeline.fit(_safe_indexing(X_train, train), _safe_indexing(Y_train, train))
+    fit_s = time.perf_counter() - start
+    start = time.perf_counter()
+    score = get_scorer('accuracy')(pipeline, _safe_indexing(X_train, test), _safe_indexing(Y_train, test))
+    score_s = time.perf_counter() - start
+    peak_mem_mb = None
+    if trace_memory:
+        peak_mem_mb = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+
+    record = {'fold': fold, 'accuracy': float(score), 'fit_s': fit_s, 'score_s': score_s, 'peak_mem_mb': peak_mem_mb,
+              'n_train': len(train), 'n_test': len(test)}
+    if checkpoint_path is not None:
+        tmp_path = f'{checkpoint_path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(record, f)
+        os.replace(tmp_path, checkpoint_path)
+    return record
+
+
+def evaluate_model(pipeline, X_train, Y_train, cv_splits=5, n_jobs=1, backend='loky', checkpoint_dir=None,
+                   trace_memory=False, return_folds=False):
     """
     Evaluates the model using cross-validation.
 
+    The folds are the same as before (StratifiedKFold, shuffle, random_state=0)
+    and the scores equal those of cross_val_score. Every fold runs on a clone of
+    the pipeline, in parallel with n_jobs > 1 (or -1 for all the cores).
+
+    With checkpoint_dir the record of every completed fold is saved there as
+    soon as the fold ends, under a key made of the pipeline parameters, the
+    data hash and the folds; running the same evaluation again only computes
+    the folds that are missing (e.g. after the process died mid-run).
+
     Args:
         pipeline (sklearn.pipeline.Pipeline): The model pipeline to evaluate.
         X (pd.DataFrame): The features.
         y (pd.Series or np.array): The target.
         cv_splits (int): Number of cross-validation splits.     
+        n_jobs (int): Number of folds evaluated in parallel.
+        backend (str): joblib backend of the parallel folds ('loky', 'threading' or 'multiprocessing').
+        checkpoint_dir (str): Folder of the fold checkpoints (None: no checkpoints).
+        trace_memory (bool): Measure the peak memory traced by tracemalloc during each fold (slower;
+                             with the 'threading' backend the folds running at the same time are mixed).
+        return_folds (bool): Also return the per-fold records.
     Returns:
-        The mean +_ std_dev in cross-validation accuracy.
+        The mean +_ std_dev in cross-validation accuracy; with return_folds=True also a DataFrame with
+        one row per fold: accuracy, fit_s, score_s, peak_mem_mb, n_train, n_test and resumed (True if
+        read from a checkpoint).
     """
 
     cv = StratifiedKFold(n_splits=cv_splits, shuffle=True, random_state=0)
-    scores = cross_val_score(pipeline, X_train, Y_train, cv=cv, scoring='accuracy')
+    splits = list(cv.split(X_train, Y_train))
+
+    folder = None
+    records = {}
+    if checkpoint_dir is not None:
+        key = hashlib.sha256(json.dumps({
+            'pipeline': params_signature(pipeline), 'data': data_signature(X_train, Y_train),
+            'cv': {'n_splits': cv_splits, 'shuffle': True, 'random_state': 0}
+        }, sort_keys=True, default=str).encode()).hexdigest()[:16]
+        folder = os.path.join(checkpoint_dir, key)
+        os.makedirs(folder, exist_ok=True)
+        for fold in range(cv_splits):
+            path = os.path.join(folder, f'fold_{fold}.json')
+            if os.path.exists(path):
+                with open(path, 'r') as f:
+                    records[fold] = {**json.load(f), 'resumed': True}
+
+    missing = [fold for fold in range(cv_splits) if fold not in records]
+    computed = Parallel(n_jobs=n_jobs, backend=backend)(
+        delayed(_run_fold)(clone(pipeline), X_train, Y_train, splits[fold][0], splits[fold][1], fold, trace_memory,
+                           None if folder is None else os.path.join(folder, f'fold_{fold}.json'))
+        for fold in missing)
+    for record in computed:
+        records[record['fold']] = {**record, 'resumed': False}
+
+    folds = pd.DataFrame([records[fold] for fold in range(cv_splits)])
+    scores = folds['accuracy'].to_numpy()
     mean_score = np.mean(scores)
     std_dev = np.std(scores)
     
+    if return_folds:
+        return mean_score, std_dev, folds
     return mean_score, std_dev
 
 
@@ -0,0 +1,77 @@
+# benchmarks/bench_custom_voter.py
+"""
+Benchmark of CustomVoter with its base estimators fitted one after another
+(n_jobs=1) and concurrently (n_jobs=-1, threads and processes), on the
+MultiIndex DataFrame of the notebook and on FeatureViews.
+
+On synthetic battles (main + tree views, as in the notebook), checks that the
+predicted probabilities do not depend on n_jobs or on the input container,
+then times fit + predict_proba and a cross-validation run with evaluate_model
+for every setting.
+
+Usage:
+    python -m benchmarks.bench_custom_voter [--battles 5000] [--folds 3]
+"""
+import argparse
+import os
+import time
+import numpy as np
+import pandas as pd
+from feature_engineering import generate_features
+from Models import (create_model_pipeline_PCA, create_model_pipeline_rf, create_model_pipeline_xgb, CustomVoter, FeatureViews,
+                    evaluate_model)
+from .synthetic import generate_battles
+
+SETTINGS = [
+    ('serial', 'frame', dict(n_jobs=1)),
+    ('threads', 'frame', dict(n_jobs=-1, backend='threads')),
+    ('processes', 'frame', dict(n_jobs=-1, backend='processes')),
+    ('serial', 'views', dict(n_jobs=1)),
+    ('threads', 'views', dict(n_jobs=-1, backend='threads')),
+]
+
+
+def make_voter(**kwargs) -> CustomVoter:
+    return CustomVoter(estimators=[
+        ('lr_pca', create_model_pipeline_PCA(n_components=20, c_value=0.1)),
+        ('rf', create_model_pipeline_rf(n_estimators=200, max_depth=12)),
+        ('xgb', create_model_pipeline_xgb(n_estimators=200, max_depth=4, learning_rate=0.05)),
+    ], weights=[0.4, 0.4, 0.2], **kwargs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--battles', type=int, default=5000)
+    parser.add_argument('--folds', type=int, default=3)
+    args = parser.parse_args()
+
+    battles = list(generate_battles(args.battles))
+    linear = generate_features(battles, flag_test=False, tree=False)
+    tree = generate_features(battles, flag_test=False, tree=True)
+    y = linear['player_won'].astype(int).to_numpy()
+    views = FeatureViews({'main': linear.drop(columns=['player_won', 'battle_id']),
+                          'tree': tree.drop(columns=['player_won', 'battle_id'])})
+    # same column order as the views, so that both inputs give the same models
+    frame = pd.concat({name: views.frame(name) for name in ('main', 'tree')}, axis=1)
+    inputs = {'frame': frame, 'views': views}
+
+    print(f'{args.battles} battles, {os.cpu_count()} CPUs, '
+          f'frame {frame.memory_usage().sum() / 2**20:.1f} MiB, views {views.nbytes / 2**20:.1f} MiB')
+    reference = None
+    for label, container, kwargs in SETTINGS:
+        X = inputs[container]
+        start = time.perf_counter()
+        probas = make_voter(**kwargs).fit(X, y).predict_proba(X)
+        t_fit = time.perf_counter() - start
+        if reference is None:
+            reference = probas
+        np.testing.assert_allclose(probas, reference, rtol=0, atol=1e-12)
+
+        start = time.perf_counter()
+        mean, std = evaluate_model(make_voter(**kwargs), X, y, cv_splits=args.folds)
+        t_cv = time.perf_counter() - start
+        print(f'{label:10s} {container:6s} fit+predict {t_fit:7.2f} s   {args.folds}-fold CV {t_cv:7.2f} s   (accuracy {mean:.4f} +- {std:.4f})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+# benchmarks/bench_grid_search.py
+"""
+Benchmark of the search modes of perform_grid_search.
+
+On synthetic battles, tunes the PCA logistic regression of the notebook
+(n_components x C) with the exhaustive grid, successive halving over the
+training samples and fold pruning, then reports for every mode the best
+configuration, its CV accuracy (on the samples of the last round for halving,
+all of them otherwise), the number of fits, their cost in full-data fits and
+the wall time, and whether it found the same configuration as the exhaustive
+grid. Pruning is the mode that cuts the fits. Halving fits every configuration
+at least once per fold and the survivors again in every round, so it makes
+more fits than the grid, on subsets: it can only lower their cost on large
+data, and its small first rounds can miss the best configuration on small data.
+
+Usage:
+    python -m benchmarks.bench_grid_search [--battles 3000] [--folds 10]
+"""
+import argparse
+import contextlib
+import io
+from feature_engineering import generate_features
+from Models import create_model_pipeline_PCA, perform_grid_search
+from .synthetic import generate_battles
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--battles', type=int, default=3000)
+    parser.add_argument('--folds', type=int, default=10)
+    args = parser.parse_args()
+
+    X = generate_features(list(generate_battles(args.battles)), flag_test=False)
+    y = X.pop('player_won').astype(int)
+    X = X.drop(columns='battle_id')
+    n_columns = X.shape[1]
+    param_grid = {
+        'pca__n_components': list(range(10, n_columns + 1, 10)),
+        'model__C': [0.001, 0.01, 0.1, 1.0],
+    }
+    print(f'{args.battles} battles, {n_columns} columns, {len(param_grid["pca__n_components"]) * 4} configurations, '
+          f'{args.folds} folds')
+
+    modes = {
+        'grid': {},
+        'halving': {},
+        'prune': {'prune_after': 2, 'prune_margin': 0.01},
+    }
+    reports = {}
+    for mode, kwargs in modes.items():
+        with contextlib.redirect_stdout(io.StringIO()):
+            _, reports[mode] = perform_grid_search(create_model_pipeline_PCA(), param_grid, X, y, cv_splits=args.folds,
+                                                   search=mode, return_report=True, **kwargs)
+    for mode, report in reports.items():
+        same = report['best_params'] == reports['grid']['best_params']
+        print(f'{mode:8s} fits {report["n_fits"]:4d} ({report["fit_cost"]:6.1f} full-data)   wall {report["wall_s"]:7.2f} s   '
+              f'accuracy {report["best_score"]:.4f} +- {report["best_std"]:.4f}   '
+              f'{report["best_params"]}   same as grid: {same}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+# benchmarks/bench_online.py
+"""
+Latency of the online BattleState.
+
+Fits a logistic regression pipeline on the features of synthetic battles,
+then replays other synthetic battles turn by turn and measures, in
+microseconds per turn:
+
+- update:        BattleState.update(turn);
+- features:      BattleState.features() (includes the replay of the last 10 turns);
+- predict_proba: BattleState.predict_proba(), features + one-row pipeline scoring.
+
+Usage:
+    python -m benchmarks.bench_online [--train 2000] [--battles 200]
+"""
+import argparse
+import time
+import numpy as np
+from feature_engineering import generate_features, PokedexRegistry, BattleState, online_extractor_calls
+from Models import create_model_pipeline
+from .synthetic import generate_battles
+
+
+def percentiles(samples: list) -> str:
+    us = np.asarray(samples) * 1e6
+    return f'p50 {np.percentile(us, 50):9.1f} us   p99 {np.percentile(us, 99):9.1f} us'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--train', type=int, default=2000, help='battles used to fit the model')
+    parser.add_argument('--battles', type=int, default=200, help='battles replayed turn by turn')
+    args = parser.parse_args()
+
+    train = list(generate_battles(args.train, seed=0))
+    registry = PokedexRegistry.from_data(train)
+    features = generate_features(train, flag_test=False, tree=False, registry=registry)
+    model = create_model_pipeline(c_value=0.1)
+    model.fit(features.drop(columns=['player_won', 'battle_id']), features['player_won'].astype(int))
+
+    calls = online_extractor_calls(tree=False)
+    timings = {'update': [], 'features': [], 'predict_proba': []}
+    for battle in generate_battles(args.battles, seed=1, start_id=args.train):
+        state = BattleState(battle, registry, calls, model=model)
+        for turn in battle['battle_timeline']:
+            start = time.perf_counter()
+            state.update(turn)
+            timings['update'].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            state.features()
+            timings['features'].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            state.predict_proba()
+            timings['predict_proba'].append(time.perf_counter() - start)
+
+    for name, samples in timings.items():
+        print(f'{name:<14} {percentiles(samples)}')
+
+
+if __name__ == '__main__':
+    main()
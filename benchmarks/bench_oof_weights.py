@@ -0,0 +1,69 @@
+# benchmarks/bench_oof_weights.py
+"""
+Benchmark of CustomVoter re-weighting on cached out-of-fold predictions.
+
+On synthetic battles, computes the OOFCache of the notebook ensemble once,
+checks that cache.score(weights) equals evaluate_model(CustomVoter(weights))
+for the notebook weights, then compares the time of one evaluate_model run
+with the time of re-weighting on the cache and of the weight searches.
+
+Usage:
+    python -m benchmarks.bench_oof_weights [--battles 3000] [--folds 5]
+"""
+import argparse
+import time
+import numpy as np
+from sklearn.linear_model import LogisticRegression
+from feature_engineering import generate_features
+from Models import (create_model_pipeline_PCA, create_model_pipeline_rf, create_model_pipeline_xgb, CustomVoter, FeatureViews,
+                    OOFCache, evaluate_model)
+from .synthetic import generate_battles
+
+WEIGHTS = [0.4, 0.4, 0.2]
+
+
+def make_voter(**kwargs) -> CustomVoter:
+    return CustomVoter(estimators=[
+        ('lr_pca', create_model_pipeline_PCA(n_components=20, c_value=0.1)),
+        ('rf', create_model_pipeline_rf(n_estimators=200, max_depth=12)),
+        ('xgb', create_model_pipeline_xgb(n_estimators=200, max_depth=4, learning_rate=0.05)),
+    ], **kwargs)
+
+
+def timed(fn) -> tuple:
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--battles', type=int, default=3000)
+    parser.add_argument('--folds', type=int, default=5)
+    args = parser.parse_args()
+
+    battles = list(generate_battles(args.battles))
+    linear = generate_features(battles, flag_test=False, tree=False)
+    tree = generate_features(battles, flag_test=False, tree=True)
+    y = linear['player_won'].astype(int).to_numpy()
+    X = FeatureViews({'main': linear.drop(columns=['player_won', 'battle_id']),
+                      'tree': tree.drop(columns=['player_won', 'battle_id'])})
+
+    t_cv, reference = timed(lambda: evaluate_model(make_voter(weights=WEIGHTS), X, y, cv_splits=args.folds))
+    t_oof, cache = timed(lambda: OOFCache(make_voter(), cv_splits=args.folds).fit(X, y))
+    t_score, score = timed(lambda: cache.score(WEIGHTS))
+    np.testing.assert_array_equal(score, reference)
+
+    print(f'{args.battles} battles, {args.folds} folds')
+    print(f'evaluate_model (refit)        {t_cv:9.3f} s   accuracy {reference[0]:.4f} +- {reference[1]:.4f}')
+    print(f'OOFCache.fit (once)           {t_oof:9.3f} s')
+    print(f'OOFCache.score                {t_score * 1000:9.3f} ms')
+    for method in ('grid', 'scipy'):
+        seconds, (weights, mean, std) = timed(lambda: cache.optimize_weights(method=method))
+        print(f'optimize_weights({method:5s})     {seconds * 1000:9.3f} ms  weights {np.round(weights, 3)} accuracy {mean:.4f} +- {std:.4f}')
+    seconds, (mean, std) = timed(lambda: cache.stacking_score(LogisticRegression()))
+    print(f'stacking_score(LR)            {seconds * 1000:9.3f} ms  accuracy {mean:.4f} +- {std:.4f}')
+
+
+if __name__ == '__main__':
+    main()
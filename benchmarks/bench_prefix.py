@@ -0,0 +1,60 @@
+# benchmarks/bench_prefix.py
+"""
+Benchmark of the anytime prefix features.
+
+Compares, on synthetic battles, the features at turns 5, 10, ..., 30:
+
+- rerun:  the timelines truncated at every cutoff and generate_features
+          (fused engine) run once per cutoff;
+- prefix: online.prefix_features, the sum features on the tensor store
+          (prefix sums), the others from one BattleState replay per battle.
+
+The two feature tensors must agree (within a few ulps: the prefix sums round
+differently from the extractor loops; identical with exact=True).
+
+Usage:
+    python -m benchmarks.bench_prefix [--battles 2000] [--tree]
+"""
+import argparse
+import time
+import numpy as np
+from feature_engineering import generate_features, PokedexRegistry, prefix_features, PREFIX_CUTOFFS
+from .synthetic import generate_battles
+
+
+def rerun(battles: list[dict], registry: PokedexRegistry, tree: bool) -> np.ndarray:
+    slices = []
+    for cutoff in PREFIX_CUTOFFS:
+        truncated = [{**battle, 'battle_timeline': battle['battle_timeline'][:cutoff]} for battle in battles]
+        df = generate_features(truncated, flag_test=False, tree=tree, registry=registry)
+        slices.append(df.drop(columns=['battle_id', 'player_won']).to_numpy(dtype=np.float64))
+    return np.stack(slices, axis=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--battles', type=int, default=2000)
+    parser.add_argument('--tree', action='store_true', help='tree feature set (default: linear)')
+    args = parser.parse_args()
+
+    battles = list(generate_battles(args.battles))
+    registry = PokedexRegistry.from_data(battles)
+
+    start = time.perf_counter()
+    expected = rerun(battles, registry, args.tree)
+    t_rerun = time.perf_counter() - start
+
+    start = time.perf_counter()
+    features, _, _ = prefix_features(battles, tree=args.tree, registry=registry)
+    t_prefix = time.perf_counter() - start
+    exact, _, _ = prefix_features(battles, tree=args.tree, registry=registry, exact=True)
+
+    assert np.allclose(features, expected, rtol=1e-12, atol=1e-12, equal_nan=True), "prefix features differ from the per-cutoff runs"
+    assert np.array_equal(exact, expected, equal_nan=True), "exact prefix features differ from the per-cutoff runs"
+    print(f'{len(battles)} battles x {len(PREFIX_CUTOFFS)} cutoffs -> {features.shape}')
+    print(f'rerun  {t_rerun:8.3f} s')
+    print(f'prefix {t_prefix:8.3f} s   ({t_rerun / t_prefix:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+# benchmarks/bench_segments.py
+"""
+Benchmark of the prefix-sum turn segmentation.
+
+On synthetic battles, computes the divide_turns features of
+avg_effectiveness2, avg_stab_multiplier, avg_stat_diff_per_turn,
+accuracy_avg and category_impact_score with:
+
+- extractors: the original functions, which rescan every segment;
+- exact:      the *_from_store functions with exact=True (bit-identical);
+- prefix:     the *_from_store functions with exact=False (O(1) per segment).
+
+A second run asks for every 5-turn sliding window (26 segments) to show
+the cost of many segments. The BattleTensorStore is built once, outside the
+timings.
+
+Usage:
+    python -m benchmarks.bench_segments [--battles 5000] [--repeat 3]
+"""
+import argparse
+import time
+import numpy as np
+from feature_engineering import PokedexRegistry, BattleTensorStore, category_impact_score_from_store
+from feature_engineering.extractors import avg_effectiveness2, avg_stab_multiplier, avg_stat_diff_per_turn, accuracy_avg, category_impact_score
+from feature_engineering.segments import (avg_effectiveness2_from_store, avg_stab_multiplier_from_store,
+                                          avg_stat_diff_per_turn_from_store, accuracy_avg_from_store)
+from .synthetic import generate_battles
+
+STATS = ['hp', 'atk', 'def', 'spa', 'spd', 'spe']
+
+
+def best_time(fn, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def extractors(data, registry):
+    return [avg_effectiveness2(data, difference=True, registry=registry, test=True),
+            avg_stab_multiplier(data, difference=True, registry=registry, test=True),
+            avg_stat_diff_per_turn(data, stats=STATS, registry=registry, test=True),
+            accuracy_avg(data, difference=True, test=True),
+            category_impact_score(data, difference=True, registry=registry, test=True)]
+
+
+def from_store(store, registry, exact: bool, segments: dict = None):
+    kwargs = dict(exact=exact, test=True) if segments is None else dict(exact=exact, test=True, segments=segments)
+    return [avg_effectiveness2_from_store(store, registry, difference=True, **kwargs),
+            avg_stab_multiplier_from_store(store, registry, difference=True, **kwargs),
+            avg_stat_diff_per_turn_from_store(store, registry, stats=STATS, **kwargs),
+            accuracy_avg_from_store(store, difference=True, **kwargs),
+            category_impact_score_from_store(store, registry, difference=True, **kwargs)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--battles', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    data = list(generate_battles(args.battles))
+    registry = PokedexRegistry.from_data(data)
+    store = BattleTensorStore.from_battles(data)
+
+    expected = extractors(data, registry)
+    for got in (from_store(store, registry, exact=True), from_store(store, registry, exact=False)):
+        for ref, df in zip(expected, got):
+            assert list(ref.columns) == list(df.columns)
+            assert np.allclose(ref.to_numpy(dtype=float), df.to_numpy(dtype=float), rtol=1e-12, atol=1e-12)
+
+    t_ext = best_time(lambda: extractors(data, registry), args.repeat)
+    t_exact = best_time(lambda: from_store(store, registry, exact=True), args.repeat)
+    t_prefix = best_time(lambda: from_store(store, registry, exact=False), args.repeat)
+    print(f'{args.battles} battles, first/middle/last 10 turns')
+    print(f'extractors {t_ext:8.3f} s')
+    print(f'exact      {t_exact:8.3f} s   ({t_ext / t_exact:.1f}x)')
+    print(f'prefix     {t_prefix:8.3f} s   ({t_ext / t_prefix:.1f}x)')
+
+    windows = {f'turns_{start}_{start + 5}': (start, start + 5) for start in range(26)}
+    t_exact = best_time(lambda: from_store(store, registry, exact=True, segments=windows), args.repeat)
+    t_prefix = best_time(lambda: from_store(store, registry, exact=False, segments=windows), args.repeat)
+    print(f'{len(windows)} sliding 5-turn windows')
+    print(f'exact      {t_exact:8.3f} s')
+    print(f'prefix     {t_prefix:8.3f} s   ({t_exact / t_prefix:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
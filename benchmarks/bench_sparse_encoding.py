@@ -0,0 +1,61 @@
+# benchmarks/bench_sparse_encoding.py
+"""
+Benchmark of the sparse mode of pokemon_encoding(one_hot=True).
+
+On synthetic battles, checks that the sparse one-hot columns hold the same
+values as the dense ones, then reports the time and memory of both frames and
+the fit time of the logistic regression pipeline on the linear feature set
+(dense frame vs sparse columns with create_model_pipeline(sparse=True)).
+
+Usage:
+    python -m benchmarks.bench_sparse_encoding [--battles 10000] [--repeat 3]
+"""
+import argparse
+import time
+import pandas as pd
+from feature_engineering import pokemon_encoding, generate_features, feature_spec
+from Models import create_model_pipeline
+from .synthetic import generate_battles
+
+
+def best_time(fn, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def densify(df: pd.DataFrame) -> pd.DataFrame:
+    return df.astype({c: 'int64' for c, dtype in df.dtypes.items() if isinstance(dtype, pd.SparseDtype)})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--battles', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    data = list(generate_battles(args.battles))
+    dense = pokemon_encoding(data, one_hot=True)
+    sparse = pokemon_encoding(data, one_hot=True, sparse=True)
+    pd.testing.assert_frame_equal(densify(sparse), dense, check_exact=True)
+
+    print(f'{args.battles} battles')
+    t_dense = best_time(lambda: pokemon_encoding(data, one_hot=True), args.repeat)
+    t_sparse = best_time(lambda: pokemon_encoding(data, one_hot=True, sparse=True), args.repeat)
+    print(f'pokemon_encoding   dense {t_dense:7.3f} s {dense.memory_usage(deep=True).sum() / 2**20:7.2f} MiB   '
+          f'sparse {t_sparse:7.3f} s {sparse.memory_usage(deep=True).sum() / 2**20:7.2f} MiB')
+
+    X = generate_features(data, flag_test=False, spec=feature_spec(family='linear', params={'pokemon_encoding': {'sparse': True}}))
+    y = X.pop('player_won')
+    X = X.drop(columns='battle_id')
+    X_dense = densify(X)
+    t_dense = best_time(lambda: create_model_pipeline(c_value=0.1).fit(X_dense, y), args.repeat)
+    t_sparse = best_time(lambda: create_model_pipeline(c_value=0.1, sparse=True).fit(X, y), args.repeat)
+    print(f'logistic regression fit   dense {t_dense:7.3f} s   sparse {t_sparse:7.3f} s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+# benchmarks/bench_streaming_memory.py
+"""
+Peak memory of the in-memory and of the chunked feature pipelines.
+
+The input file is replicated to build JSONL files of growing size. For every
+size, each mode runs in a fresh process and reports its peak resident set
+size (ru_maxrss):
+
+- 'full':    generate_features(get_dict_from_json(path), ...), all the battles
+             parsed in memory at once.
+- 'chunked': generate_features_chunked(path, ..., chunk_size), only one chunk
+             of battles in memory at a time.
+
+With the chunked reader the peak should stay roughly flat as the file grows
+(only the feature rows grow with the number of battles).
+
+Usage:
+    python -m benchmarks.bench_streaming_memory [path/to/train.jsonl] [--scales 1 2 4 8] [--chunk-size N]
+"""
+import argparse
+import multiprocessing as mp
+import os
+import resource
+import sys
+import tempfile
+import time
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of the current process in MB (ru_maxrss is in KB on Linux, bytes on macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+
+
+def run_mode(mode: str, path: str, chunk_size: int, queue):
+    """Featurize path with the given mode and send (n_rows, seconds, baseline MB, peak MB) back."""
+    from feature_engineering import get_dict_from_json, generate_features, generate_features_chunked
+
+    baseline = peak_rss_mb()  # interpreter + imports
+    start = time.perf_counter()
+    if mode == 'full':
+        df = generate_features(get_dict_from_json(path), flag_test=False)
+    else:
+        df = generate_features_chunked(path, flag_test=False, chunk_size=chunk_size)
+    elapsed = time.perf_counter() - start
+    queue.put((len(df), elapsed, baseline, peak_rss_mb()))
+
+
+def measure(mode: str, path: str, chunk_size: int) -> tuple:
+    ctx = mp.get_context('spawn')  # fresh interpreter, so ru_maxrss only covers this run
+    queue = ctx.Queue()
+    process = ctx.Process(target=run_mode, args=(mode, path, chunk_size, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def replicate(src: str, dst: str, times: int):
+    """Write src `times` times into dst."""
+    with open(src, 'r') as f:
+        content = f.read()
+    if not content.endswith('\n'):
+        content += '\n'
+    with open(dst, 'w') as f:
+        for _ in range(times):
+            f.write(content)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path', nargs='?', default='Data/train.jsonl', help='JSONL battle file used as the unit size')
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 2, 4, 8], help='file sizes as multiples of the input')
+    parser.add_argument('--chunk-size', type=int, default=1000, help='battles per chunk in chunked mode')
+    args = parser.parse_args()
+
+    print(f"{'file (MB)':>10}{'mode':>10}{'battles':>10}{'time (s)':>10}{'peak RSS (MB)':>15}{'above baseline':>16}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for scale in args.scales:
+            path = os.path.join(tmp, f'battles_x{scale}.jsonl')
+            replicate(args.path, path, scale)
+            size_mb = os.path.getsize(path) / 2**20
+            for mode in ('full', 'chunked'):
+                n_rows, elapsed, baseline, peak = measure(mode, path, args.chunk_size)
+                print(f"{size_mb:>10.1f}{mode:>10}{n_rows:>10}{elapsed:>10.2f}{peak:>15.1f}{peak - baseline:>16.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+# benchmarks/bench_team_masks.py
+"""
+Benchmark of tot_pok_used, last_turn_status_extractor and
+pokemon_encoding(one_hot=True) on the team state bitmasks.
+
+On synthetic battles, checks that the *_from_store functions of
+feature_engineering.team_masks return the same frames as the extractors,
+then times both. The BattleTensorStore (which computes the masks) is built
+once, outside the timings.
+
+Usage:
+    python -m benchmarks.bench_team_masks [--battles 10000] [--repeat 3]
+"""
+import argparse
+import time
+import pandas as pd
+from feature_engineering import BattleTensorStore
+from feature_engineering.extractors import tot_pok_used, last_turn_status_extractor, pokemon_encoding
+from feature_engineering.team_masks import tot_pok_used_from_store, last_turn_status_from_store, pokemon_encoding_from_store
+from .synthetic import generate_battles
+
+
+def best_time(fn, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--battles', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    data = list(generate_battles(args.battles))
+    store = BattleTensorStore.from_battles(data)
+
+    pairs = [
+        ('tot_pok_used', lambda: tot_pok_used(data), lambda: tot_pok_used_from_store(store)),
+        ('last_turn_status_extractor', lambda: last_turn_status_extractor(data), lambda: last_turn_status_from_store(store)),
+        ('pokemon_encoding one_hot', lambda: pokemon_encoding(data, one_hot=True), lambda: pokemon_encoding_from_store(store)),
+    ]
+    print(f'{args.battles} battles')
+    for name, extractor, vectorized in pairs:
+        pd.testing.assert_frame_equal(vectorized(), extractor(), check_exact=True)
+        t_ext = best_time(extractor, args.repeat)
+        t_vec = best_time(vectorized, args.repeat)
+        print(f'{name:30s} extractor {t_ext:7.3f} s   masks {t_vec:7.3f} s   ({t_ext / t_vec:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
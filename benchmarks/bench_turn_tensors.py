@@ -0,0 +1,56 @@
+# benchmarks/bench_turn_tensors.py
+"""
+Benchmark of avg_boost_diff_per_turn, granular_turn_counts and
+team_hp_advantage_flip_count as tensor reductions.
+
+On synthetic battles, checks that the *_from_store functions of
+feature_engineering.turn_tensors return the same frames as the extractors,
+then times both. The BattleTensorStore is built once, outside the timings.
+
+Usage:
+    python -m benchmarks.bench_turn_tensors [--battles 10000] [--repeat 3]
+"""
+import argparse
+import time
+import pandas as pd
+from feature_engineering import BattleTensorStore
+from feature_engineering.extractors import avg_boost_diff_per_turn, granular_turn_counts, team_hp_advantage_flip_count
+from feature_engineering.turn_tensors import (avg_boost_diff_per_turn_from_store, granular_turn_counts_from_store,
+                                              team_hp_advantage_flip_count_from_store)
+from .synthetic import generate_battles
+
+
+def best_time(fn, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--battles', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    data = list(generate_battles(args.battles))
+    store = BattleTensorStore.from_battles(data)
+
+    pairs = [
+        ('avg_boost_diff_per_turn', lambda: avg_boost_diff_per_turn(data), lambda: avg_boost_diff_per_turn_from_store(store)),
+        ('granular_turn_counts', lambda: granular_turn_counts(data, difference=True), lambda: granular_turn_counts_from_store(store, difference=True)),
+        ('granular_turn_counts p1/p2', lambda: granular_turn_counts(data), lambda: granular_turn_counts_from_store(store)),
+        ('team_hp_advantage_flip_count', lambda: team_hp_advantage_flip_count(data), lambda: team_hp_advantage_flip_count_from_store(store)),
+    ]
+    print(f'{args.battles} battles')
+    for name, extractor, vectorized in pairs:
+        pd.testing.assert_frame_equal(vectorized(), extractor(), check_exact=True)
+        t_ext = best_time(extractor, args.repeat)
+        t_vec = best_time(vectorized, args.repeat)
+        print(f'{name:30s} extractor {t_ext:7.3f} s   tensors {t_vec:7.3f} s   ({t_ext / t_vec:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+# benchmarks/bench_type_effectiveness.py
+"""
+Micro-benchmark of the type-effectiveness kernels.
+
+Draws random (attacking type, defender types) pairs and compares:
+
+- scalar:  utils.effectiveness called in a Python loop, as in the extractors;
+- batch:   utils.effectiveness_batch, one gather in constants.dual_type_chart
+           on pre-encoded type codes;
+- encode + batch: the same, including the conversion of the names into codes.
+
+The multipliers of the three versions must be identical.
+
+Usage:
+    python -m benchmarks.bench_type_effectiveness [--n 100000] [--repeat 5]
+"""
+import argparse
+import time
+import numpy as np
+from feature_engineering.constants import types
+from feature_engineering.utils import effectiveness, effectiveness_batch, type_codes, def_type_codes
+
+
+def best_time(fn, repeat: int) -> tuple:
+    """Return (best wall time over `repeat` runs, result of the last run)."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def random_pairs(n: int, seed: int = 0) -> tuple:
+    """n random attacking types and defender type lists (about half of them mono-type)."""
+    rng = np.random.default_rng(seed)
+    attacking = [types[i] for i in rng.integers(0, len(types), n)]
+    defending = []
+    for t1, t2, mono in zip(rng.integers(0, len(types), n), rng.integers(0, len(types), n), rng.random(n) < 0.5):
+        defending.append([types[t1], 'notype'] if mono else [types[t1], types[t2]])
+    return attacking, defending
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--n', type=int, default=100_000, help='number of (attack, defender) pairs')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per kernel (best time is kept)')
+    args = parser.parse_args()
+
+    attacking, defending = random_pairs(args.n)
+    att_codes, def_codes = type_codes(attacking), def_type_codes(defending)
+
+    t_scalar, expected = best_time(lambda: np.array([effectiveness(a, d) for a, d in zip(attacking, defending)]), args.repeat)
+    t_batch, result = best_time(lambda: effectiveness_batch(att_codes, def_codes), args.repeat)
+    t_encode, encoded = best_time(lambda: effectiveness_batch(type_codes(attacking), def_type_codes(defending)), args.repeat)
+
+    assert np.array_equal(result, expected) and np.array_equal(encoded, expected)
+
+    print(f"{args.n} pairs\n")
+    print(f"{'kernel':<16}{'time (ms)':>12}{'ns / pair':>12}{'speedup':>10}")
+    for label, t in [('scalar', t_scalar), ('batch', t_batch), ('encode + batch', t_encode)]:
+        print(f"{label:<16}{t * 1e3:>12.2f}{t / args.n * 1e9:>12.1f}{t_scalar / t:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
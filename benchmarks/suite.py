@@ -0,0 +1,155 @@
+# benchmarks/suite.py
+"""
+Benchmark suite on synthetic battles.
+
+Generates battles with benchmarks.synthetic and times:
+
+- every extractor on its own (through an ExtractorProfiler, fused=False);
+- generate_features for the linear and the tree feature sets;
+- fit and predict of every model factory in Models;
+- fit and predict of CustomVoter (lr_pca + rf + xgb, as in the notebook).
+
+Throughput is reported in battles per second. --save stores the results as a
+baseline JSON file; --compare checks a run against a stored baseline and
+flags the benchmarks whose throughput dropped by more than --tolerance.
+
+Usage:
+    python -m benchmarks.suite [--battles N] [--save baseline.json] [--compare baseline.json]
+"""
+import argparse
+import json
+import platform
+import time
+from datetime import datetime, timezone
+import pandas as pd
+from feature_engineering import generate_features, ExtractorProfiler
+from Models import (create_model_pipeline, create_model_pipeline_PCA, create_model_pipeline_poly,
+                    create_model_pipeline_rf, create_model_pipeline_xgb, CustomVoter)
+from .synthetic import generate_battles
+
+
+# (label, generate_features kwargs) of the two feature sets used by the models
+FEATURE_SETS = [
+    ('linear', dict(difference=True, tree=False, divide_turns=True)),
+    ('tree', dict(difference=True, tree=True, divide_turns=True)),
+]
+
+# (label, factory, feature set): small but representative model sizes
+MODEL_FACTORIES = [
+    ('logistic_regression', lambda: create_model_pipeline(c_value=0.1), 'main'),
+    ('logistic_regression_pca', lambda: create_model_pipeline_PCA(n_components=20, c_value=0.1), 'main'),
+    ('logistic_regression_poly', lambda: create_model_pipeline_poly(c_value=0.1, max_iter=200), 'main'),
+    ('random_forest', lambda: create_model_pipeline_rf(n_estimators=200, max_depth=12), 'tree'),
+    ('xgboost', lambda: create_model_pipeline_xgb(n_estimators=200, max_depth=4, learning_rate=0.05), 'tree'),
+]
+
+
+def timed(fn) -> tuple:
+    """Return (wall time, result of fn())."""
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def add(results: list, benchmark: str, seconds: float, n_battles: int):
+    results.append({'benchmark': benchmark, 'seconds': seconds, 'battles': n_battles,
+                    'battles_per_sec': n_battles / seconds if seconds > 0 else float('inf')})
+
+
+def run_suite(n_battles: int = 2000, seed: int = 0, test_fraction: float = 0.2) -> pd.DataFrame:
+    """Run every benchmark and return one row per benchmark."""
+    battles = list(generate_battles(n_battles, seed=seed))
+    results = []
+
+    # --- extractors, one at a time
+    profiler = ExtractorProfiler(trace_memory=False)
+    for _, kwargs in FEATURE_SETS:
+        generate_features(battles, flag_test=False, fused=False, profiler=profiler, **kwargs)
+    report = profiler.report()
+    report = report[~report['step'].isin(['pokedex_registry', 'assemble'])]
+    for (step, params), rows in report.groupby(['step', 'kwargs'], sort=False):
+        add(results, f'extractor/{step} {params}', rows['wall_s'].min(), n_battles)
+
+    # --- generate_features
+    features = {}
+    for label, kwargs in FEATURE_SETS:
+        seconds, df = timed(lambda: generate_features(battles, flag_test=False, **kwargs))
+        add(results, f'generate_features/{label}', seconds, n_battles)
+        features[label] = df
+
+    y = features['linear']['player_won'].astype(int).to_numpy()
+    X = pd.concat({
+        'main': features['linear'].drop(columns=['player_won', 'battle_id']),
+        'tree': features['tree'].drop(columns=['player_won', 'battle_id']),
+    }, axis=1)
+    n_train = int(len(X) * (1 - test_fraction))
+    X_train, X_test, y_train = X.iloc[:n_train], X.iloc[n_train:], y[:n_train]
+
+    # --- model factories
+    for label, factory, view in MODEL_FACTORIES:
+        model = factory()
+        seconds, _ = timed(lambda: model.fit(X_train[view], y_train))
+        add(results, f'fit/{label}', seconds, len(X_train))
+        seconds, _ = timed(lambda: model.predict_proba(X_test[view]))
+        add(results, f'predict/{label}', seconds, len(X_test))
+
+    # --- CustomVoter
+    voter = CustomVoter(estimators=[
+        ('lr_pca', create_model_pipeline_PCA(n_components=20, c_value=0.1)),
+        ('rf', create_model_pipeline_rf(n_estimators=200, max_depth=12)),
+        ('xgb', create_model_pipeline_xgb(n_estimators=200, max_depth=4, learning_rate=0.05)),
+    ], weights=[0.4, 0.4, 0.2])
+    seconds, _ = timed(lambda: voter.fit(X_train, y_train))
+    add(results, 'fit/custom_voter', seconds, len(X_train))
+    seconds, _ = timed(lambda: voter.predict_proba(X_test))
+    add(results, 'predict/custom_voter', seconds, len(X_test))
+
+    return pd.DataFrame(results)
+
+
+def save_baseline(results: pd.DataFrame, path: str, n_battles: int, seed: int):
+    baseline = {
+        'meta': {'created': datetime.now(timezone.utc).isoformat(), 'python': platform.python_version(),
+                 'machine': platform.machine(), 'processor': platform.processor(),
+                 'battles': n_battles, 'seed': seed},
+        'results': dict(zip(results['benchmark'], results['battles_per_sec'])),
+    }
+    with open(path, 'w') as f:
+        json.dump(baseline, f, indent=2)
+
+
+def compare_baseline(results: pd.DataFrame, path: str, tolerance: float) -> pd.DataFrame:
+    """Add the baseline throughput, the ratio current / baseline and a regression flag."""
+    with open(path, 'r') as f:
+        baseline = json.load(f)['results']
+    results = results.copy()
+    results['baseline_per_sec'] = results['benchmark'].map(baseline)
+    results['ratio'] = results['battles_per_sec'] / results['baseline_per_sec']
+    results['regression'] = results['ratio'] < 1 - tolerance
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--battles', type=int, default=2000, help='number of synthetic battles')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--save', help='write the results as a baseline JSON file')
+    parser.add_argument('--compare', help='baseline JSON file to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed throughput drop before flagging a regression')
+    args = parser.parse_args()
+
+    results = run_suite(args.battles, seed=args.seed)
+    if args.compare:
+        results = compare_baseline(results, args.compare, args.tolerance)
+    if args.save:
+        save_baseline(results, args.save, args.battles, args.seed)
+
+    with pd.option_context('display.max_rows', None, 'display.width', 200, 'display.max_colwidth', 80):
+        print(results.to_string(index=False, float_format=lambda v: f'{v:,.3f}'))
+
+    if args.compare and results['regression'].any():
+        raise SystemExit(f"{int(results['regression'].sum())} benchmark(s) regressed more than {args.tolerance:.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+# benchmarks/synthetic.py
+"""
+Synthetic battle generator.
+
+Generates battles with the same schema as Data/train.jsonl (p1_team_details,
+p2_lead_details, a battle_timeline of pokemon states, moves, boosts, status
+and effects, player_won and battle_id), drawing the teams from the 20 species
+of the game. Battles are produced one at a time, so write_jsonl can stream
+millions of them to disk with constant memory.
+
+The battles are plausible, not realistic: the active pokemon take random
+damage, switch, faint and get statuses, but the outcome is random. They are
+meant for benchmarks and smoke tests, not for training.
+
+Usage:
+    python -m benchmarks.synthetic N out.jsonl [--seed S] [--turns T]
+"""
+import argparse
+import json
+import random
+from feature_engineering.constants import pokemon_list, boost_types
+
+# species -> (types, base hp, atk, def, spa, spd, spe)
+ROSTER = {
+    'alakazam': (['psychic', 'notype'], 55, 50, 45, 135, 95, 120),
+    'articuno': (['flying', 'ice'], 90, 85, 100, 95, 125, 85),
+    'chansey': (['normal', 'notype'], 250, 5, 5, 35, 105, 50),
+    'charizard': (['fire', 'flying'], 78, 84, 78, 109, 85, 100),
+    'cloyster': (['ice', 'water'], 50, 95, 180, 85, 45, 70),
+    'dragonite': (['dragon', 'flying'], 91, 134, 95, 100, 100, 80),
+    'exeggutor': (['grass', 'psychic'], 95, 95, 85, 125, 65, 55),
+    'gengar': (['ghost', 'poison'], 60, 65, 60, 130, 75, 110),
+    'golem': (['ground', 'rock'], 80, 110, 130, 55, 65, 45),
+    'jolteon': (['electric', 'notype'], 65, 65, 60, 110, 95, 130),
+    'jynx': (['ice', 'psychic'], 65, 50, 35, 115, 95, 95),
+    'lapras': (['ice', 'water'], 130, 85, 80, 85, 95, 60),
+    'persian': (['normal', 'notype'], 65, 70, 60, 65, 65, 115),
+    'rhydon': (['ground', 'rock'], 105, 130, 120, 45, 45, 40),
+    'slowbro': (['psychic', 'water'], 95, 75, 110, 100, 80, 30),
+    'snorlax': (['normal', 'notype'], 160, 110, 65, 65, 110, 30),
+    'starmie': (['psychic', 'water'], 60, 75, 85, 100, 85, 115),
+    'tauros': (['normal', 'notype'], 75, 100, 95, 40, 70, 110),
+    'victreebel': (['grass', 'poison'], 80, 105, 65, 100, 70, 70),
+    'zapdos': (['electric', 'flying'], 90, 90, 85, 125, 90, 100),
+}
+assert sorted(ROSTER) == sorted(pokemon_list)
+
+# (name, type, category, base_power, accuracy, priority)
+MOVES = [
+    ('psychic', 'PSYCHIC', 'SPECIAL', 90, 1.0, 0),
+    ('thunderbolt', 'ELECTRIC', 'SPECIAL', 95, 1.0, 0),
+    ('icebeam', 'ICE', 'SPECIAL', 95, 1.0, 0),
+    ('blizzard', 'ICE', 'SPECIAL', 120, 0.9, 0),
+    ('surf', 'WATER', 'SPECIAL', 95, 1.0, 0),
+    ('fireblast', 'FIRE', 'SPECIAL', 120, 0.85, 0),
+    ('nightshade', 'GHOST', 'SPECIAL', 0, 1.0, 0),
+    ('bodyslam', 'NORMAL', 'PHYSICAL', 85, 1.0, 0),
+    ('hyperbeam', 'NORMAL', 'PHYSICAL', 150, 0.9, 0),
+    ('earthquake', 'GROUND', 'PHYSICAL', 100, 1.0, 0),
+    ('rockslide', 'ROCK', 'PHYSICAL', 75, 0.9, 0),
+    ('razorleaf', 'GRASS', 'PHYSICAL', 55, 0.95, 0),
+    ('quickattack', 'NORMAL', 'PHYSICAL', 40, 1.0, 1),
+    ('counter', 'FIGHTING', 'PHYSICAL', 0, 1.0, -5),
+    ('thunderwave', 'ELECTRIC', 'STATUS', 0, 1.0, 0),
+    ('sleeppowder', 'GRASS', 'STATUS', 0, 0.75, 0),
+    ('recover', 'NORMAL', 'STATUS', 0, 1.0, 0),
+]
+MOVE_KEYS = ['name', 'type', 'category', 'base_power', 'accuracy', 'priority']
+
+STATUSES = ['par', 'slp', 'psn', 'brn', 'frz', 'tox']
+EFFECTS = [['confusion'], ['wrap'], ['clamp'], ['substitute'], ['reflect'], ['firespin'],
+           ['disable'], ['typechange'], ['confusion', 'reflect']]
+DAMAGE_STEPS = [0.1, 0.25, 0.4, 0.7, 1.0]
+BOOST_STEPS = [0, 0, 0, 0, 1, -1, 2]
+
+
+def pokemon_details(name: str) -> dict:
+    """Team / lead entry of a species, as in p1_team_details."""
+    types, hp, atk, defense, spa, spd, spe = ROSTER[name]
+    return {'name': name, 'level': 100, 'types': list(types),
+            'base_hp': hp, 'base_atk': atk, 'base_def': defense,
+            'base_spa': spa, 'base_spd': spd, 'base_spe': spe}
+
+
+class _Side:
+    """Running state of one player: team, hp, status and active pokemon."""
+
+    def __init__(self, team: list[str]):
+        self.team = team
+        self.hp = {name: 1.0 for name in team}
+        self.status = {name: 'nostatus' for name in team}
+        self.active = team[0]
+
+    def play_turn(self, rng: random.Random) -> tuple:
+        """Advance one turn and return (pokemon_state, move_details)."""
+        move = None
+        alive = [name for name in self.team if self.hp[name] > 0]
+        if self.hp[self.active] == 0 and alive:
+            self.active = rng.choice(alive)  # forced switch after a KO
+        elif alive and rng.random() < 0.12:
+            self.active = rng.choice(alive)  # voluntary switch
+        else:
+            move = dict(zip(MOVE_KEYS, rng.choice(MOVES)))
+
+        name = self.active
+        if self.hp[name] > 0 and rng.random() < 0.5:
+            self.hp[name] = max(0.0, round(self.hp[name] - rng.choice(DAMAGE_STEPS), 2))
+        if self.hp[name] == 0:
+            self.status[name] = 'fnt'
+        elif self.status[name] == 'nostatus' and rng.random() < 0.05:
+            self.status[name] = rng.choice(STATUSES)
+
+        state = {
+            'name': name,
+            'hp_pct': self.hp[name],
+            'status': self.status[name],
+            'effects': list(rng.choice(EFFECTS)) if rng.random() < 0.2 else ['noeffect'],
+            'boosts': {stat: rng.choice(BOOST_STEPS) for stat in boost_types},
+        }
+        return state, move
+
+
+def generate_battle(rng: random.Random, battle_id: int, n_turns: int = 30) -> dict:
+    """One synthetic battle with the schema of the JSONL files."""
+    team_1 = rng.sample(pokemon_list, 6)
+    team_2 = rng.sample(pokemon_list, 6)
+    sides = [_Side(team_1), _Side(team_2)]
+
+    timeline = []
+    for turn in range(1, n_turns + 1):
+        row = {'turn': turn}
+        for player, side in enumerate(sides, start=1):
+            state, move = side.play_turn(rng)
+            row[f'p{player}_pokemon_state'] = state
+            row[f'p{player}_move_details'] = move
+        timeline.append(row)
+
+    # the player with more remaining hp usually wins
+    hp_1, hp_2 = sum(sides[0].hp.values()), sum(sides[1].hp.values())
+    player_won = hp_1 > hp_2 if rng.random() < 0.8 else hp_1 <= hp_2
+    return {
+        'player_won': player_won,
+        'p1_team_details': [pokemon_details(name) for name in team_1],
+        'p2_lead_details': pokemon_details(team_2[0]),
+        'battle_timeline': timeline,
+        'battle_id': battle_id,
+    }
+
+
+def generate_battles(n_battles: int, seed: int = 0, n_turns: int = 30, start_id: int = 0):
+    """Yield n_battles synthetic battles (deterministic for a given seed)."""
+    rng = random.Random(seed)
+    for i in range(n_battles):
+        yield generate_battle(rng, start_id + i, n_turns=n_turns)
+
+
+def write_jsonl(file_path: str, n_battles: int, seed: int = 0, n_turns: int = 30):
+    """Stream n_battles synthetic battles to a JSONL file."""
+    with open(file_path, 'w') as f:
+        for battle in generate_battles(n_battles, seed=seed, n_turns=n_turns):
+            f.write(json.dumps(battle) + '\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('n_battles', type=int, help='number of battles')
+    parser.add_argument('path', help='output JSONL file')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--turns', type=int, default=30, help='turns per battle')
+    args = parser.parse_args()
+    write_jsonl(args.path, args.n_battles, seed=args.seed, n_turns=args.turns)
+
+
+if __name__ == '__main__':
+    main()
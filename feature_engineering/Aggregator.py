@@ -1,113 +1,155 @@
+import inspect
 import pandas as pd
 import numpy as np
 from .extractors import *
+from .engine import FusedFeatureEngine, FeatureContext, ACCUMULATORS
+from .pokedex_registry import PokedexRegistry
+from .cache import FeatureCache, data_hash
+from .profiler import ExtractorProfiler
+from .utils import iter_battles, iter_battle_chunks
+from .feature_sets import feature_spec, feature_calls, select_columns
 
 
+def extractor_calls(flag_test: bool, difference: bool = True, tree: bool = True, divide_turns: bool = True, spec: dict = None) -> list[tuple]:
+    """ Returns the list of (extractor, kwargs) pairs that generate_features
+    runs for the selected model family.
+
+    The calls come from the feature catalogue (see feature_sets): the
+    features of the 'tree' or 'linear' family with the given options, or the
+    ones selected by spec when given (difference, tree and divide_turns are
+    then ignored). In training mode the last call also returns player_won.
 
-def generate_features(battle_data: list[dict], flag_test: bool, difference: bool = True, tree: bool = True, divide_turns: bool = True) -> pd.DataFrame:
-    """ Takes the raw battle data, generates all features, and joins them
-    into a single DataFrame. 
-    you can also select the right features for the specific model.
-    
     """
-    if tree :
-        one_hot = False
-    else:
-        one_hot = True
-
-    if flag_test:
-        if tree: 
-            df_list = [
-            
-                avg_team_vs_lead_stats(battle_data,difference=difference, test=flag_test),
-                #avg_effectiveness2(battle_data, difference=difference, test=flag_test, divide_turns=divide_turns),
-                #category_impact_score(battle_data, difference=difference, test=flag_test, divide_turns=divide_turns),
-                #avg_stab_multiplier(battle_data, difference=difference, test=flag_test, divide_turns=divide_turns),
-                faint_count_diff_extractor(battle_data, difference=difference,test=flag_test), # generalized by pokemon encoding
-                avg_final_HP_pct(battle_data, difference=difference, test=flag_test),
-                avg_boost_diff_per_turn(battle_data, test=flag_test),
-                avg_stat_diff_per_turn(battle_data, test=flag_test, stats=['hp', 'atk', 'def', 'spa', 'spd', 'spe'], divide_turns=divide_turns),
-                accuracy_avg(battle_data, difference=difference, test=flag_test, divide_turns=divide_turns),
-                granular_turn_counts(battle_data, difference=difference, test=flag_test),
-                ratio_category_diff(battle_data, difference=difference,test=flag_test),
-                calculate_voluntary_swap_diff(battle_data, difference=difference, test=flag_test),
-                team_hp_advantage_flip_count(battle_data, test=flag_test),
-                damage_efficiency_ratio(battle_data, difference=difference, test=flag_test, divide_turns=False), # maybe better without turns for trees
-                pokemon_encoding(battle_data, one_hot=one_hot , test=flag_test),
-                first_KO_momentum_feature(battle_data, test=flag_test), # only for tree based models
-                last_turn_status_extractor(battle_data, test=flag_test),
-                tot_pok_used(battle_data, test=flag_test), # only for tree based models
-                avg_approx_damage(battle_data, difference=difference ,test=flag_test)
-            ]
-        else:
-            df_list = [
-            
-                avg_team_vs_lead_stats(battle_data,difference=difference, test=flag_test),
-                avg_effectiveness2(battle_data, difference=difference, test=flag_test, divide_turns=divide_turns),
-                #category_impact_score(battle_data, difference=difference, test=flag_test, divide_turns=divide_turns),
-                #avg_stab_multiplier(battle_data, difference=difference, test=flag_test, divide_turns=divide_turns),
-                faint_count_diff_extractor(battle_data, difference=difference,test=flag_test), # generalized by pokemon encoding
-                avg_final_HP_pct(battle_data, difference=difference, test=flag_test),
-                avg_boost_diff_per_turn(battle_data, test=flag_test),
-                avg_stat_diff_per_turn(battle_data, test=flag_test, stats=['hp', 'atk', 'def', 'spa', 'spd', 'spe'], divide_turns=divide_turns),
-                accuracy_avg(battle_data, difference=difference, test=flag_test, divide_turns=divide_turns),
-                granular_turn_counts(battle_data, difference=difference, test=flag_test),
-                ratio_category_diff(battle_data, difference=difference,test=flag_test),
-                calculate_voluntary_swap_diff(battle_data, difference=difference, test=flag_test),
-                team_hp_advantage_flip_count(battle_data, test=flag_test),
-                damage_efficiency_ratio(battle_data, difference=difference, test=flag_test, divide_turns=divide_turns), 
-                pokemon_encoding(battle_data, one_hot=one_hot , test=flag_test),
-                last_turn_status_extractor(battle_data, test=flag_test),
-                avg_approx_damage(battle_data, difference=difference , test=flag_test)
-            ]           
+    if spec is None:
+        spec = feature_spec(family='tree' if tree else 'linear', difference=difference, divide_turns=divide_turns)
+    return feature_calls(spec, flag_test)
 
-    else:
-        if tree:
-            flag_test = True
-            df_list = [
-                avg_team_vs_lead_stats(battle_data,difference=difference, test=flag_test),
-                #avg_effectiveness2(battle_data, difference=difference, divide_turns=divide_turns,test=flag_test),
-                #category_impact_score(battle_data, difference=difference, test= flag_test, divide_turns=divide_turns),
-                #avg_stab_multiplier(battle_data, difference=difference, test=flag_test, divide_turns=divide_turns),
-                faint_count_diff_extractor(battle_data, difference=difference,test=flag_test),
-                avg_final_HP_pct(battle_data, difference=difference, test=flag_test),
-                avg_boost_diff_per_turn(battle_data, test=flag_test),
-                avg_stat_diff_per_turn(battle_data, test=flag_test, stats=['hp', 'atk', 'def', 'spa', 'spd', 'spe'], divide_turns=divide_turns),
-                accuracy_avg(battle_data, difference=difference, test=flag_test, divide_turns=divide_turns),
-                granular_turn_counts(battle_data, difference=difference, test=flag_test),
-                ratio_category_diff(battle_data, difference=difference ,test=flag_test),
-                calculate_voluntary_swap_diff(battle_data, difference=difference,test=flag_test),
-                team_hp_advantage_flip_count(battle_data, test=flag_test),
-                damage_efficiency_ratio(battle_data, difference=difference, test=flag_test, divide_turns=False), # maybe better without turns for trees
-                pokemon_encoding(battle_data, one_hot=one_hot , test=flag_test),
-                first_KO_momentum_feature(battle_data, test=flag_test), # only for tree based models
-                last_turn_status_extractor(battle_data, test=flag_test),
-                tot_pok_used(battle_data, test=flag_test), # only for tree based models
-                avg_approx_damage(battle_data, difference=difference , test=False)
-            ]
+
+def concat_features(df_list: list[pd.DataFrame]) -> pd.DataFrame:
+    """ Join the frames returned by the extractors on battle_id with a single
+    column-wise concat, instead of a chain of pd.merge calls that copies the
+    growing frame at every step.
+
+    The extractors emit their rows in the order of the data, so the battle_ids
+    are checked to line up and the blocks are concatenated as they are. If some
+    extractor dropped battles (e.g. calculate_voluntary_swap_diff skips empty
+    timelines) every block is restricted to the battles present in all of them,
+    in the order of the first frame, like the inner merge does.
+    Only the first player_won column is kept.
+
+    Returns the same DataFrame as the pd.merge chain.
+    """
+    ids = df_list[0]['battle_id'].to_numpy()
+    aligned = all(len(df) == len(ids) and np.array_equal(df['battle_id'].to_numpy(), ids) for df in df_list[1:])
+
+    if not aligned:
+        common = pd.Index(ids)
+        for df in df_list[1:]:
+            if not df['battle_id'].is_unique:
+                raise ValueError("battle_id is not unique in an extractor output, cannot align the features")
+            common = common[common.isin(df['battle_id'])]
+        ids = common.to_numpy()
+
+    blocks = [pd.DataFrame({'battle_id': ids})]
+    seen_columns = {'battle_id'}
+    for df in df_list:
+        block = df.set_index('battle_id')
+        if not aligned:
+            block = block.loc[ids]
+        # keep a single copy of the label
+        block = block.drop(columns=[c for c in block.columns if c == 'player_won' and c in seen_columns])
+        duplicated = seen_columns.intersection(block.columns)
+        if duplicated:
+            raise ValueError(f"Feature columns produced by more than one extractor: {sorted(duplicated)}")
+        seen_columns.update(block.columns)
+        blocks.append(block.reset_index(drop=True))
+
+    return pd.concat(blocks, axis=1)
+
+
+def _build_registry(battle_data: list[dict]) -> PokedexRegistry:
+    """Registry with all its lookup dictionaries already built."""
+    registry = PokedexRegistry.from_data(battle_data)
+    for name in ('def_types', 'att_types', 'base_stats', 'base_stats1'):
+        getattr(registry, name)
+    return registry
+
+
+def extractor_blocks(calls: list[tuple], battle_data: list[dict], fused: bool = False, n_jobs: int = 1, registry: PokedexRegistry = None,
+                     profiler: ExtractorProfiler = None) -> list[pd.DataFrame]:
+    """ Returns the DataFrame of every (extractor, kwargs) call, in order.
+    With fused=True they are computed with a single scan of the timelines,
+    otherwise every extractor runs on its own; one registry is shared by all
+    the extractors in both cases.
+
+    With a profiler every call is run and measured on its own (the fused
+    engine then scans the timelines once per call, serially), after a
+    'pokedex_registry' step that builds the shared lookups.
+    """
+    if profiler is not None and registry is None:
+        registry = profiler.measure('pokedex_registry', _build_registry, battle_data)
+
+    if fused:
+        ctx = FeatureContext(battle_data, registry=registry)
+        if profiler is None:
+            return _fused_blocks(calls, battle_data, FusedFeatureEngine(_dense_calls(calls), ctx=ctx), n_jobs=n_jobs)
+        return [profiler.measure('pokemon_encoding', pokemon_encoding, battle_data, **kwargs) if _is_sparse_onehot(extractor, kwargs)
+                else profiler.measure(_call_name(extractor), lambda: FusedFeatureEngine([(extractor, kwargs)], ctx=ctx).blocks(battle_data)[0], kwargs=kwargs)
+                for extractor, kwargs in calls]
+
+    # one registry for all the extractors that need the pokedex lookups
+    if registry is None:
+        registry = PokedexRegistry.from_data(battle_data)
+    df_list = []
+    for extractor, kwargs in calls:
+        if 'registry' in inspect.signature(extractor).parameters:
+            kwargs = {**kwargs, 'registry': registry}
+        if profiler is None:
+            df_list.append(extractor(battle_data, **kwargs))
         else:
-            flag_test = True
-            df_list = [
-                avg_team_vs_lead_stats(battle_data,difference=difference, test=flag_test),
-                avg_effectiveness2(battle_data, difference=difference, divide_turns=True,test=flag_test),
-                #category_impact_score(battle_data, difference=difference, test= flag_test, divide_turns=divide_turns),
-                #avg_stab_multiplier(battle_data, difference=difference, test=flag_test, divide_turns=divide_turns),
-                faint_count_diff_extractor(battle_data, difference=difference,test=flag_test),
-                avg_final_HP_pct(battle_data, difference=difference, test=flag_test),
-                avg_boost_diff_per_turn(battle_data, test=flag_test),
-                avg_stat_diff_per_turn(battle_data, test=flag_test, stats=['hp', 'atk', 'def', 'spa', 'spd', 'spe'], divide_turns=divide_turns),
-                accuracy_avg(battle_data, difference=difference, test=flag_test, divide_turns=divide_turns), 
-                granular_turn_counts(battle_data, difference=difference, test=flag_test),
-                ratio_category_diff(battle_data, difference=difference ,test=flag_test),
-                calculate_voluntary_swap_diff(battle_data, difference=difference,test=flag_test),
-                team_hp_advantage_flip_count(battle_data, test=flag_test),
-                damage_efficiency_ratio(battle_data, difference=difference, test=flag_test, divide_turns=divide_turns),
-                pokemon_encoding(battle_data, one_hot=one_hot , test=flag_test),
-                last_turn_status_extractor(battle_data, test=flag_test),
-                avg_approx_damage(battle_data, difference=difference , test=False)
-            ]            
+            df_list.append(profiler.measure(_call_name(extractor), extractor, battle_data, **kwargs))
+    return df_list
+
+
+def _call_name(extractor) -> str:
+    return extractor if isinstance(extractor, str) else extractor.__name__
+
+
+def _is_sparse_onehot(extractor, kwargs: dict) -> bool:
+    """True for a pokemon_encoding(one_hot=True, sparse=True) call."""
+    return _call_name(extractor) == 'pokemon_encoding' and bool(kwargs.get('one_hot')) and bool(kwargs.get('sparse'))
+
+
+def _dense_calls(calls: list[tuple]) -> list[tuple]:
+    """The calls the fused engine computes (all but the sparse one-hot ones)."""
+    return [(extractor, kwargs) for extractor, kwargs in calls if not _is_sparse_onehot(extractor, kwargs)]
+
+
+def _producer(extractor, kwargs: dict, fused: bool):
+    """The accumulator class that computes a call on the fused path (None when the extractor itself runs)."""
+    if not fused or _is_sparse_onehot(extractor, kwargs):
+        return None
+    return ACCUMULATORS[_call_name(extractor)]
 
 
+def _fused_blocks(calls: list[tuple], battle_data: list[dict], engine: FusedFeatureEngine, n_jobs: int = 1) -> list[pd.DataFrame]:
+    """ The frame of every call, in order: engine (built on _dense_calls(calls))
+    computes the dense ones with a single scan, the sparse one-hot calls are
+    built by pokemon_encoding straight from pokemon_onehot_matrix, so their
+    80 columns never exist as dense arrays."""
+    dense = iter(engine.run_blocks(battle_data, n_jobs=n_jobs) if engine.calls else [])
+    return [pokemon_encoding(battle_data, **kwargs) if _is_sparse_onehot(extractor, kwargs) else next(dense)
+            for extractor, kwargs in calls]
+
+
+def assemble_features(df_list: list[pd.DataFrame], assemble: str = 'concat') -> pd.DataFrame:
+    """ Join the per-extractor frames on battle_id: 'concat' (see concat_features)
+    or 'merge', the original chain of pd.merge calls."""
+    if assemble == 'concat':
+        return concat_features(df_list)
+    if assemble != 'merge':
+        raise ValueError(f"assemble must be 'concat' or 'merge', got '{assemble}'")
+
     # Start with the first DataFrame in the list
     final_dataset = df_list[0]
 
@@ -116,4 +158,116 @@ def generate_features(battle_data: list[dict], flag_test: bool, difference: bool
         # Iteratively merge, using both keys to avoid duplicates
         final_dataset = pd.merge(final_dataset, df_to_merge, on=['battle_id'])
 
-    return final_dataset
\ No newline at end of file
+    return final_dataset
+
+
+def _features_from_calls(calls: list[tuple], battle_data: list[dict], fused: bool, n_jobs: int, assemble: str, registry: PokedexRegistry,
+                         cache: FeatureCache, data_key: str, profiler: ExtractorProfiler) -> pd.DataFrame:
+    """ The assembled features of the calls (see generate_features for the options)."""
+    if cache is None and profiler is None:
+        if fused:
+            ctx = FeatureContext(battle_data, registry=registry)
+            dense_calls = _dense_calls(calls)
+            if len(dense_calls) == len(calls):
+                return FusedFeatureEngine(calls, ctx=ctx).run(battle_data, n_jobs=n_jobs)
+            df_list = _fused_blocks(calls, battle_data, FusedFeatureEngine(dense_calls, ctx=ctx), n_jobs=n_jobs)
+        else:
+            df_list = extractor_blocks(calls, battle_data, fused=False, registry=registry)
+    elif cache is None:
+        df_list = extractor_blocks(calls, battle_data, fused=fused, n_jobs=n_jobs, registry=registry, profiler=profiler)
+    else:
+        data_key = data_key or data_hash(battle_data)
+        registry = registry if registry is not None else PokedexRegistry.from_data(battle_data)
+        # the fused engine serves the lookups of every extractor from the registry, so it is part of every key
+        registry_key = registry.fingerprint()
+        keys = [cache.key(data_key, extractor, kwargs, registry_key=registry_key, accumulator=_producer(extractor, kwargs, fused))
+                for extractor, kwargs in calls]
+        df_list = [cache.get(key) for key in keys]
+        missing = [i for i, df in enumerate(df_list) if df is None]
+        if missing:
+            computed = extractor_blocks([calls[i] for i in missing], battle_data, fused=fused, n_jobs=n_jobs, registry=registry, profiler=profiler)
+            for i, df in zip(missing, computed):
+                cache.put(keys[i], df)
+                df_list[i] = df
+
+    if profiler is not None:
+        return profiler.measure('assemble', assemble_features, df_list, assemble=assemble)
+    return assemble_features(df_list, assemble=assemble)
+
+
+def generate_features(battle_data: list[dict], flag_test: bool, difference: bool = True, tree: bool = True, divide_turns: bool = True, fused: bool = False, n_jobs: int = 1, assemble: str = 'concat', registry: PokedexRegistry = None,
+                      cache: FeatureCache = None, data_key: str = None, profiler: ExtractorProfiler = None, spec: dict = None) -> pd.DataFrame:
+    """ Takes the raw battle data, generates all features, and joins them
+    into a single DataFrame. 
+    you can also select the right features for the specific model.
+
+    fused=False (the default) runs the extractors one by one; fused=True
+    computes every feature with a single scan of each battle timeline (see
+    engine.FusedFeatureEngine). Both paths return the same DataFrame.
+
+    n_jobs > 1 (or -1 for all the cores) needs fused=True: it splits the battles
+    into shards that are featurized in parallel processes by the fused engine,
+    with the lookup dictionaries built once and shared with the workers. The
+    output is the same as with n_jobs=1.
+
+    assemble selects how the per-extractor frames of the fused=False path are
+    joined: 'concat' (see concat_features) or 'merge', the original chain of
+    pd.merge on battle_id.
+
+    registry is the PokedexRegistry shared by all the extractors (e.g. loaded
+    with PokedexRegistry.from_file); when None it is built once from battle_data.
+
+    cache is an optional FeatureCache: the output of every extractor call is
+    looked up under (data_key, extractor, kwargs, registry, and with fused=True the
+    accumulator that computes it) and only the missing ones are
+    computed and stored. data_key identifies the dataset, e.g.
+    file_hash('Data/train.jsonl'); when None it is hashed from battle_data.
+
+    profiler is an optional ExtractorProfiler that records time, CPU, peak
+    memory and output shape of every extractor call (run one at a time, see
+    extractor_blocks) and of the final assembly. The output is unchanged.
+
+    spec is an optional feature-set spec (see feature_sets.feature_spec, or
+    load_feature_spec for a JSON / YAML file) that replaces difference, tree and
+    divide_turns: only the extractors it selects are computed and, with its
+    'columns' entry, only those columns are returned.
+    
+    """
+    calls = extractor_calls(flag_test, difference=difference, tree=tree, divide_turns=divide_turns, spec=spec)
+    if not fused and n_jobs != 1:
+        # each extractor builds its lookup dictionaries from the data it gets, so shards would change them
+        raise ValueError("n_jobs is only supported with fused=True")
+
+    df = _features_from_calls(calls, battle_data, fused=fused, n_jobs=n_jobs, assemble=assemble, registry=registry,
+                              cache=cache, data_key=data_key, profiler=profiler)
+    return df if spec is None else select_columns(df, spec)
+
+
+def generate_features_chunked(file_path: str, flag_test: bool, difference: bool = True, tree: bool = True, divide_turns: bool = True, chunk_size: int = 1000, registry: PokedexRegistry = None,
+                              spec: dict = None) -> pd.DataFrame:
+    """ Same features as generate_features, but read straight from a JSONL file
+    in chunks of chunk_size battles, so the parsed battles never have to fit in
+    memory all at once.
+
+    The file is read twice: a first streaming pass builds the lookup
+    dictionaries (see engine.FeatureContext.from_stream), the second one
+    featurizes each chunk with the fused engine and keeps only its feature rows.
+    Passing a cached registry skips the first pass.
+    The result is the same as generate_features(get_dict_from_json(file_path), ...).
+    """
+    calls = extractor_calls(flag_test, difference=difference, tree=tree, divide_turns=divide_turns, spec=spec)
+    if registry is not None:
+        ctx = FeatureContext(None, registry=registry)
+    else:
+        ctx = FeatureContext.from_stream(iter_battles(file_path))
+    dense_calls = _dense_calls(calls)
+    engine = FusedFeatureEngine(dense_calls, ctx=ctx)
+
+    if len(dense_calls) == len(calls):
+        chunks = [pd.DataFrame(list(engine.rows(chunk))) for chunk in iter_battle_chunks(file_path, chunk_size)]
+    else:
+        chunks = [concat_features(_fused_blocks(calls, chunk, engine)) for chunk in iter_battle_chunks(file_path, chunk_size)]
+    if not chunks:
+        return pd.DataFrame()
+    df = pd.concat(chunks, ignore_index=True)
+    return df if spec is None else select_columns(df, spec)
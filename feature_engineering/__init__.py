@@ -18,6 +18,8 @@ from .extractors import (
     team_hp_advantage_flip_count,
     damage_efficiency_ratio,
     pokemon_encoding,
+    pokemon_onehot_matrix,
+    pokemon_onehot_columns,
     avg_approx_damage,
     first_KO_momentum_feature,
     last_turn_status_extractor,
@@ -26,10 +28,15 @@ from .extractors import (
 
 from .utils import (
     get_dict_from_json,
+    iter_battles,
+    iter_battle_chunks,
     pokedex,            
     opponents_pokemon,  
     get_all_def_types,  
     effectiveness,      
+    effectiveness_batch,
+    type_codes,
+    def_type_codes,
     get_dict_def_types, 
     get_dict_attacker_types, 
     get_dict_base_stats,
@@ -38,9 +45,26 @@ from .utils import (
     get_all_effects,
     get_last_hp,
     get_p1_bench,
-    team_potential
+    team_potential,
+    pokedex_frame,
+    TeamHP
 )
-from .Aggregator import generate_features
+from .Aggregator import generate_features, generate_features_chunked, extractor_calls, extractor_blocks, concat_features, assemble_features
+from .engine import FusedFeatureEngine, FeatureContext
+from .tensor_store import BattleTensorStore
+from .pokedex_registry import PokedexRegistry
+from .cache import FeatureCache, file_hash, data_hash
+from .profiler import ExtractorProfiler
+from .matchups import MatchupTable, avg_approx_damage_from_store, category_impact_score_from_store
+from .segments import (TurnSegmenter, segment_bounds, avg_effectiveness2_from_store, avg_stab_multiplier_from_store,
+                       avg_stat_diff_per_turn_from_store, accuracy_avg_from_store)
+from .turn_tensors import (status_onehot, effect_onehot, team_hp_slots, avg_boost_diff_per_turn_from_store, granular_turn_counts_from_store,
+                           team_hp_advantage_flip_count_from_store)
+from .team_masks import (popcount, mask_names, bench_mask, tot_pok_used_from_store, last_turn_status_from_store,
+                         pokemon_onehot_matrix_from_store, pokemon_encoding_from_store)
+from .online import BattleState, online_extractor_calls, prefix_features, PREFIX_CUTOFFS
+from .feature_sets import FeatureDef, FEATURE_CATALOG, feature_spec, load_feature_spec, feature_calls, feature_columns
+from .incremental import FeatureStore, lookup_versions
 
 __all__ = [
     # Extractor Functions
@@ -61,6 +85,8 @@ __all__ = [
     'team_hp_advantage_flip_count',
     'damage_efficiency_ratio',
     'pokemon_encoding',
+    'pokemon_onehot_matrix',
+    'pokemon_onehot_columns',
     'avg_approx_damage',
     'first_KO_momentum_feature',
     'last_turn_status_extractor',
@@ -69,10 +95,15 @@ __all__ = [
 
     # Utility Functions
     'get_dict_from_json',
+    'iter_battles',
+    'iter_battle_chunks',
     'pokedex',
     'opponents_pokemon',
     'get_all_def_types',
     'effectiveness',
+    'effectiveness_batch',
+    'type_codes',
+    'def_type_codes',
     'get_dict_def_types',
     'get_dict_attacker_types',
     'get_dict_base_stats',
@@ -82,7 +113,76 @@ __all__ = [
     'get_last_hp',
     'get_p1_bench',
     'team_potential',
+    'pokedex_frame',
+    'TeamHP',
     
     # Aggregator Function
-    'generate_features'
+    'generate_features',
+    'generate_features_chunked',
+    'extractor_calls',
+    'extractor_blocks',
+    'concat_features',
+    'assemble_features',
+
+    # Single-pass engine
+    'FusedFeatureEngine',
+    'FeatureContext',
+
+    # Columnar storage and lookups
+    'BattleTensorStore',
+    'PokedexRegistry',
+    'MatchupTable',
+    'avg_approx_damage_from_store',
+    'category_impact_score_from_store',
+
+    # Turn segmentation
+    'TurnSegmenter',
+    'segment_bounds',
+    'avg_effectiveness2_from_store',
+    'avg_stab_multiplier_from_store',
+    'avg_stat_diff_per_turn_from_store',
+    'accuracy_avg_from_store',
+
+    # Turn tensor reductions
+    'status_onehot',
+    'effect_onehot',
+    'team_hp_slots',
+    'avg_boost_diff_per_turn_from_store',
+    'granular_turn_counts_from_store',
+    'team_hp_advantage_flip_count_from_store',
+
+    # Team state bitmasks
+    'popcount',
+    'mask_names',
+    'bench_mask',
+    'tot_pok_used_from_store',
+    'last_turn_status_from_store',
+    'pokemon_onehot_matrix_from_store',
+    'pokemon_encoding_from_store',
+
+    # Feature cache
+    'FeatureCache',
+    'file_hash',
+    'data_hash',
+
+    # Profiling
+    'ExtractorProfiler',
+
+    # Online featurization
+    'BattleState',
+    'online_extractor_calls',
+    'prefix_features',
+    'PREFIX_CUTOFFS',
+
+    # Feature sets
+    'FeatureDef',
+    'FEATURE_CATALOG',
+    'feature_spec',
+    'load_feature_spec',
+    'feature_calls',
+    'feature_columns',
+
+    # Incremental featurization
+    'FeatureStore',
+    'lookup_versions'
 ]
\ No newline at end of file
@@ -0,0 +1,201 @@
+# feature_engineering/cache.py
+"""
+On-disk feature cache.
+
+generate_features is rerun for train and test and for every
+tree / divide_turns / difference combination, recomputing every extractor
+from the JSON each time. FeatureCache stores the output of each extractor
+call as a .npz file under a content-addressed key (hash of the input data,
+extractor name, source code and kwargs, of the PokedexRegistry the
+extractor reads and, for the blocks of the fused engine, of the source of the
+accumulator classes that computed them), so reruns load the stored blocks
+instead.
+
+Only the source of the extractor function and of the accumulator classes is
+part of the key: bump CACHE_VERSION when a helper they call (utils,
+constants, the registry lookups) changes its output, so old entries stop
+matching.
+
+Blocks are plain arrays: string / object columns are stored as unicode
+arrays with a missing-value mask, pd.SparseDtype columns (fill 0) as their
+stored values and row indices, and files are read with allow_pickle=False,
+so loading a block from a shared folder never unpickles.
+
+The cache directory is capped in size: when it grows over max_bytes the least
+recently used entries are evicted. Hits, misses and evictions are counted.
+"""
+import hashlib
+import inspect
+import json
+import os
+import numpy as np
+import pandas as pd
+from scipy import sparse as sp
+
+# Bump when the helpers of the extractors change, so old entries stop matching
+CACHE_VERSION = 2
+
+
+def file_hash(file_path: str, block_size: int = 1 << 20) -> str:
+    """SHA-256 of a file content, read in blocks."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def data_hash(battle_data: list[dict]) -> str:
+    """SHA-256 of a list of battles (their canonical JSON), for data not read from a file."""
+    digest = hashlib.sha256()
+    for battle in battle_data:
+        digest.update(json.dumps(battle, sort_keys=True).encode())
+        digest.update(b'\n')
+    return digest.hexdigest()
+
+
+def _column_arrays(i: int, series: pd.Series) -> dict:
+    """Arrays of one column: object / string columns become unicode plus a missing-value mask (no pickle),
+    sparse columns with fill 0 their stored values plus their row indices."""
+    if isinstance(series.dtype, pd.SparseDtype) and series.dtype.fill_value == 0:
+        return {f'col_{i}': series.array.sp_values, f'sparse_{i}': series.array.sp_index.indices}
+    values = series.to_numpy()
+    if values.dtype != object:
+        return {f'col_{i}': values}
+    missing = pd.isna(series).to_numpy()
+    if not all(isinstance(v, str) for v, m in zip(values, missing) if not m):
+        raise ValueError(f"Column '{series.name}' holds objects that are not strings, it cannot be cached")
+    return {f'col_{i}': np.array(['' if m else v for v, m in zip(values, missing)], dtype=str), f'missing_{i}': missing}
+
+
+def save_frame(df: pd.DataFrame, path: str):
+    """Write a DataFrame as a .npz file (one array per column), atomically."""
+    arrays = {}
+    for i, c in enumerate(df.columns):
+        arrays.update(_column_arrays(i, df[c]))
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, __columns__=np.array(df.columns, dtype=str), __rows__=np.array(len(df)), **arrays)
+    os.replace(tmp_path, path)  # readers never see a partial file
+
+
+def load_frame(path: str) -> pd.DataFrame:
+    """Read a DataFrame written by save_frame."""
+    with np.load(path, allow_pickle=False) as archive:
+        columns = [str(c) for c in archive['__columns__']]
+        n_rows = int(archive['__rows__'])
+        data = {}
+        for i, c in enumerate(columns):
+            values = archive[f'col_{i}']
+            if f'sparse_{i}' in archive.files:
+                rows = archive[f'sparse_{i}']
+                column = sp.csc_matrix((values, (rows, np.zeros(len(rows), dtype=rows.dtype))), shape=(n_rows, 1))
+                values = pd.arrays.SparseArray.from_spmatrix(column)
+            elif f'missing_{i}' in archive.files:
+                values = values.astype(object)
+                values[archive[f'missing_{i}']] = None
+            data[c] = values
+        return pd.DataFrame(data, columns=columns, index=pd.RangeIndex(n_rows))
+
+
+def source_hash(extractor) -> str:
+    """SHA-256 of the source code of an extractor function ('' when it is not available)."""
+    try:
+        source = inspect.getsource(extractor)
+    except (OSError, TypeError):
+        return ''
+    return hashlib.sha256(source.encode()).hexdigest()
+
+
+def accumulator_hash(accumulator: type) -> str:
+    """SHA-256 of the source of an accumulator class and of its base classes defined in the same module."""
+    sources = [source_hash(cls) for cls in accumulator.__mro__ if cls.__module__ == accumulator.__module__]
+    return hashlib.sha256(''.join(sources).encode()).hexdigest()
+
+
+class FeatureCache:
+    """
+    Content-addressed cache of extractor outputs.
+
+    Args:
+        directory: folder holding the cached blocks (created if missing).
+        max_bytes: size cap of the folder; least recently used blocks are
+                   evicted when a new block makes it larger.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 1 << 30):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def stats(self) -> dict:
+        """Hit / miss / eviction counters of this instance and the current cache size."""
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'entries': len(self._entries()), 'bytes': self.size()}
+
+    def key(self, data_key: str, extractor, kwargs: dict, registry_key: str = None, accumulator: type = None) -> str:
+        """
+        Key of an extractor call on a dataset.
+
+        Args:
+            data_key: file_hash or data_hash of the battles.
+            extractor: the extractor function (or its name).
+            kwargs: keyword arguments of the call.
+            registry_key: PokedexRegistry.fingerprint() of the registry the extractor reads.
+            accumulator: the engine.ACCUMULATORS class that computed the block
+                         (fused path), None when the extractor itself ran.
+        """
+        name = extractor if isinstance(extractor, str) else extractor.__name__
+        source = '' if isinstance(extractor, str) else source_hash(extractor)
+        payload = {'version': CACHE_VERSION, 'data': data_key, 'extractor': name, 'source': source, 'kwargs': kwargs,
+                   'registry': registry_key, 'accumulator': None if accumulator is None else accumulator_hash(accumulator)}
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f'{key}.npz')
+
+    def _entries(self) -> list[str]:
+        return [os.path.join(self.directory, f) for f in os.listdir(self.directory) if f.endswith('.npz')]
+
+    def size(self) -> int:
+        """Total size in bytes of the cached blocks."""
+        return sum(os.path.getsize(path) for path in self._entries())
+
+    def get(self, key: str) -> pd.DataFrame:
+        """Return the cached DataFrame, or None on a miss."""
+        path = self._path(key)
+        try:
+            df = load_frame(path)
+        except (FileNotFoundError, OSError, KeyError, ValueError):
+            self.misses += 1
+            return None
+        os.utime(path)  # mark as recently used
+        self.hits += 1
+        return df
+
+    def put(self, key: str, df: pd.DataFrame):
+        """Store a DataFrame under key, then evict old blocks if the cache is too large."""
+        path = self._path(key)
+        save_frame(df, path)
+        self._evict(keep=path)
+
+    def _evict(self, keep: str = None):
+        entries = sorted(self._entries(), key=os.path.getmtime)
+        total = sum(os.path.getsize(path) for path in entries)
+        for path in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            total -= os.path.getsize(path)
+            os.remove(path)
+            self.evictions += 1
+
+    def clear(self):
+        """Remove every cached block."""
+        for path in self._entries():
+            os.remove(path)
@@ -42,4 +42,43 @@ type_chart = np.array([
     [1,   1,   1,   0.5, 2,   1,   0.5, 1,   1,   1,   1,   2,   1,   1,   1,   2,   0.5, 1,   0.5], # steel
     [1,   1,   1,   1,   1,   1,   1,   1,   1,   1,   1,   1,   1,   1,   1,   1,   1,   1,   1],  # stellar
     [1,   1,   0.5, 1,   1,   1,   2,   1,   1,   0.5, 1,   1,   1,   1,   1,   1,   1,   1,   0.5]  # water
-])
\ No newline at end of file
+])
+
+# The 20 pokemon species available in the battles (same order used by pokemon_encoding)
+pokemon_list = [
+    'alakazam', 'articuno', 'chansey', 'charizard', 'cloyster',
+    'dragonite', 'exeggutor', 'gengar', 'golem', 'jolteon',
+    'jynx', 'lapras', 'persian', 'rhydon', 'slowbro',
+    'snorlax', 'starmie', 'tauros', 'victreebel', 'zapdos'
+]
+pokemon_to_index = {p: i for i, p in enumerate(pokemon_list)}
+
+# Status conditions observed in the timelines ('fnt' marks a fainted pokemon)
+status_list = ['nostatus', 'brn', 'frz', 'par', 'psn', 'slp', 'tox', 'fnt']
+
+# Volatile effects observed in the timelines
+effect_list = [
+    'noeffect', 'clamp', 'confusion', 'disable', 'firespin',
+    'reflect', 'substitute', 'typechange', 'wrap'
+]
+
+# Move categories and boosted stats, in the order used by the extractors
+move_categories = ['PHYSICAL', 'SPECIAL', 'STATUS']
+boost_types = ['atk', 'def', 'spa', 'spd', 'spe']
+base_stat_names = ['hp', 'atk', 'def', 'spa', 'spd', 'spe']
+
+# Turn segments of the divide_turns features: name -> (start, end) of timeline[start:end]
+# (first 10, middle 10 and last 10 turns)
+TURN_SEGMENTS = {
+    'first_10': (0, 10),
+    'middle_10': (10, 20),
+    'last_10': (-10, None)  # Use slicing logic: last 10 turns
+}
+
+# Code used for a missing type ('notype') in the type-code arrays
+NO_TYPE = len(types)
+
+# Dual-type chart: dual_type_chart[att, def1, def2] = type_chart[att, def1] * type_chart[att, def2],
+# with an extra NO_TYPE slot on the defender axes (multiplier 1) for mono-type pokemon
+_chart_with_notype = np.hstack([type_chart, np.ones((len(types), 1))])
+dual_type_chart = _chart_with_notype[:, :, None] * _chart_with_notype[:, None, :]
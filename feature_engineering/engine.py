@@ -0,0 +1,1134 @@
+# feature_engineering/engine.py
+"""
+Single-pass (fused) feature engine.
+
+Every extractor in extractors.py loops over all the battles and over every
+turn of each timeline on its own, so generate_features ends up walking the
+same timelines ~17 times. This module rewrites those extractors as
+accumulators with a start / update / finish life cycle: the engine walks
+each battle's timeline exactly once, parses the per-turn states a single
+time and feeds every registered accumulator from that pass.
+
+The accumulators reproduce the arithmetic of the original extractors step by
+step, so the output is identical (same columns, same order, same values).
+
+This duplicates every extractor: a change to a feature in extractors.py has
+to be made to its accumulator in ACCUMULATORS too (the cached blocks of the
+fused path are keyed on the accumulator source, see cache.FeatureCache.key).
+tests/test_engine.py checks every accumulator against its extractor for all
+the calls of the feature catalogue, so a change made on one side only fails
+there. fused=False, the default of generate_features, runs the extractors.
+"""
+import json
+import os
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from collections import defaultdict, Counter
+import numpy as np
+import pandas as pd
+from .utils import *
+from .constants import TURN_SEGMENTS, pokemon_list, pokemon_to_index
+from .extractors import ACTIVE_STATUSES
+from .pokedex_registry import PokedexRegistry
+
+
+class FeatureContext:
+    """
+    Lookup dictionaries shared by all the accumulators of one engine run.
+
+    The dictionaries come from a single PokedexRegistry, built lazily from the
+    data the first time an accumulator asks for one (or passed in, e.g. loaded
+    from a cached file), instead of being rebuilt by every extractor call.
+    """
+
+    def __init__(self, data: list[dict], registry: PokedexRegistry = None):
+        self.data = data
+        self._registry = registry
+        self._effectiveness = {}
+
+    @classmethod
+    def from_stream(cls, battles) -> 'FeatureContext':
+        """
+        Build the context from an iterable of battles (e.g. utils.iter_battles)
+        without keeping the battles in memory.
+
+        The lookup dictionaries come from utils.pokedex, which keeps a single
+        entry per battle (the p2 lead, or the last p1 team member when there is
+        no lead), so only the distinct entries are kept and the dictionaries are
+        the same as the ones built from the full list.
+        """
+        entries = {}
+        for battle in battles:
+            p2_lead = battle.get('p2_lead_details')
+            if p2_lead:
+                slim = {'p2_lead_details': p2_lead}
+            else:
+                slim = {'p1_team_details': (battle.get('p1_team_details') or [])[-1:]}
+            entries.setdefault(json.dumps(slim, sort_keys=True), slim)
+        return cls(None, registry=PokedexRegistry.from_data(list(entries.values())))
+
+    def detached(self) -> 'FeatureContext':
+        """
+        Return a copy with every lookup dictionary already built and without
+        the battle data, small enough to be sent to worker processes.
+        """
+        for name in ('def_types', 'att_types', 'base_stats', 'base_stats1'):
+            getattr(self.registry, name)
+        return FeatureContext(None, registry=self.registry)
+
+    @property
+    def registry(self) -> PokedexRegistry:
+        if self._registry is None:
+            self._registry = PokedexRegistry.from_data(self.data)
+        return self._registry
+
+    @property
+    def def_types(self) -> dict:
+        return self.registry.def_types
+
+    @property
+    def att_types(self) -> dict:
+        return self.registry.att_types
+
+    @property
+    def base_stats(self) -> dict:
+        return self.registry.base_stats
+
+    @property
+    def base_stats1(self) -> dict:
+        return self.registry.base_stats1
+
+    def move_effectiveness(self, move_type: str, defender: str) -> float:
+        """Memoized effectiveness(move_type, def_types[defender])."""
+        key = (move_type, defender)
+        mult = self._effectiveness.get(key)
+        if mult is None:
+            mult = effectiveness(move_type, self.def_types.get(defender))
+            self._effectiveness[key] = mult
+        return mult
+
+
+class TurnView:
+    """Pre-parsed view of a single turn, shared by all the accumulators."""
+
+    __slots__ = ('index', 'turn', 'segments', 'p1_state', 'p2_state',
+                 'name1', 'name2', 'hp1', 'hp2', 'p1_move', 'p2_move')
+
+    def __init__(self, index: int, turn: dict, segments: tuple):
+        self.index = index
+        self.turn = turn
+        self.segments = segments  # indices of the TURN_SEGMENTS this turn belongs to
+
+        self.p1_state = turn.get('p1_pokemon_state') or {}
+        self.p2_state = turn.get('p2_pokemon_state') or {}
+
+        self.name1 = self.p1_state.get('name')
+        self.name2 = self.p2_state.get('name')
+
+        self.hp1 = self.p1_state.get('hp_pct')
+        self.hp2 = self.p2_state.get('hp_pct')
+
+        self.p1_move = turn.get('p1_move_details', {})
+        self.p2_move = turn.get('p2_move_details', {})
+
+
+def segment_ranges(n_turns: int, segments: dict = TURN_SEGMENTS) -> list[range]:
+    """Resolve every (start, end) segment into the range of turn indices it covers."""
+    return [range(n_turns)[start:end] for start, end in segments.values()]
+
+
+class FeatureAccumulator(ABC):
+    """
+    Base class of the accumulators driven by FusedFeatureEngine.
+
+    Subclasses implement:
+        start(battle, n_turns): reset the per-battle state.
+        update(view): consume one TurnView.
+        finish(battle): return the dict of feature columns for the battle,
+                        or None to drop the battle from the output.
+
+    Everything that depends on the timeline length is set by resize(n_turns),
+    so an online BattleState can grow the timeline one turn at a time.
+    """
+    per_turn = True  # False for battle-level features that never read the timeline
+
+    def __init__(self, ctx: FeatureContext, test: bool = False):
+        self.ctx = ctx
+        self.test = test
+
+    def start(self, battle: dict, n_turns: int):
+        self.resize(n_turns)
+
+    def resize(self, n_turns: int):
+        self.n_turns = n_turns
+
+    def update(self, view: TurnView):
+        pass
+
+    @abstractmethod
+    def finish(self, battle: dict) -> dict:
+        ...
+
+    def result(self, battle: dict) -> dict:
+        cols = self.finish(battle)
+        if cols is not None and not self.test:
+            cols['player_won'] = battle.get('player_won')
+        return cols
+
+
+class SegmentedAccumulator(FeatureAccumulator):
+    """
+    Accumulator with one set of running sums per turn segment (divide_turns).
+    finish emits the columns slot by slot, the same number of columns per slot.
+    """
+
+    def __init__(self, ctx: FeatureContext, divide_turns: bool = True, test: bool = False):
+        super().__init__(ctx, test=test)
+        self.divide_turns = divide_turns
+        self.slots = len(TURN_SEGMENTS) if divide_turns else 1
+
+    def resize(self, n_turns):
+        super().resize(n_turns)
+        if self.divide_turns:
+            self.segment_turns = [len(r) for r in segment_ranges(n_turns)]
+        else:
+            self.segment_turns = [n_turns]
+
+    def slots_of(self, view: TurnView) -> tuple:
+        """Indices of the running sums the current turn contributes to."""
+        return view.segments if self.divide_turns else (0,)
+
+
+class AvgTeamVsLeadStats(FeatureAccumulator):
+    """Accumulator version of extractors.avg_team_vs_lead_stats."""
+    per_turn = False
+    stats_to_calc = ['hp', 'atk', 'def', 'spa', 'spd', 'spe']
+
+    def __init__(self, ctx, difference=False, test=False):
+        super().__init__(ctx, test=test)
+        self.difference = difference
+
+    def finish(self, battle):
+        result = {}
+        p1_team = battle.get('p1_team_details', [])
+        p2_lead = battle.get('p2_lead_details', {})
+
+        for stat in self.stats_to_calc:
+            key = f'base_{stat}'
+            p1_mean = small_mean_var([pokemon.get(key, 0) for pokemon in p1_team])[0] if p1_team else 0.0
+            p2_lead_stat = p2_lead.get(key, 0)
+            if self.difference:
+                result[f'avg_team_vs_lead_{stat}_diff'] = p1_mean - p2_lead_stat
+            else:
+                result[f'p1_avg_base_{stat}'] = p1_mean
+                result[f'p2_lead_base_{stat}'] = p2_lead_stat
+        return result
+
+    def result(self, battle):
+        # the original extractor only adds the label when it is present
+        cols = self.finish(battle)
+        if not self.test and 'player_won' in battle:
+            cols['player_won'] = battle['player_won']
+        return cols
+
+
+class AvgEffectiveness2(SegmentedAccumulator):
+    """Accumulator version of extractors.avg_effectiveness2."""
+
+    def __init__(self, ctx, difference=False, divide_turns=True, test=False):
+        super().__init__(ctx, divide_turns=divide_turns, test=test)
+        self.difference = difference
+
+    def start(self, battle, n_turns):
+        super().start(battle, n_turns)
+        self.eff_p1 = [0.0] * self.slots
+        self.eff_p2 = [0.0] * self.slots
+
+    def update(self, view):
+        if view.p1_move:
+            eff = self.ctx.move_effectiveness(view.p1_move.get('type'), view.name2)
+            for s in self.slots_of(view):
+                self.eff_p1[s] += eff
+        if view.p2_move:
+            eff = self.ctx.move_effectiveness(view.p2_move.get('type'), view.name1)
+            for s in self.slots_of(view):
+                self.eff_p2[s] += eff
+
+    def finish(self, battle):
+        result = {}
+        for s, turns in enumerate(self.segment_turns):
+            avg_eff_p1 = self.eff_p1[s] / turns if turns else 0.0
+            avg_eff_p2 = self.eff_p2[s] / turns if turns else 0.0
+            suffix = f'_{list(TURN_SEGMENTS)[s]}' if self.divide_turns else ''
+            if self.difference:
+                result[f'avg_effectiveness_diff{suffix}'] = avg_eff_p1 - avg_eff_p2
+            else:
+                result[f'avg_effectiveness_p1{suffix}'] = avg_eff_p1
+                result[f'avg_effectiveness_p2{suffix}'] = avg_eff_p2
+        return result
+
+
+class CategoryImpactScore(SegmentedAccumulator):
+    """Accumulator version of extractors.category_impact_score."""
+
+    def __init__(self, ctx, difference=False, divide_turns=True, test=False):
+        super().__init__(ctx, divide_turns=divide_turns, test=test)
+        self.difference = difference
+
+    def start(self, battle, n_turns):
+        super().start(battle, n_turns)
+        self.score_p1 = [0] * self.slots
+        self.score_p2 = [0] * self.slots
+
+    @staticmethod
+    def _impact(move, stats_att, stats_def):
+        category = move.get('category', '').upper()
+        if category == 'PHYSICAL':
+            return stats_att[0] / (stats_def[1] if stats_def[1] != 0 else 1)  # base_atk / base_def
+        if category == 'SPECIAL':
+            return stats_att[2] / (stats_def[3] if stats_def[3] != 0 else 1)  # base_spa / base_spd
+        if category == 'STATUS':
+            return 1  # neutral impact for status moves
+        return None
+
+    def update(self, view):
+        dict_base_stats = self.ctx.base_stats
+        if view.name1 not in dict_base_stats or view.name2 not in dict_base_stats:
+            return
+        stats_1 = dict_base_stats[view.name1]
+        stats_2 = dict_base_stats[view.name2]
+        if view.p1_move:
+            impact = self._impact(view.p1_move, stats_1, stats_2)
+            if impact is not None:
+                for s in self.slots_of(view):
+                    self.score_p1[s] += impact
+        if view.p2_move:
+            impact = self._impact(view.p2_move, stats_2, stats_1)
+            if impact is not None:
+                for s in self.slots_of(view):
+                    self.score_p2[s] += impact
+
+    def finish(self, battle):
+        result = {}
+        for s, turns in enumerate(self.segment_turns):
+            cat_impact_p1 = self.score_p1[s] / turns if turns > 0 else 0.0
+            cat_impact_p2 = self.score_p2[s] / turns if turns > 0 else 0.0
+            if not self.divide_turns:
+                if self.difference:
+                    result['cat_impact_diff'] = cat_impact_p1 - cat_impact_p2
+                else:
+                    result['p1_cat_impact_score'] = cat_impact_p1
+                    result['p2_cat_impact_score'] = cat_impact_p2
+            else:
+                segment_name = list(TURN_SEGMENTS)[s]
+                if self.difference:
+                    result[f'{segment_name}_cat_impact_diff'] = cat_impact_p1 - cat_impact_p2
+                else:
+                    result[f'{segment_name}_p1_cat_impact'] = cat_impact_p1
+                    result[f'{segment_name}_p2_cat_impact'] = cat_impact_p2
+        return result
+
+
+class AvgStabMultiplier(SegmentedAccumulator):
+    """Accumulator version of extractors.avg_stab_multiplier."""
+
+    def __init__(self, ctx, difference=False, divide_turns=True, test=False):
+        super().__init__(ctx, divide_turns=divide_turns, test=test)
+        self.difference = difference
+
+    def start(self, battle, n_turns):
+        super().start(battle, n_turns)
+        self.stab_p1 = [0.0] * self.slots
+        self.stab_p2 = [0.0] * self.slots
+
+    def update(self, view):
+        pokemon_att_types = self.ctx.att_types
+        stab_1 = 1.0
+        if view.p1_move:
+            if view.p1_move.get('type', '').lower() in pokemon_att_types.get(view.name1, []):
+                stab_1 = 1.5
+        stab_2 = 1.0
+        if view.p2_move:
+            if view.p2_move.get('type', '').lower() in pokemon_att_types.get(view.name2, []):
+                stab_2 = 1.5
+        for s in self.slots_of(view):
+            self.stab_p1[s] += stab_1
+            self.stab_p2[s] += stab_2
+
+    def finish(self, battle):
+        result = {}
+        for s, turns in enumerate(self.segment_turns):
+            avg_stab_p1 = self.stab_p1[s] / turns if turns > 0 else 0.0
+            avg_stab_p2 = self.stab_p2[s] / turns if turns > 0 else 0.0
+            if not self.divide_turns:
+                if self.difference:
+                    result['avg_stab_diff'] = avg_stab_p1 - avg_stab_p2
+                else:
+                    result['avg_stab_p1'] = avg_stab_p1
+                    result['avg_stab_p2'] = avg_stab_p2
+            else:
+                segment_name = list(TURN_SEGMENTS)[s]
+                if self.difference:
+                    result[f'{segment_name}_stab_diff'] = avg_stab_p1 - avg_stab_p2
+                else:
+                    result[f'{segment_name}_stab_p1'] = avg_stab_p1
+                    result[f'{segment_name}_stab_p2'] = avg_stab_p2
+        return result
+
+
+class AvgFinalHPPct(FeatureAccumulator):
+    """Accumulator version of extractors.avg_final_HP_pct."""
+
+    def __init__(self, ctx, difference=False, test=False):
+        super().__init__(ctx, test=test)
+        self.difference = difference
+
+    def start(self, battle, n_turns):
+        self.p1_team_hp = TeamHP()
+        self.p2_team_hp = TeamHP()
+
+    def update(self, view):
+        self.p1_team_hp.set(view.name1, view.hp1)
+        self.p2_team_hp.set(view.name2, view.hp2)
+
+    def finish(self, battle):
+        full_hp_p1 = self.p1_team_hp.values() + [1.0] * (6 - len(self.p1_team_hp))
+        full_hp_p2 = self.p2_team_hp.values() + [1.0] * (6 - len(self.p2_team_hp))
+
+        avg_hp_pct_p1, var_hp_pct_p1 = small_mean_var(full_hp_p1)
+        avg_hp_pct_p2 = small_mean_var(full_hp_p2)[0]
+
+        # same as the extractor: both variances are computed on P1's team
+        var_hp_pct_p2 = var_hp_pct_p1
+
+        if self.difference:
+            return {'avg_final_hp_pct_diff': avg_hp_pct_p1 - avg_hp_pct_p2,
+                    'var_final_hp_pct_diff': var_hp_pct_p1 - var_hp_pct_p2}
+        return {'avg_final_hp_pct_p1': avg_hp_pct_p1,
+                'avg_final_hp_pct_p2': avg_hp_pct_p2,
+                'var_final_hp_pct_p1': var_hp_pct_p1,
+                'var_final_hp_pct_p2': var_hp_pct_p2}
+
+
+class AvgStatDiffPerTurn(SegmentedAccumulator):
+    """Accumulator version of extractors.avg_stat_diff_per_turn."""
+
+    def __init__(self, ctx, stats, divide_turns=True, test=False):
+        super().__init__(ctx, divide_turns=divide_turns, test=test)
+        self.stats = stats
+        self._pairs = {}  # (name1, name2) -> (base_hp_1, base_hp_2, {stat: base stat difference})
+
+    def start(self, battle, n_turns):
+        super().start(battle, n_turns)
+        self.stat_diffs = [{stat: 0.0 for stat in self.stats} for _ in range(self.slots)]
+
+    def _pair(self, name1, name2):
+        # the base stat differences only depend on the matchup, compute them once
+        pair = self._pairs.get((name1, name2))
+        if pair is None:
+            stats_p1 = self.ctx.base_stats1.get(name1, {})
+            stats_p2 = self.ctx.base_stats1.get(name2, {})
+            diffs = {stat: stats_p1.get(f'base_{stat}', 0) - stats_p2.get(f'base_{stat}', 0)
+                     for stat in self.stats if stat != 'hp'}
+            pair = (stats_p1.get('base_hp', 0), stats_p2.get('base_hp', 0), diffs)
+            self._pairs[(name1, name2)] = pair
+        return pair
+
+    def update(self, view):
+        base_hp_1, base_hp_2, diffs = self._pair(view.name1, view.name2)
+        # For HP, multiply by HP percentage
+        hp_diff = base_hp_1 * view.p1_state.get('hp_pct', 0) - base_hp_2 * view.p2_state.get('hp_pct', 0)
+        for s in self.slots_of(view):
+            totals = self.stat_diffs[s]
+            for stat in self.stats:
+                totals[stat] += hp_diff if stat == 'hp' else diffs[stat]
+
+    def finish(self, battle):
+        result = {}
+        for s, turns in enumerate(self.segment_turns):
+            for stat in self.stats:
+                avg_stat_diff = self.stat_diffs[s][stat] / turns if turns > 0 else 0.0
+                if self.divide_turns:
+                    result[f'{list(TURN_SEGMENTS)[s]}_{stat}_diff'] = avg_stat_diff
+                else:
+                    result[f'avg_{stat}_diff_per_turn'] = avg_stat_diff
+        return result
+
+
+class AvgBoostDiffPerTurn(FeatureAccumulator):
+    """Accumulator version of extractors.avg_boost_diff_per_turn."""
+    boost_types = ['atk', 'def', 'spa', 'spd', 'spe']
+
+    def start(self, battle, n_turns):
+        super().start(battle, n_turns)
+        self.total_boosts_p1 = {boost: 0.0 for boost in self.boost_types}
+        self.total_boosts_p2 = {boost: 0.0 for boost in self.boost_types}
+
+    def update(self, view):
+        p1_boosts = view.p1_state.get('boosts', {})
+        p2_boosts = view.p2_state.get('boosts', {})
+        for boost_type in self.boost_types:
+            self.total_boosts_p1[boost_type] += p1_boosts.get(boost_type, 0)
+            self.total_boosts_p2[boost_type] += p2_boosts.get(boost_type, 0)
+
+    def finish(self, battle):
+        result = {}
+        total_turns = self.n_turns
+        for boost_type in self.boost_types:
+            avg_boost_p1 = self.total_boosts_p1[boost_type] / total_turns if total_turns > 0 else 0.0
+            avg_boost_p2 = self.total_boosts_p2[boost_type] / total_turns if total_turns > 0 else 0.0
+            result[f'avg_{boost_type}_boost_diff'] = avg_boost_p1 - avg_boost_p2
+        return result
+
+
+class AccuracyAvg(SegmentedAccumulator):
+    """Accumulator version of extractors.accuracy_avg."""
+
+    def __init__(self, ctx, difference=False, divide_turns=True, test=False):
+        super().__init__(ctx, divide_turns=divide_turns, test=test)
+        self.difference = difference
+
+    def start(self, battle, n_turns):
+        super().start(battle, n_turns)
+        self.accuracy_p1 = [0.0] * self.slots
+        self.accuracy_p2 = [0.0] * self.slots
+        self.priority_p1 = [0.0] * self.slots
+        self.priority_p2 = [0.0] * self.slots
+
+    def update(self, view):
+        if view.p1_move:
+            accuracy_1 = view.p1_move.get('accuracy', 100)
+            priority_1 = view.p1_move.get('priority', 0)
+        else:
+            accuracy_1 = priority_1 = 0
+        if view.p2_move:
+            accuracy_2 = view.p2_move.get('accuracy', 100)
+            priority_2 = view.p2_move.get('priority', 0)
+        else:
+            accuracy_2 = priority_2 = 0
+        for s in self.slots_of(view):
+            self.accuracy_p1[s] += accuracy_1
+            self.accuracy_p2[s] += accuracy_2
+            self.priority_p1[s] += priority_1
+            self.priority_p2[s] += priority_2
+
+    def finish(self, battle):
+        result = {}
+        for s, turns in enumerate(self.segment_turns):
+            avg_accuracy_p1 = self.accuracy_p1[s] / turns if turns > 0 else 0.0
+            avg_accuracy_p2 = self.accuracy_p2[s] / turns if turns > 0 else 0.0
+            avg_priority_p1 = self.priority_p1[s] / turns if turns > 0 else 0.0
+            avg_priority_p2 = self.priority_p2[s] / turns if turns > 0 else 0.0
+            if not self.divide_turns:
+                if self.difference:
+                    result['avg_accuracy_diff'] = avg_accuracy_p1 - avg_accuracy_p2
+                    result['avg_priority_diff'] = avg_priority_p1 - avg_priority_p2
+                else:
+                    result['avg_accuracy_p1'] = avg_accuracy_p1
+                    result['avg_accuracy_p2'] = avg_accuracy_p2
+                    result['avg_priority_p1'] = avg_priority_p1
+                    result['avg_priority_p2'] = avg_priority_p2
+            else:
+                segment_name = list(TURN_SEGMENTS)[s]
+                if self.difference:
+                    result[f'{segment_name}_accuracy_diff'] = avg_accuracy_p1 - avg_accuracy_p2
+                    result[f'{segment_name}_priority_diff'] = avg_priority_p1 - avg_priority_p2
+                else:
+                    result[f'{segment_name}_accuracy_p1'] = avg_accuracy_p1
+                    result[f'{segment_name}_accuracy_p2'] = avg_accuracy_p2
+                    result[f'{segment_name}_priority_p1'] = avg_priority_p1
+                    result[f'{segment_name}_priority_p2'] = avg_priority_p2
+        return result
+
+
+class GranularTurnCounts(FeatureAccumulator):
+    """Accumulator version of extractors.granular_turn_counts."""
+    ALL_STATUSES = ['slp', 'par', 'psn', 'brn', 'frz']
+    NEGATIVE_EFFECTS = ['clamp', 'confusion', 'disable', 'firespin', 'wrap']
+
+    def __init__(self, ctx, difference=False, test=False):
+        super().__init__(ctx, test=test)
+        self.difference = difference
+
+    def start(self, battle, n_turns):
+        self.p1_status_counts = defaultdict(int)
+        self.p2_status_counts = defaultdict(int)
+        self.p1_effect_counts = defaultdict(int)
+        self.p2_effect_counts = defaultdict(int)
+
+    def update(self, view):
+        status_1 = view.p1_state.get('status', 'nostatus').lower()
+        if status_1 != 'nostatus':
+            self.p1_status_counts[status_1] += 1
+        status_2 = view.p2_state.get('status', 'nostatus').lower()
+        if status_2 != 'nostatus':
+            self.p2_status_counts[status_2] += 1
+
+        for effect in view.p1_state.get('effects', []):
+            if effect in self.NEGATIVE_EFFECTS:
+                self.p1_effect_counts[effect] += 1
+        for effect in view.p2_state.get('effects', []):
+            if effect in self.NEGATIVE_EFFECTS:
+                self.p2_effect_counts[effect] += 1
+
+    def finish(self, battle):
+        result = {}
+        for status in self.ALL_STATUSES:
+            p1_turns = self.p1_status_counts[status]
+            p2_turns = self.p2_status_counts[status]
+            if self.difference:
+                result[f'{status}_turn_diff'] = p1_turns - p2_turns
+            else:
+                result[f'p1_{status}_turns'] = p1_turns
+                result[f'p2_{status}_turns'] = p2_turns
+        for effect in self.NEGATIVE_EFFECTS:
+            p1_turns = self.p1_effect_counts[effect]
+            p2_turns = self.p2_effect_counts[effect]
+            if self.difference:
+                result[f'{effect}_turn_diff'] = p1_turns - p2_turns
+            else:
+                result[f'p1_{effect}_turns'] = p1_turns
+                result[f'p2_{effect}_turns'] = p2_turns
+        return result
+
+
+class FaintCountDiff(FeatureAccumulator):
+    """Accumulator version of extractors.faint_count_diff_extractor."""
+
+    def __init__(self, ctx, difference=True, test=False):
+        super().__init__(ctx, test=test)
+        self.difference = difference
+
+    def start(self, battle, n_turns):
+        self.p1_fainted_pokemon = set()
+        self.p2_fainted_pokemon = set()
+
+    def update(self, view):
+        if view.name1 is not None and view.hp1 == 0.0:
+            self.p1_fainted_pokemon.add(view.name1)
+        if view.name2 is not None and view.hp2 == 0.0:
+            self.p2_fainted_pokemon.add(view.name2)
+
+    def finish(self, battle):
+        if self.difference:
+            return {'faint_count_diff': len(self.p2_fainted_pokemon) - len(self.p1_fainted_pokemon)}
+        return {'faint_count_p1': len(self.p1_fainted_pokemon),
+                'faint_count_p2': len(self.p2_fainted_pokemon)}
+
+
+class RatioCategoryDiff(FeatureAccumulator):
+    """Accumulator version of extractors.ratio_category_diff."""
+    categories = ('PHYSICAL', 'SPECIAL', 'STATUS')
+
+    def __init__(self, ctx, difference=True, test=False):
+        super().__init__(ctx, test=test)
+        self.difference = difference
+
+    def start(self, battle, n_turns):
+        super().start(battle, n_turns)
+        self.p1_counts = dict.fromkeys(self.categories, 0)
+        self.p2_counts = dict.fromkeys(self.categories, 0)
+
+    def update(self, view):
+        if view.p1_move:
+            p1_category = view.p1_move.get('category').upper()
+            if p1_category in self.p1_counts:
+                self.p1_counts[p1_category] += 1
+        if view.p2_move:
+            p2_category = view.p2_move.get('category').upper()
+            if p2_category in self.p2_counts:
+                self.p2_counts[p2_category] += 1
+
+    def finish(self, battle):
+        total_turns = self.n_turns
+        p1_phy_ratio = self.p1_counts['PHYSICAL'] / total_turns
+        p1_spe_ratio = self.p1_counts['SPECIAL'] / total_turns
+        p1_sta_ratio = self.p1_counts['STATUS'] / total_turns
+        p2_phy_ratio = self.p2_counts['PHYSICAL'] / total_turns
+        p2_spe_ratio = self.p2_counts['SPECIAL'] / total_turns
+        p2_sta_ratio = self.p2_counts['STATUS'] / total_turns
+
+        if self.difference:
+            return {'phy_ratio_diff': p1_phy_ratio - p2_phy_ratio,
+                    'spe_ratio_diff': p1_spe_ratio - p2_spe_ratio,
+                    'sta_ratio_diff': p1_sta_ratio - p2_sta_ratio}
+        return {'p1_phy_ratio': p1_phy_ratio,
+                'p1_spe_ratio': p1_spe_ratio,
+                'p1_sta_ratio': p1_sta_ratio,
+                'p2_phy_ratio': p2_phy_ratio,
+                'p2_spe_ratio': p2_spe_ratio,
+                'p2_sta_ratio': p2_sta_ratio}
+
+
+class VoluntarySwapDiff(FeatureAccumulator):
+    """Accumulator version of extractors.calculate_voluntary_swap_diff."""
+
+    def __init__(self, ctx, difference=True, test=False):
+        super().__init__(ctx, test=test)
+        self.difference = difference
+
+    def start(self, battle, n_turns):
+        super().start(battle, n_turns)
+        self.p1_swaps = 0
+        self.p2_swaps = 0
+        self.p1_last_pokemon = None
+        self.p2_last_pokemon = None
+
+    def update(self, view):
+        # Handle the first turn (initial leads are not swaps)
+        if self.p1_last_pokemon is not None:
+            # A voluntary swap is when the name changes AND no move is used.
+            if view.name1 != self.p1_last_pokemon and not view.p1_move:
+                self.p1_swaps += 1
+            if view.name2 != self.p2_last_pokemon and not view.p2_move:
+                self.p2_swaps += 1
+        self.p1_last_pokemon = view.name1
+        self.p2_last_pokemon = view.name2
+
+    def finish(self, battle):
+        # the extractor skips empty battles, which drops them from the merged table
+        if not self.n_turns:
+            return None
+        if self.difference:
+            return {'voluntary_swap_diff': self.p1_swaps - self.p2_swaps}
+        return {'p1_voluntary_swaps': self.p1_swaps,
+                'p2_voluntary_swaps': self.p2_swaps}
+
+
+class TeamHpAdvantageFlipCount(FeatureAccumulator):
+    """Accumulator version of extractors.team_hp_advantage_flip_count."""
+
+    def __init__(self, ctx, team_size=6, test=False):
+        super().__init__(ctx, test=test)
+        self.team_size = team_size
+
+    def start(self, battle, n_turns):
+        self.total_flips = 0
+        self.p1_gained_adv_count = 0
+        self.p2_gained_adv_count = 0
+        self.last_advantage_state = 0
+        self.p1_team_hp = TeamHP(self.team_size)
+        self.p2_team_hp = TeamHP(self.team_size)
+
+    def update(self, view):
+        if view.name1 and view.hp1 is not None:
+            self.p1_team_hp.set(view.name1, view.hp1)
+        if view.name2 and view.hp2 is not None:
+            self.p2_team_hp.set(view.name2, view.hp2)
+
+        current_advantage_state = self.p1_team_hp.compare(self.p2_team_hp)
+
+        if current_advantage_state != self.last_advantage_state and self.last_advantage_state != 0:
+            self.total_flips += 1
+            if current_advantage_state == 1:
+                self.p1_gained_adv_count += 1
+            elif current_advantage_state == -1:
+                self.p2_gained_adv_count += 1
+
+        if current_advantage_state != 0:
+            self.last_advantage_state = current_advantage_state
+
+    def finish(self, battle):
+        return {'total_team_hp_adv_flips': self.total_flips,
+                'p1_gained_team_adv_count': self.p1_gained_adv_count,
+                'p2_gained_team_adv_count': self.p2_gained_adv_count}
+
+
+class DamageEfficiencyRatio(SegmentedAccumulator):
+    """Accumulator version of extractors.damage_efficiency_ratio."""
+
+    def __init__(self, ctx, difference=False, divide_turns=True, test=False):
+        super().__init__(ctx, divide_turns=divide_turns, test=test)
+        self.difference = difference
+
+    def start(self, battle, n_turns):
+        super().start(battle, n_turns)
+        # every segment starts again from a full-HP team, like the extractor
+        initial_p1 = [pokemon.get('name') for pokemon in battle.get('p1_team_details', []) if pokemon.get('name')]
+        p2_lead = battle.get('p2_lead_details', {})
+        initial_p2 = [p2_lead.get('name')] if p2_lead.get('name') else []
+
+        self.p1_team_hp = [TeamHP(names=initial_p1) for _ in range(self.slots)]
+        self.p2_team_hp = [TeamHP(names=initial_p2) for _ in range(self.slots)]
+        self.hp_loss_by_p1 = [0.0] * self.slots
+        self.hp_loss_by_p2 = [0.0] * self.slots
+
+    def update(self, view):
+        p1_name, p2_name, p1_hp_pct, p2_hp_pct = view.name1, view.name2, view.hp1, view.hp2
+        # Skip turns with incomplete data
+        if p1_name is None or p2_name is None or p1_hp_pct is None or p2_hp_pct is None:
+            return
+        for s in self.slots_of(view):
+            last_p1_hp = self.p1_team_hp[s].set(p1_name, p1_hp_pct)
+            if p1_hp_pct < last_p1_hp:
+                self.hp_loss_by_p1[s] += (last_p1_hp - p1_hp_pct)
+
+            last_p2_hp = self.p2_team_hp[s].set(p2_name, p2_hp_pct)
+            if p2_hp_pct < last_p2_hp:
+                self.hp_loss_by_p2[s] += (last_p2_hp - p2_hp_pct)
+
+    def finish(self, battle):
+        result = {}
+        for s in range(self.slots):
+            hp_loss_by_p1 = self.hp_loss_by_p1[s]
+            hp_loss_by_p2 = self.hp_loss_by_p2[s]
+            p1_der = hp_loss_by_p2 + 1.0 if hp_loss_by_p1 == 0.0 else hp_loss_by_p2 / hp_loss_by_p1
+            p2_der = hp_loss_by_p1 + 1.0 if hp_loss_by_p2 == 0.0 else hp_loss_by_p1 / hp_loss_by_p2
+            prefix = f'{list(TURN_SEGMENTS)[s]}_' if self.divide_turns else ''
+            if self.difference:
+                result[f'{prefix}der_diff'] = p1_der - p2_der
+            else:
+                result[f'{prefix}p1_der'] = p1_der
+                result[f'{prefix}p2_der'] = p2_der
+        return result
+
+
+class PokemonEncoding(FeatureAccumulator):
+    """Accumulator version of extractors.pokemon_encoding (dense rows only: the Aggregator
+    computes the sparse=True calls with pokemon_encoding, from the CSR matrix)."""
+    pokemon_list = pokemon_list
+    name_to_idx = pokemon_to_index
+
+    def __init__(self, ctx, one_hot=False, test=False, sparse=False):
+        super().__init__(ctx, test=test)
+        self.one_hot = one_hot
+        self.sparse = sparse
+
+    def start(self, battle, n_turns):
+        # names in order of appearance; the dict keys double as a fast membership test
+        self.p1_seen = {}
+        self.p2_seen = {}
+        self.p1_fainted = set()
+        self.p2_fainted = set()
+
+    def update(self, view):
+        if view.name1:
+            nl1 = view.name1.lower()
+            self.p1_seen[nl1] = None
+            if view.hp1 == 0.0:
+                self.p1_fainted.add(nl1)
+        if view.name2:
+            nl2 = view.name2.lower()
+            self.p2_seen[nl2] = None
+            if view.hp2 == 0.0:
+                self.p2_fainted.add(nl2)
+
+    def finish(self, battle):
+        row = {}
+        self.p1_names = list(self.p1_seen)
+        self.p2_names = list(self.p2_seen)
+        if self.one_hot:
+            for pname in self.pokemon_list:
+                row[f'p1_{pname}_seen'] = 1 if pname in self.p1_seen else 0
+                row[f'p1_{pname}_fainted'] = 1 if pname in self.p1_fainted else 0
+                row[f'p2_{pname}_seen'] = 1 if pname in self.p2_seen else 0
+                row[f'p2_{pname}_fainted'] = 1 if pname in self.p2_fainted else 0
+        else:
+            for player, names, fainted in (('p1', self.p1_names, self.p1_fainted),
+                                           ('p2', self.p2_names, self.p2_fainted)):
+                for i in range(6):
+                    if i < len(names):
+                        row[f'{player}_pokemon_{i+1}'] = self.name_to_idx.get(names[i], -1)
+                        row[f'{player}_status_{i+1}'] = 0 if names[i] in fainted else 1
+                    else:
+                        row[f'{player}_pokemon_{i+1}'] = -1
+                        row[f'{player}_status_{i+1}'] = -1  # not seen in timeline
+        return row
+
+
+class AvgApproxDamage(FeatureAccumulator):
+    """Accumulator version of extractors.avg_approx_damage."""
+    LEVEL_CONSTANT = 42.0  # ( (2 * 100) / 5 + 2 )
+    RANDOM_AVG = 0.925     # Average of (217..255)/255
+
+    def __init__(self, ctx, difference=True, test=False):
+        super().__init__(ctx, test=test)
+        self.difference = difference
+        self._damages = {}  # (move category, base_power, type, attacker, defender) -> damage
+
+    def start(self, battle, n_turns):
+        super().start(battle, n_turns)
+        self.total_approx_damage_p1 = 0.0
+        self.total_approx_damage_p2 = 0.0
+
+    def _damage(self, move, attacker, defender):
+        category = move.get('category', '').upper()
+        base_power = move.get('base_power', 0)
+        move_type = move.get('type')
+        key = (category, base_power, move_type, attacker, defender)
+        if key not in self._damages:
+            self._damages[key] = self._compute_damage(category, base_power, move_type, attacker, defender)
+        return self._damages[key]
+
+    def _compute_damage(self, category, base_power, move_type, attacker, defender):
+        stats_att = self.ctx.base_stats[attacker]  # [atk, def, spa, spd]
+        stats_def = self.ctx.base_stats[defender]
+        att_types = self.ctx.att_types.get(attacker, [])
+        if not (category in ('PHYSICAL', 'SPECIAL') and base_power > 0 and move_type
+                and self.ctx.def_types.get(defender)):
+            return None
+        if category == 'PHYSICAL':
+            stat_ratio = stats_att[0] / (stats_def[1] if stats_def[1] != 0 else 1)
+        else:  # SPECIAL
+            stat_ratio = stats_att[2] / (stats_def[3] if stats_def[3] != 0 else 1)
+        stab = 1.5 if move_type.lower() in att_types else 1.0
+        modifier = stab * self.ctx.move_effectiveness(move_type, defender) * self.RANDOM_AVG
+        return (((self.LEVEL_CONSTANT * stat_ratio * base_power) / 50) + 2) * modifier
+
+    def update(self, view):
+        dict_base_stats = self.ctx.base_stats
+        name1, name2 = view.name1, view.name2
+        if name1 not in dict_base_stats or name2 not in dict_base_stats:
+            return
+        if view.p1_move:
+            damage = self._damage(view.p1_move, name1, name2)
+            if damage is not None:
+                self.total_approx_damage_p1 += damage
+        if view.p2_move:
+            damage = self._damage(view.p2_move, name2, name1)
+            if damage is not None:
+                self.total_approx_damage_p2 += damage
+
+    def finish(self, battle):
+        total_turns = self.n_turns
+        avg_damage_p1 = self.total_approx_damage_p1 / total_turns if total_turns > 0 else 0.0
+        avg_damage_p2 = self.total_approx_damage_p2 / total_turns if total_turns > 0 else 0.0
+        if self.difference:
+            return {'avg_approx_damage_diff': avg_damage_p1 - avg_damage_p2}
+        return {'p1_avg_approx_damage': avg_damage_p1,
+                'p2_avg_approx_damage': avg_damage_p2}
+
+
+class FirstKOMomentum(FeatureAccumulator):
+    """Accumulator version of extractors.first_KO_momentum_feature."""
+
+    def start(self, battle, n_turns):
+        self.first_KO_turn = 31  # sentinel for "no KO in first 30 turns"
+        self.first_KO_side = None
+        self.prev_p1_hp = 1.0
+        self.prev_p2_hp = 1.0
+
+    def update(self, view):
+        if self.first_KO_side is not None:
+            return
+        p1_hp = view.p1_state.get('hp_pct', 1.0)
+        p2_hp = view.p2_state.get('hp_pct', 1.0)
+
+        # detect a KO (HP drops from >0 to 0)
+        if self.prev_p2_hp > 0 and p2_hp == 0:
+            self.first_KO_turn = view.turn.get('turn', 31)
+            self.first_KO_side = 'p1'
+        elif self.prev_p1_hp > 0 and p1_hp == 0:
+            self.first_KO_turn = view.turn.get('turn', 31)
+            self.first_KO_side = 'p2'
+        self.prev_p1_hp, self.prev_p2_hp = p1_hp, p2_hp
+
+    def finish(self, battle):
+        if self.first_KO_side == 'p1':
+            feature_value = 1.0 / self.first_KO_turn
+        elif self.first_KO_side == 'p2':
+            feature_value = -1.0 / self.first_KO_turn
+        else:
+            feature_value = 0.0
+        return {'first_KO_momentum': feature_value}
+
+
+class LastTurnStatus(FeatureAccumulator):
+    """Accumulator version of extractors.last_turn_status_extractor."""
+
+    def start(self, battle, n_turns):
+        self.p1_final_statuses = {}
+        self.p2_final_statuses = {}
+
+    def update(self, view):
+        self.p1_final_statuses[view.name1] = view.p1_state['status']
+        self.p2_final_statuses[view.name2] = view.p2_state['status']
+
+    def finish(self, battle):
+        # iterate the extractor's own set, so the columns come out in the same order
+        p1_counts = Counter(status for status in self.p1_final_statuses.values() if status != 'fnt')
+        p2_counts = Counter(status for status in self.p2_final_statuses.values() if status != 'fnt')
+        result = {}
+        for status in ACTIVE_STATUSES:
+            result[f"status_{status}_diff"] = p1_counts.get(status, 0) - p2_counts.get(status, 0)
+        return result
+
+
+class TotPokUsed(FeatureAccumulator):
+    """Accumulator version of extractors.tot_pok_used."""
+
+    def start(self, battle, n_turns):
+        self.p1_seen = set()
+        self.p2_seen = set()
+
+    def update(self, view):
+        self.p1_seen.add(view.name1)
+        self.p2_seen.add(view.name2)
+
+    def finish(self, battle):
+        return {'pok_used_diff': len(self.p1_seen) - len(self.p2_seen)}
+
+
+# extractor name -> accumulator class
+ACCUMULATORS = {
+    'avg_team_vs_lead_stats': AvgTeamVsLeadStats,
+    'avg_effectiveness2': AvgEffectiveness2,
+    'category_impact_score': CategoryImpactScore,
+    'avg_stab_multiplier': AvgStabMultiplier,
+    'avg_final_HP_pct': AvgFinalHPPct,
+    'avg_stat_diff_per_turn': AvgStatDiffPerTurn,
+    'avg_boost_diff_per_turn': AvgBoostDiffPerTurn,
+    'accuracy_avg': AccuracyAvg,
+    'granular_turn_counts': GranularTurnCounts,
+    'faint_count_diff_extractor': FaintCountDiff,
+    'ratio_category_diff': RatioCategoryDiff,
+    'calculate_voluntary_swap_diff': VoluntarySwapDiff,
+    'team_hp_advantage_flip_count': TeamHpAdvantageFlipCount,
+    'damage_efficiency_ratio': DamageEfficiencyRatio,
+    'pokemon_encoding': PokemonEncoding,
+    'avg_approx_damage': AvgApproxDamage,
+    'first_KO_momentum_feature': FirstKOMomentum,
+    'last_turn_status_extractor': LastTurnStatus,
+    'tot_pok_used': TotPokUsed,
+}
+
+
+class FusedFeatureEngine:
+    """
+    Runs a list of extractor calls with a single scan of every battle timeline.
+
+    Args:
+        calls: list of (extractor, kwargs) pairs, the same calls generate_features
+               would make (e.g. (accuracy_avg, {'difference': True, 'test': True})).
+               The extractor can be given as the function or as its name.
+        ctx: optional FeatureContext to reuse lookup dictionaries across runs.
+    """
+
+    def __init__(self, calls: list[tuple], ctx: FeatureContext = None):
+        self.calls = calls
+        self.ctx = ctx
+        self._segments_cache = {}
+
+    def _turn_segments(self, n_turns: int) -> list[tuple]:
+        """For every turn index, the tuple of segments it belongs to."""
+        if n_turns not in self._segments_cache:
+            ranges = segment_ranges(n_turns)
+            self._segments_cache[n_turns] = [
+                tuple(s for s, r in enumerate(ranges) if i in r) for i in range(n_turns)
+            ]
+        return self._segments_cache[n_turns]
+
+    def build_accumulators(self, ctx: FeatureContext) -> list[FeatureAccumulator]:
+        accumulators = []
+        for extractor, kwargs in self.calls:
+            name = extractor if isinstance(extractor, str) else extractor.__name__
+            if name not in ACCUMULATORS:
+                raise ValueError(f"No fused accumulator registered for extractor '{name}'")
+            accumulators.append(ACCUMULATORS[name](ctx, **kwargs))
+        return accumulators
+
+    def results(self, data: list[dict], ctx: FeatureContext = None):
+        """
+        Yield (battle, results) for every battle, where results holds the output
+        columns of each call in order (None when that extractor drops the battle).
+        """
+        ctx = ctx or self.ctx or FeatureContext(data)
+        accumulators = self.build_accumulators(ctx)
+        updates = [acc.update for acc in accumulators if acc.per_turn]
+
+        for battle in data:
+            timeline = battle.get('battle_timeline') or []
+            n_turns = len(timeline)
+            turn_segments = self._turn_segments(n_turns)
+
+            for acc in accumulators:
+                acc.start(battle, n_turns)
+
+            for i, turn in enumerate(timeline):
+                view = TurnView(i, turn, turn_segments[i])
+                for update in updates:
+                    update(view)
+
+            yield battle, [acc.result(battle) for acc in accumulators]
+
+    def rows(self, data: list[dict], ctx: FeatureContext = None):
+        """Yield one feature dict per battle (battles dropped by an extractor are skipped)."""
+        for battle, results in self.results(data, ctx):
+            row = {'battle_id': battle['battle_id']}
+            for cols in results:
+                if cols is None:
+                    row = None
+                    break
+                row.update(cols)
+            if row is not None:
+                yield row
+
+    def blocks(self, data: list[dict], ctx: FeatureContext = None) -> list[pd.DataFrame]:
+        """
+        Return one DataFrame per call, the same frame the extractor itself would
+        return (battle_id, its features and player_won when test=False), still
+        computed with a single scan of the timelines.
+        """
+        rows = [[] for _ in self.calls]
+        for battle, results in self.results(data, ctx):
+            for block, cols in zip(rows, results):
+                if cols is not None:
+                    block.append({'battle_id': battle['battle_id'], **cols})
+        return [pd.DataFrame(block) if block else pd.DataFrame(columns=['battle_id']) for block in rows]
+
+    def _map_shards(self, data: list[dict], n_jobs: int, featurize):
+        """Run featurize on contiguous shards of data in a process pool, results in shard order."""
+        ctx = (self.ctx or FeatureContext(data)).detached()
+        # a few shards per worker, to balance battles of different lengths
+        n_shards = min(len(data), 4 * n_jobs)
+        bounds = np.linspace(0, len(data), n_shards + 1).astype(int)
+        shards = [data[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker, initargs=(self.calls, ctx)) as pool:
+            return list(pool.map(featurize, shards))
+
+    @staticmethod
+    def _workers(n_jobs: int) -> int:
+        if n_jobs is not None and n_jobs < 0:
+            return os.cpu_count() or 1
+        return n_jobs or 1
+
+    def run(self, data: list[dict], n_jobs: int = 1) -> pd.DataFrame:
+        """
+        Compute all the features of data in one pass and return them as a DataFrame.
+
+        With n_jobs > 1 (or -1 for all the cores) the battles are split into
+        contiguous shards featurized by a process pool. The lookup dictionaries
+        are built once here and sent to each worker a single time; the shard
+        frames are concatenated in the original battle order, so the result
+        is identical to the serial run.
+        """
+        n_jobs = self._workers(n_jobs)
+        if n_jobs <= 1 or len(data) < 2:
+            return pd.DataFrame(list(self.rows(data)))
+        return pd.concat(self._map_shards(data, n_jobs, _featurize_shard), ignore_index=True)
+
+    def run_blocks(self, data: list[dict], n_jobs: int = 1) -> list[pd.DataFrame]:
+        """Like run, but return the per-call frames of blocks()."""
+        n_jobs = self._workers(n_jobs)
+        if n_jobs <= 1 or len(data) < 2:
+            return self.blocks(data)
+        shard_blocks = self._map_shards(data, n_jobs, _featurize_shard_blocks)
+        return [pd.concat(frames, ignore_index=True) for frames in zip(*shard_blocks)]
+
+
+# Engine of the current worker process, set once by _init_worker
+_worker_engine = None
+
+
+def _init_worker(calls: list[tuple], ctx: FeatureContext):
+    global _worker_engine
+    _worker_engine = FusedFeatureEngine(calls, ctx=ctx)
+
+
+def _featurize_shard(shard: list[dict]) -> pd.DataFrame:
+    return pd.DataFrame(list(_worker_engine.rows(shard)))
+
+
+def _featurize_shard_blocks(shard: list[dict]) -> list[pd.DataFrame]:
+    return _worker_engine.blocks(shard)
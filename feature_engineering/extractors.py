@@ -2,13 +2,18 @@
 from collections import defaultdict,Counter
 import numpy as np
 import pandas as pd
+from scipy.sparse import csr_matrix
 from .utils import *
+from .constants import TURN_SEGMENTS, pokemon_list, pokemon_to_index
+from .pokedex_registry import PokedexRegistry
 
-def avg_effectiveness_1(data: list[dict], difference=False, test=False) -> pd.DataFrame:
+def avg_effectiveness_1(data: list[dict], difference=False, test=False, registry: PokedexRegistry = None) -> pd.DataFrame:
     """ Given the database 
         calculate the average effective multiplier of all moves used by P1 and P2 throughout the turns.
     """
-    pokemon_def_types = get_dict_def_types(data)
+    if registry is None:
+        registry = PokedexRegistry.from_data(data)
+    pokemon_def_types = registry.def_types
     final=[]
     for battle in data:
         total_turns=0 
@@ -55,7 +60,7 @@ def avg_effectiveness_1(data: list[dict], difference=False, test=False) -> pd.Da
     return pd.DataFrame(final)
 
 
-def avg_effectiveness_1_1(data: list[dict], difference=False, include_status_moves=True, test=False) -> pd.DataFrame:
+def avg_effectiveness_1_1(data: list[dict], difference=False, include_status_moves=True, test=False, registry: PokedexRegistry = None) -> pd.DataFrame:
     """ Given the database
         calculate the average effective multiplier of all moves used by P1 and P2 throughout the turns.
         This version includes an option to include or exclude Status moves from the calculation, given the fact that they do not deal damage.
@@ -66,7 +71,9 @@ def avg_effectiveness_1_1(data: list[dict], difference=False, include_status_mov
             include_status_moves (bool): If True, Status moves are included in the average (default behavior).
                                          If False, only Physical and Special moves contribute to total_effectiveness.
     """
-    pokemon_def_types = get_dict_def_types(data)
+    if registry is None:
+        registry = PokedexRegistry.from_data(data)
+    pokemon_def_types = registry.def_types
     final=[]
     for battle in data:
         total_turns=0 
@@ -123,7 +130,7 @@ def avg_effectiveness_1_1(data: list[dict], difference=False, include_status_mov
     return pd.DataFrame(final)
 
 # Extended version of avg_effectiveness with turn segmentation
-def avg_effectiveness2(data: list[dict], difference: bool = False, divide_turns: bool = True, test: bool = False) -> pd.DataFrame:
+def avg_effectiveness2(data: list[dict], difference: bool = False, divide_turns: bool = True, test: bool = False, registry: PokedexRegistry = None) -> pd.DataFrame:
     """ Given the database, dict with pokemon name:list of types 
     calculate the average effectiveness of all moves used by P1 and P2 in each battle.
     
@@ -132,16 +139,11 @@ def avg_effectiveness2(data: list[dict], difference: bool = False, divide_turns:
     :param divide_turns: If True, computes separate averages for the first 10, middle 10, and last 10 turns.
     :return: A pandas DataFrame with the calculated average effectiveness data.
     """
-    pokemon_def_types= get_dict_def_types(data)
+    if registry is None:
+        registry = PokedexRegistry.from_data(data)
+    pokemon_def_types = registry.def_types
 
     final = []
-    
-    # Define turn segmentation boundaries
-    TURN_SEGMENTS = {
-        'first_10': (0, 10),
-        'middle_10': (10, 20),
-        'last_10': (-10, None) # Use slicing logic: last 10 turns
-    }
 
     for battle in data:
         timeline = battle['battle_timeline']
@@ -257,7 +259,7 @@ def avg_effectiveness2(data: list[dict], difference: bool = False, divide_turns:
     return pd.DataFrame(final)
 
 
-def category_impact_score(data: list[dict], difference=False, divide_turns=True, test=False):
+def category_impact_score(data: list[dict], difference=False, divide_turns=True, test=False, registry: PokedexRegistry = None):
     """Given the database, calculate the average category impact score of all moves used by P1 and P2 throughout the turns.
        Category impact score is defined as: base_atk/base_def for Physical moves and base_spa/base_spd for Special moves.
        
@@ -266,15 +268,12 @@ def category_impact_score(data: list[dict], difference=False, divide_turns=True,
             difference: If True, returns the difference between P1 and P2 scores
             divide_turns: If True, computes separate averages for first 10, middle 10, and last 10 turns
             test: If True, excludes player_won from output
+            registry: optional PokedexRegistry shared across extractors (built from data if None)
     """
-    
-    TURN_SEGMENTS = {
-        'first_10': (0, 10),
-        'middle_10': (10, 20),
-        'last_10': (-10, None)  # Use slicing logic: last 10 turns
-    }
 
-    dict_base_stats = get_dict_base_stats(data)
+    if registry is None:
+        registry = PokedexRegistry.from_data(data)
+    dict_base_stats = registry.base_stats
     final = []
     for battle in data:
         if not divide_turns:
@@ -417,7 +416,7 @@ def category_impact_score(data: list[dict], difference=False, divide_turns=True,
     return pd.DataFrame(final)
 
 
-def avg_stab_multiplier(data: list[dict], difference: bool = False, divide_turns: bool = True, test: bool = False) -> pd.DataFrame:
+def avg_stab_multiplier(data: list[dict], difference: bool = False, divide_turns: bool = True, test: bool = False, registry: PokedexRegistry = None) -> pd.DataFrame:
     """
     Calculates the average STAB multiplier (1.5 for STAB, 1.0 for non-STAB/Status) 
     for all moves used by P1 and P2 throughout the battle.
@@ -427,18 +426,16 @@ def avg_stab_multiplier(data: list[dict], difference: bool = False, divide_turns
         difference: If True, returns the difference (P1 - P2) in average STAB multipliers
         divide_turns: If True, computes separate averages for first 10, middle 10, and last 10 turns
         test: If True, excludes player_won from output
+        registry: optional PokedexRegistry shared across extractors (built from data if None)
         
     Returns:
         A pandas DataFrame with the calculated average STAB multiplier data.
     """
-    TURN_SEGMENTS = {
-        'first_10': (0, 10),
-        'middle_10': (10, 20),
-        'last_10': (-10, None)  # Use slicing logic: last 10 turns
-    }
     
     # Helper dictionary to quickly get the attacking Pokémon's type(s)
-    pokemon_att_types = get_dict_attacker_types(data)
+    if registry is None:
+        registry = PokedexRegistry.from_data(data)
+    pokemon_att_types = registry.att_types
     
     final = []
     
@@ -581,8 +578,8 @@ def avg_final_HP_pct(data: list[dict], difference: bool = False, test: bool = Fa
 
     final = []
     for battle in data:
-        p1_dict={} # collect life percentages of each pokemon in p1 team
-        p2_dict={} # collect life percentages of each pokemon in p2 team
+        p1_team_hp = TeamHP() # collect life percentages of each pokemon in p1 team
+        p2_team_hp = TeamHP() # collect life percentages of each pokemon in p2 team
 
         for turn in battle['battle_timeline']:
             p1_pokemon_state = turn.get('p1_pokemon_state', {})
@@ -594,13 +591,13 @@ def avg_final_HP_pct(data: list[dict], difference: bool = False, test: bool = Fa
             Hp_1 = p1_pokemon_state.get('hp_pct')
             Hp_2 = p2_pokemon_state.get('hp_pct')
 
-            p1_dict[name1] = Hp_1
-            p2_dict[name2] = Hp_2
+            p1_team_hp.set(name1, Hp_1)
+            p2_team_hp.set(name2, Hp_2)
 
         # calculate the average even if a pokemon is fainted (0% hp) or not present (100% hp)
         # assuming a team of 6 pokemons
-        full_hp_p1 = list(p1_dict.values()) + [1.0] * (6 - len(p1_dict))
-        full_hp_p2 = list(p2_dict.values()) + [1.0] * (6 - len(p2_dict))
+        full_hp_p1 = p1_team_hp.values() + [1.0] * (6 - len(p1_team_hp))
+        full_hp_p2 = p2_team_hp.values() + [1.0] * (6 - len(p2_team_hp))
 
         avg_hp_pct_p1 = np.mean(full_hp_p1)
         avg_hp_pct_p2 = np.mean(full_hp_p2)
@@ -627,7 +624,7 @@ def avg_final_HP_pct(data: list[dict], difference: bool = False, test: bool = Fa
     return pd.DataFrame(final)
 
 
-def avg_stat_diff_per_turn(data: list[dict], stats: list[str], divide_turns: bool = True, test: bool = False) -> pd.DataFrame:
+def avg_stat_diff_per_turn(data: list[dict], stats: list[str], divide_turns: bool = True, test: bool = False, registry: PokedexRegistry = None) -> pd.DataFrame:
     '''
     Calculate the average base stat difference (P1 - P2) per turn for multiple stats.
     
@@ -636,18 +633,16 @@ def avg_stat_diff_per_turn(data: list[dict], stats: list[str], divide_turns: boo
         stats: List of stat names to calculate ('hp', 'atk', 'def', 'spa', 'spd', 'spe')
         divide_turns: If True, computes separate averages for first 10, middle 10, and last 10 turns
         test: If True, excludes player_won from output
+        registry: optional PokedexRegistry shared across extractors (built from data if None)
         
     Returns:
         DataFrame with battle_id, average stat differences per turn for each stat, and player_won
     '''
-    TURN_SEGMENTS = {
-        'first_10': (0, 10),
-        'middle_10': (10, 20),
-        'last_10': (-10, None)  # Use slicing logic: last 10 turns
-    }
     
     # Get base stats dictionary for all pokemon
-    pokemon_stats = get_dict_base_stats1(data)
+    if registry is None:
+        registry = PokedexRegistry.from_data(data)
+    pokemon_stats = registry.base_stats1
     
     final = []
     for battle in data:
@@ -839,11 +834,6 @@ def accuracy_avg(data: list[dict], difference: bool = False, divide_turns: bool
     Returns:
         DataFrame with battle_id, average accuracy and base power for P1 and P2, and optionally player_won
     '''
-    TURN_SEGMENTS = {
-        'first_10': (0, 10),
-        'middle_10': (10, 20),
-        'last_10': (-10, None)  # Use slicing logic: last 10 turns
-    }
     
     final = []
     for battle in data:
@@ -1386,10 +1376,10 @@ def team_hp_advantage_flip_count(data: list[dict], team_size: int = 6, test: boo
         # -1 if P2 has more avg HP, 0 if equal, 1 if P1 has more avg HP
         last_advantage_state = 0 
 
-        # These dicts store the last known HP for each Pokémon on a team
-        # They are updated as the battle progresses
-        p1_team_hp = {} # Key: pokemon name, Value: hp_pct
-        p2_team_hp = {} # Key: pokemon name, Value: hp_pct
+        # Last known HP of each Pokémon on a team, with the running team total
+        # (unseen Pokémon = 1.0 HP); updated as the battle progresses
+        p1_team_hp = TeamHP(team_size)
+        p2_team_hp = TeamHP(team_size)
 
         for turn in battle['battle_timeline']:
             # 1. Update the known HP for the active Pokémon
@@ -1401,31 +1391,15 @@ def team_hp_advantage_flip_count(data: list[dict], team_size: int = 6, test: boo
             hp1 = p1_state.get('hp_pct')
             hp2 = p2_state.get('hp_pct')
 
-            # Update dictionaries if the pokemon name and HP are valid
+            # Update the trackers if the pokemon name and HP are valid
             if name1 and hp1 is not None:
-                p1_team_hp[name1] = hp1
+                p1_team_hp.set(name1, hp1)
             if name2 and hp2 is not None:
-                p2_team_hp[name2] = hp2
-
-            # 2. Calculate current average team HP for P1
-            # (sum of known HPs) + (1.0 * number of unseen Pokémon)
-            p1_seen_count = len(p1_team_hp)
-            p1_unseen_count = team_size - p1_seen_count
-            p1_total_hp = np.sum(list(p1_team_hp.values())) + (p1_unseen_count * 1.0)
-            avg_hp_pct_p1 = p1_total_hp / team_size
-
-            # 3. Calculate current average team HP for P2
-            p2_seen_count = len(p2_team_hp)
-            p2_unseen_count = team_size - p2_seen_count
-            p2_total_hp = np.sum(list(p2_team_hp.values())) + (p2_unseen_count * 1.0)
-            avg_hp_pct_p2 = p2_total_hp / team_size
-
-            # 4. Determine advantage state based on team averages
-            current_advantage_state = 0
-            if avg_hp_pct_p1 > avg_hp_pct_p2:
-                current_advantage_state = 1
-            elif avg_hp_pct_p2 > avg_hp_pct_p1:
-                current_advantage_state = -1
+                p2_team_hp.set(name2, hp2)
+
+            # 2-4. Determine advantage state based on the average team HP
+            # 1 if P1 has more avg HP, -1 if P2 has more, 0 if equal
+            current_advantage_state = p1_team_hp.compare(p2_team_hp)
 
             # 5. Check for a flip (and ignore state 0 -> 1 or 0 -> -1 at the start)
             if current_advantage_state != last_advantage_state and last_advantage_state != 0:
@@ -1475,11 +1449,6 @@ def damage_efficiency_ratio(data: list[dict], difference: bool = False, divide_t
     Returns:
         A pandas DataFrame with the calculated DER features.
     """
-    TURN_SEGMENTS = {
-        'first_10': (0, 10),
-        'middle_10': (10, 20),
-        'last_10': (-10, None) # Use slicing logic: last 10 turns
-    }
     
     final = []
     
@@ -1492,19 +1461,10 @@ def damage_efficiency_ratio(data: list[dict], difference: bool = False, divide_t
             total_hp_loss_by_p1 = 0.0
             total_hp_loss_by_p2 = 0.0
             
-            # Dictionaries to store the last known HP of each Pokémon
-            p1_team_hp = {}
-            p2_team_hp = {}
-
-            # Initialize P1's team with 100% HP
-            for pokemon in battle.get('p1_team_details', []):
-                if pokemon.get('name'):
-                    p1_team_hp[pokemon.get('name')] = 1.0
-            
-            # Initialize P2's lead with 100% HP
+            # Last known HP of each Pokémon: P1's team and P2's lead start with 100% HP
+            p1_team_hp = TeamHP(names=[pokemon.get('name') for pokemon in battle.get('p1_team_details', []) if pokemon.get('name')])
             p2_lead = battle.get('p2_lead_details', {})
-            if p2_lead.get('name'):
-                p2_team_hp[p2_lead.get('name')] = 1.0
+            p2_team_hp = TeamHP(names=[p2_lead.get('name')] if p2_lead.get('name') else [])
 
             # Iterate through the timeline to sum up all HP loss
             for turn in timeline:
@@ -1522,16 +1482,14 @@ def damage_efficiency_ratio(data: list[dict], difference: bool = False, divide_t
                     continue
 
                 # --- Calculate P1 HP Loss (Damage Dealt by P2) ---
-                last_p1_hp = p1_team_hp.get(p1_name, 1.0)
+                last_p1_hp = p1_team_hp.set(p1_name, p1_hp_pct)
                 if p1_hp_pct < last_p1_hp:
                     total_hp_loss_by_p1 += (last_p1_hp - p1_hp_pct)
-                p1_team_hp[p1_name] = p1_hp_pct
                 
                 # --- Calculate P2 HP Loss (Damage Dealt by P1) ---
-                last_p2_hp = p2_team_hp.get(p2_name, 1.0)
+                last_p2_hp = p2_team_hp.set(p2_name, p2_hp_pct)
                 if p2_hp_pct < last_p2_hp:
                     total_hp_loss_by_p2 += (last_p2_hp - p2_hp_pct)
-                p2_team_hp[p2_name] = p2_hp_pct
 
             # Calculate DERs
             if total_hp_loss_by_p1 == 0.0:
@@ -1564,18 +1522,10 @@ def damage_efficiency_ratio(data: list[dict], difference: bool = False, divide_t
                 segment_hp_loss_by_p1 = 0.0
                 segment_hp_loss_by_p2 = 0.0
                 
-                p1_team_hp = {}
-                p2_team_hp = {}
-                
-                # Initialize P1's team
-                for pokemon in battle.get('p1_team_details', []):
-                    if pokemon.get('name'):
-                        p1_team_hp[pokemon.get('name')] = 1.0
-                
-                # Initialize P2's lead
+                # P1's team and P2's lead start again with 100% HP
+                p1_team_hp = TeamHP(names=[pokemon.get('name') for pokemon in battle.get('p1_team_details', []) if pokemon.get('name')])
                 p2_lead = battle.get('p2_lead_details', {})
-                if p2_lead.get('name'):
-                    p2_team_hp[p2_lead.get('name')] = 1.0
+                p2_team_hp = TeamHP(names=[p2_lead.get('name')] if p2_lead.get('name') else [])
 
                 # Process the segment
                 for turn in segment_timeline:
@@ -1592,16 +1542,14 @@ def damage_efficiency_ratio(data: list[dict], difference: bool = False, divide_t
                         continue
 
                     # Calculate P1 HP Loss
-                    last_p1_hp = p1_team_hp.get(p1_name, 1.0)
+                    last_p1_hp = p1_team_hp.set(p1_name, p1_hp_pct)
                     if p1_hp_pct < last_p1_hp:
                         segment_hp_loss_by_p1 += (last_p1_hp - p1_hp_pct)
-                    p1_team_hp[p1_name] = p1_hp_pct
                     
                     # Calculate P2 HP Loss
-                    last_p2_hp = p2_team_hp.get(p2_name, 1.0)
+                    last_p2_hp = p2_team_hp.set(p2_name, p2_hp_pct)
                     if p2_hp_pct < last_p2_hp:
                         segment_hp_loss_by_p2 += (last_p2_hp - p2_hp_pct)
-                    p2_team_hp[p2_name] = p2_hp_pct
 
                 # Calculate segment DERs
                 if segment_hp_loss_by_p1 == 0.0:
@@ -1629,78 +1577,103 @@ def damage_efficiency_ratio(data: list[dict], difference: bool = False, divide_t
     return pd.DataFrame(final)
 
 
-def pokemon_encoding(data: list[dict], one_hot: bool = False, test: bool = False) -> pd.DataFrame:
+# One-hot columns of pokemon_encoding: column 4 * i + k is kind k of species pokemon_list[i]
+ONEHOT_KINDS = ['p1_{}_seen', 'p1_{}_fainted', 'p2_{}_seen', 'p2_{}_fainted']
+
+
+def pokemon_onehot_columns() -> list[str]:
+    """Names of the one-hot columns of pokemon_encoding, in output order."""
+    return [kind.format(pname) for pname in pokemon_list for kind in ONEHOT_KINDS]
+
+
+def pokemon_onehot_matrix(data: list[dict]) -> csr_matrix:
+    """
+    One-hot columns of pokemon_encoding(one_hot=True) as a sparse
+    (n_battles x 80) int64 CSR matrix, columns as in pokemon_onehot_columns.
+
+    Each battle keeps four 20-bit masks over the species ids of pokemon_list
+    (seen / fainted for P1 and P2); the set bits are the nonzero entries of its row.
+    """
+    n_species = len(pokemon_list)
+    indptr, indices = [0], []
+    for battle in data:
+        masks = [0, 0, 0, 0]
+        for turn in battle.get('battle_timeline', []):
+            for k, player in ((0, 'p1'), (2, 'p2')):
+                state = turn.get(f'{player}_pokemon_state') or {}
+                name = state.get('name')
+                idx = pokemon_to_index.get(name.lower()) if name else None
+                if idx is not None:
+                    masks[k] |= 1 << idx
+                    if state.get('hp_pct') == 0.0:
+                        masks[k + 1] |= 1 << idx
+        indices.extend(4 * i + k for i in range(n_species) for k in range(4) if masks[k] >> i & 1)
+        indptr.append(len(indices))
+    return csr_matrix((np.ones(len(indices), dtype=np.int64), np.array(indices, dtype=np.int32), np.array(indptr)),
+                      shape=(len(data), 4 * n_species))
+
+
+def pokemon_encoding(data: list[dict], one_hot: bool = False, test: bool = False, sparse: bool = False) -> pd.DataFrame:
     """Encode pokemon presence or indices for P1 and P2.
     
     one_hot=True:
         creates columns p1_<pokemon> and p2_<pokemon> with 1/0 presence flags.
+        With sparse=True they are pd.SparseDtype(int64, 0) columns built from
+        pokemon_onehot_matrix (the values are the same).
     one_hot=False:
         creates p1_pokemon_1..6 and p2_pokemon_1..6 with index in pokemon_list or -1 if missing/unknown.
         For P2, indices are assigned in order of appearance in the battle.
     """
-    pokemon_list = [
-        'alakazam', 'articuno', 'chansey', 'charizard', 'cloyster',
-        'dragonite', 'exeggutor', 'gengar', 'golem', 'jolteon',
-        'jynx', 'lapras', 'persian', 'rhydon', 'slowbro',
-        'snorlax', 'starmie', 'tauros', 'victreebel', 'zapdos'
-    ]
-    name_to_idx = {n: i for i, n in enumerate(pokemon_list)}
+    if one_hot and sparse:
+        df = pd.DataFrame.sparse.from_spmatrix(pokemon_onehot_matrix(data), columns=pokemon_onehot_columns())
+        df.insert(0, 'battle_id', [battle.get('battle_id') for battle in data])
+        if not test:
+            df['player_won'] = [battle.get('player_won') for battle in data]
+        return df
 
     final = []
     for battle in data:
         row = {'battle_id': battle.get('battle_id')}
         
-        # Initialize empty lists for both players
-        p1_names = []
-        p2_names = []
+        # Names in order of appearance; the dict keys double as a fast membership test
+        p1_seen = {}
+        p2_seen = {}
+        p1_fainted = set()
+        p2_fainted = set()
         
         # Track Pokemon only as they appear in the timeline for both players
         for turn in battle.get('battle_timeline', []):
-            # Track P1's Pokemon
-            n1 = (turn.get('p1_pokemon_state') or {}).get('name')
+            p1_state = turn.get('p1_pokemon_state') or {}
+            p2_state = turn.get('p2_pokemon_state') or {}
+
+            # Track P1's Pokemon and whether it fainted
+            n1 = p1_state.get('name')
             if n1:
                 nl1 = n1.lower()
-                if nl1 not in p1_names:  # Only add if not already seen
-                    p1_names.append(nl1)
+                p1_seen[nl1] = None
+                if p1_state.get('hp_pct') == 0.0:
+                    p1_fainted.add(nl1)
                     
-            # Track P2's Pokemon
-            n2 = (turn.get('p2_pokemon_state') or {}).get('name')
+            # Track P2's Pokemon and whether it fainted
+            n2 = p2_state.get('name')
             if n2:
                 nl2 = n2.lower()
-                if nl2 not in p2_names:  # Only add if not already seen
-                    p2_names.append(nl2)
-
-        # Track fainted status for each Pokemon
-        p1_fainted = set()
-        p2_fainted = set()
-        for turn in battle.get('battle_timeline', []):
-            p1_state = turn.get('p1_pokemon_state', {})
-            p2_state = turn.get('p2_pokemon_state', {})
-            
-            # Check P1 Pokemon
-            p1_name = p1_state.get('name')
-            if p1_name:
-                p1_name = p1_name.lower()
-                if p1_state.get('hp_pct') == 0.0:
-                    p1_fainted.add(p1_name)
-            
-            # Check P2 Pokemon
-            p2_name = p2_state.get('name')
-            if p2_name:
-                p2_name = p2_name.lower()
+                p2_seen[nl2] = None
                 if p2_state.get('hp_pct') == 0.0:
-                    p2_fainted.add(p2_name)
+                    p2_fainted.add(nl2)
+        p1_names = list(p1_seen)
+        p2_names = list(p2_seen)
 
         # Add encoding to the row based on the chosen method
         if one_hot:
             # One-hot encoding: separate columns for seen and fainted
             for pname in pokemon_list:
                 # P1 encoding
-                row[f'p1_{pname}_seen'] = 1 if pname in p1_names else 0
+                row[f'p1_{pname}_seen'] = 1 if pname in p1_seen else 0
                 row[f'p1_{pname}_fainted'] = 1 if pname in p1_fainted else 0
                 
                 # P2 encoding
-                row[f'p2_{pname}_seen'] = 1 if pname in p2_names else 0
+                row[f'p2_{pname}_seen'] = 1 if pname in p2_seen else 0
                 row[f'p2_{pname}_fainted'] = 1 if pname in p2_fainted else 0
         else:
             # Index encoding with status
@@ -1708,7 +1681,7 @@ def pokemon_encoding(data: list[dict], one_hot: bool = False, test: bool = False
             for i in range(6):
                 if i < len(p1_names):
                     pokemon_name = p1_names[i]
-                    row[f'p1_pokemon_{i+1}'] = name_to_idx.get(pokemon_name, -1)
+                    row[f'p1_pokemon_{i+1}'] = pokemon_to_index.get(pokemon_name, -1)
                     row[f'p1_status_{i+1}'] = 0 if pokemon_name in p1_fainted else 1
                 else:
                     row[f'p1_pokemon_{i+1}'] = -1
@@ -1718,7 +1691,7 @@ def pokemon_encoding(data: list[dict], one_hot: bool = False, test: bool = False
             for i in range(6):
                 if i < len(p2_names):
                     pokemon_name = p2_names[i]
-                    row[f'p2_pokemon_{i+1}'] = name_to_idx.get(pokemon_name, -1)
+                    row[f'p2_pokemon_{i+1}'] = pokemon_to_index.get(pokemon_name, -1)
                     row[f'p2_status_{i+1}'] = 0 if pokemon_name in p2_fainted else 1
                 else:
                     row[f'p2_pokemon_{i+1}'] = -1
@@ -1733,7 +1706,7 @@ def pokemon_encoding(data: list[dict], one_hot: bool = False, test: bool = False
     return pd.DataFrame(final)
 
 
-def avg_approx_damage(data: list[dict], difference: bool = True, test: bool = False) -> pd.DataFrame:
+def avg_approx_damage(data: list[dict], difference: bool = True, test: bool = False, registry: PokedexRegistry = None) -> pd.DataFrame:
     """
     Calculates the average approximate damage dealt by P1 and P2 per turn
     over the entire battle, based on the Gen 1 damage formula.
@@ -1754,6 +1727,7 @@ def avg_approx_damage(data: list[dict], difference: bool = True, test: bool = Fa
         data: List of battle dictionaries
         difference: If True, returns the difference (P1 - P2) in average damage
         test: If True, excludes player_won from output
+        registry: optional PokedexRegistry shared across extractors (built from data if None)
     """
     
     # Constants from the damage formula
@@ -1761,9 +1735,11 @@ def avg_approx_damage(data: list[dict], difference: bool = True, test: bool = Fa
     RANDOM_AVG = 0.925     # Average of (217..255)/255
 
     # Get helper dictionaries
-    dict_base_stats = get_dict_base_stats(data)
-    pokemon_att_types = get_dict_attacker_types(data)
-    pokemon_def_types = get_dict_def_types(data)
+    if registry is None:
+        registry = PokedexRegistry.from_data(data)
+    dict_base_stats = registry.base_stats
+    pokemon_att_types = registry.att_types
+    pokemon_def_types = registry.def_types
     
     final = []
     
@@ -1923,6 +1899,10 @@ def first_KO_momentum_feature(data: list[dict], test: bool = False) -> pd.DataFr
     return pd.DataFrame(final)
 
 
+# Define the statuses to count (excluding 'fnt', which is used as a filter)
+ACTIVE_STATUSES = {'brn', 'frz', 'nostatus', 'par', 'psn', 'slp', 'tox'}
+
+
 def last_turn_status_extractor(data: list[dict], test: bool = False) -> pd.DataFrame:
     """
     Calculates the difference in active (non-fainted) Pokémon statuses
@@ -1940,9 +1920,6 @@ def last_turn_status_extractor(data: list[dict], test: bool = False) -> pd.DataF
         A pandas DataFrame with 'status_<status>_diff' columns for 
         non-fainted statuses.
     """
-    # Define the statuses to count (excluding 'fnt', which is used as a filter)
-    ACTIVE_STATUSES = {'brn', 'frz', 'nostatus', 'par', 'psn', 'slp', 'tox'}
-
     final = []
     
     for battle in data:
@@ -2012,9 +1989,11 @@ def tot_pok_used(data: list[dict], test: bool = False) -> pd.DataFrame:
     return pd.DataFrame(final)
 
 
-def final_type_advantage(data: list[dict], difference: bool = True, test: bool = False) -> pd.DataFrame:
+def final_type_advantage(data: list[dict], difference: bool = True, test: bool = False, registry: PokedexRegistry = None) -> pd.DataFrame:
 
-    pokemon_Stab_types = get_dict_def_types(data)
+    if registry is None:
+        registry = PokedexRegistry.from_data(data)
+    pokemon_Stab_types = registry.def_types
 
     final = []
 
@@ -0,0 +1,213 @@
+# feature_engineering/feature_sets.py
+"""
+Declarative feature sets.
+
+FEATURE_CATALOG lists every extractor generate_features can run, in output
+order, with the generate_features options it takes (difference,
+divide_turns), its fixed kwargs, per-family and training-mode overrides and the model families
+('linear', 'tree') that use it by default. A feature-set spec, a dict or a
+JSON / YAML file, selects what to compute:
+
+    {
+        'family': 'tree',                  # default selection: features used by this family
+        'difference': True,
+        'divide_turns': True,
+        'include': ['accuracy_avg', ...],  # optional: explicit list instead of the family defaults
+        'exclude': ['tot_pok_used'],       # optional: drop some of them
+        'params': {'pokemon_encoding': {'one_hot': True}},  # optional kwargs overrides
+        'columns': ['first_10_accuracy_diff', ...],          # optional: keep only these outputs
+    }
+
+feature_calls turns a spec into the (extractor, kwargs) calls run by the
+engine: unselected extractors are never computed, the selected ones share
+one scan of the timelines, and with 'columns' only the extractors producing one of those columns
+are kept. feature_columns gives the output columns of each call.
+"""
+import json
+from .extractors import *
+from .engine import FusedFeatureEngine, FeatureContext
+
+
+class FeatureDef:
+    """
+    One extractor of the catalogue.
+
+    Args:
+        extractor: the extractor function.
+        families: model families that compute it by default.
+        options: generate_features options forwarded as kwargs ('difference', 'divide_turns').
+        kwargs: fixed kwargs of the call.
+        overrides: family -> kwargs replacing the options / fixed kwargs for that family.
+        train_overrides: kwargs replacing them in training mode (flag_test=False).
+    """
+
+    def __init__(self, extractor, families: tuple = (), options: tuple = (), kwargs: dict = None, overrides: dict = None,
+                 train_overrides: dict = None):
+        self.extractor = extractor
+        self.name = extractor.__name__
+        self.families = tuple(families)
+        self.options = tuple(options)
+        self.kwargs = kwargs or {}
+        self.overrides = overrides or {}
+        self.train_overrides = train_overrides or {}
+
+    def call_kwargs(self, spec: dict, flag_test: bool = False) -> dict:
+        """Kwargs of the call for a (complete) spec, without 'test'."""
+        kwargs = {option: spec[option] for option in self.options}
+        kwargs.update(self.kwargs)
+        kwargs.update(self.overrides.get(spec['family'], {}))
+        if not flag_test:
+            kwargs.update(self.train_overrides)
+        kwargs.update(spec['params'].get(self.name, {}))
+        return kwargs
+
+
+STATS = ['hp', 'atk', 'def', 'spa', 'spd', 'spe']
+
+FEATURE_CATALOG = [
+    FeatureDef(avg_team_vs_lead_stats, ('linear', 'tree'), ('difference',)),
+    # the training set always divides by the turns (test follows divide_turns)
+    FeatureDef(avg_effectiveness2, ('linear',), ('difference', 'divide_turns'), train_overrides={'divide_turns': True}),
+    FeatureDef(category_impact_score, (), ('difference', 'divide_turns')),
+    FeatureDef(avg_stab_multiplier, (), ('difference', 'divide_turns')),
+    FeatureDef(faint_count_diff_extractor, ('linear', 'tree'), ('difference',)),  # generalized by pokemon encoding
+    FeatureDef(avg_final_HP_pct, ('linear', 'tree'), ('difference',)),
+    FeatureDef(avg_boost_diff_per_turn, ('linear', 'tree')),
+    FeatureDef(avg_stat_diff_per_turn, ('linear', 'tree'), ('divide_turns',), kwargs={'stats': STATS}),
+    FeatureDef(accuracy_avg, ('linear', 'tree'), ('difference', 'divide_turns')),
+    FeatureDef(granular_turn_counts, ('linear', 'tree'), ('difference',)),
+    FeatureDef(ratio_category_diff, ('linear', 'tree'), ('difference',)),
+    FeatureDef(calculate_voluntary_swap_diff, ('linear', 'tree'), ('difference',)),
+    FeatureDef(team_hp_advantage_flip_count, ('linear', 'tree')),
+    # maybe better without turns for trees
+    FeatureDef(damage_efficiency_ratio, ('linear', 'tree'), ('difference', 'divide_turns'), overrides={'tree': {'divide_turns': False}}),
+    FeatureDef(pokemon_encoding, ('linear', 'tree'), kwargs={'one_hot': True}, overrides={'tree': {'one_hot': False}}),
+    FeatureDef(first_KO_momentum_feature, ('tree',)),  # only for tree based models
+    FeatureDef(last_turn_status_extractor, ('linear', 'tree')),
+    FeatureDef(tot_pok_used, ('tree',)),  # only for tree based models
+    FeatureDef(avg_approx_damage, ('linear', 'tree'), ('difference',)),
+]
+FEATURES = {feature.name: feature for feature in FEATURE_CATALOG}
+
+FAMILIES = ('linear', 'tree')
+SPEC_KEYS = {'family', 'difference', 'divide_turns', 'include', 'exclude', 'params', 'columns'}
+
+
+def feature_spec(spec: dict = None, **options) -> dict:
+    """
+    Complete a spec with the defaults (family 'tree', difference and
+    divide_turns True, no include / exclude / params / columns) and validate it.
+    Keyword options are applied on top of spec.
+    """
+    spec = {**(spec or {}), **options}
+    unknown = set(spec) - SPEC_KEYS
+    if unknown:
+        raise ValueError(f"Unknown feature spec keys: {sorted(unknown)}")
+
+    spec = {'family': 'tree', 'difference': True, 'divide_turns': True,
+            'include': None, 'exclude': [], 'params': {}, 'columns': None, **spec}
+    if spec['family'] not in FAMILIES:
+        raise ValueError(f"family must be one of {FAMILIES}, got '{spec['family']}'")
+    names = list(spec['include'] or []) + list(spec['exclude']) + list(spec['params'])
+    missing = [name for name in names if name not in FEATURES]
+    if missing:
+        raise ValueError(f"Unknown features in spec: {missing} (available: {list(FEATURES)})")
+    return spec
+
+
+def load_feature_spec(path: str) -> dict:
+    """Read a spec from a .json or .yaml / .yml file."""
+    with open(path, 'r') as f:
+        if path.endswith(('.yaml', '.yml')):
+            try:
+                import yaml
+            except ImportError as e:
+                raise ImportError("Reading YAML feature specs requires pyyaml (pip install pyyaml)") from e
+            return feature_spec(yaml.safe_load(f))
+        return feature_spec(json.load(f))
+
+
+def selected_features(spec: dict) -> list[FeatureDef]:
+    """Catalogue entries selected by the spec, in output order."""
+    spec = feature_spec(spec)
+    names = spec['include'] if spec['include'] is not None else \
+        [feature.name for feature in FEATURE_CATALOG if spec['family'] in feature.families]
+    return [feature for feature in FEATURE_CATALOG if feature.name in names and feature.name not in spec['exclude']]
+
+
+# --------------------------------------------------------- output columns
+
+# One-turn battle used to discover the columns of an extractor call
+_PROBE_POKEMON = {'name': 'snorlax', 'level': 100, 'types': ['normal', 'notype'], 'base_hp': 160, 'base_atk': 110,
+                  'base_def': 65, 'base_spa': 65, 'base_spd': 110, 'base_spe': 30}
+_PROBE_STATE = {'name': 'snorlax', 'hp_pct': 1.0, 'status': 'nostatus', 'effects': ['noeffect'],
+                'boosts': {'atk': 0, 'def': 0, 'spa': 0, 'spd': 0, 'spe': 0}}
+_PROBE_MOVE = {'name': 'bodyslam', 'type': 'NORMAL', 'category': 'PHYSICAL', 'base_power': 85, 'accuracy': 1.0, 'priority': 0}
+_PROBE_BATTLE = {
+    'battle_id': 0, 'player_won': True,
+    'p1_team_details': [_PROBE_POKEMON], 'p2_lead_details': _PROBE_POKEMON,
+    'battle_timeline': [{'turn': 1, 'p1_pokemon_state': _PROBE_STATE, 'p1_move_details': _PROBE_MOVE,
+                         'p2_pokemon_state': _PROBE_STATE, 'p2_move_details': _PROBE_MOVE}],
+}
+_columns_cache = {}
+
+
+def call_columns(extractor, kwargs: dict) -> list[str]:
+    """Feature columns returned by an extractor call (without battle_id and player_won)."""
+    key = (extractor if isinstance(extractor, str) else extractor.__name__, json.dumps(kwargs, sort_keys=True, default=str))
+    if key not in _columns_cache:
+        kwargs = {**kwargs, 'test': True}
+        ctx = FeatureContext([_PROBE_BATTLE])
+        block = FusedFeatureEngine([(extractor, kwargs)], ctx=ctx).blocks([_PROBE_BATTLE])[0]
+        _columns_cache[key] = [c for c in block.columns if c not in ('battle_id', 'player_won')]
+    return list(_columns_cache[key])
+
+
+def feature_columns(spec: dict, flag_test: bool = False) -> dict:
+    """name -> output columns of every extractor selected by the spec (before the 'columns' filter)."""
+    spec = feature_spec(spec)
+    return {feature.name: call_columns(feature.extractor, feature.call_kwargs(spec, flag_test))
+            for feature in selected_features(spec)}
+
+
+# ------------------------------------------------------------------ calls
+
+def feature_calls(spec: dict, flag_test: bool) -> list[tuple]:
+    """
+    The (extractor, kwargs) calls of a spec, in output order.
+
+    Every selected extractor runs once (listing it twice in 'include' does
+    not duplicate it) and they all share the single scan of the fused engine.
+    With spec['columns'], only the extractors
+    producing at least one of the columns are kept. In training mode
+    (flag_test=False) the last call also returns player_won, so the label is
+    the last column of the assembled frame.
+    """
+    spec = feature_spec(spec)
+    wanted = set(spec['columns']) if spec['columns'] is not None else None
+    if wanted is not None:
+        known = {c for columns in feature_columns(spec, flag_test).values() for c in columns}
+        missing = sorted(wanted - known)
+        if missing:
+            raise ValueError(f"Columns not produced by the selected features: {missing}")
+
+    calls = []
+    for feature in selected_features(spec):
+        kwargs = feature.call_kwargs(spec, flag_test)
+        if wanted is not None and not wanted.intersection(call_columns(feature.extractor, kwargs)):
+            continue
+        calls.append((feature.extractor, {**kwargs, 'test': True}))
+
+    if calls and not flag_test:
+        extractor, kwargs = calls[-1]
+        calls[-1] = (extractor, {**kwargs, 'test': False})
+    return calls
+
+
+def select_columns(df, spec: dict):
+    """Restrict an assembled frame to battle_id, the spec 'columns' (if any) and player_won."""
+    spec = feature_spec(spec)
+    if spec['columns'] is None:
+        return df
+    keep = set(spec['columns'])
+    return df[[c for c in df.columns if c in ('battle_id', 'player_won') or c in keep]]
@@ -0,0 +1,195 @@
+# feature_engineering/incremental.py
+"""
+Incremental featurization.
+
+FeatureStore keeps a persistent feature table keyed by battle_id in a
+directory. update(file_path) featurizes only the battles of a JSONL file whose
+battle_id is not in the table yet, and appends them.
+
+The features of a battle depend on the battle itself and on the pokedex
+lookups (PokedexRegistry), which are built from all the data seen so far: a new
+file can add a species or change its entry. Every species gets a version (hash
+of its lookup values) and every stored battle remembers the species it
+references, so after an update only the stored battles referencing a species
+whose version changed are recomputed, read back from their source file. A
+change of the feature set itself (extractor calls or CACHE_VERSION) recomputes
+the whole table.
+
+The table always equals generate_features on the concatenation of the files
+passed to update, in the same order (battles whose battle_id was already seen
+are skipped).
+"""
+import hashlib
+import json
+import os
+import pandas as pd
+from .engine import FusedFeatureEngine, FeatureContext
+from .pokedex_registry import PokedexRegistry
+from .cache import CACHE_VERSION, save_frame, load_frame
+from .feature_sets import feature_spec, select_columns
+from .utils import iter_battles, pokedex
+from .Aggregator import extractor_calls
+
+# Bookkeeping columns of the stored table
+SOURCE, POSITION, SPECIES = '__source__', '__position__', '__species__'
+
+
+def battle_species(battle: dict) -> list[str]:
+    """Sorted names of every species a battle refers to (team, lead and timeline)."""
+    names = {pokemon.get('name') for pokemon in battle.get('p1_team_details') or []}
+    names.add((battle.get('p2_lead_details') or {}).get('name'))
+    for turn in battle.get('battle_timeline') or []:
+        for player in ('p1', 'p2'):
+            names.add((turn.get(f'{player}_pokemon_state') or {}).get('name'))
+    return sorted(name for name in names if name)
+
+
+def lookup_versions(registry: PokedexRegistry) -> dict:
+    """Species name -> hash of the lookup values the extractors read for it."""
+    lookups = [registry.def_types, registry.att_types, registry.base_stats, registry.base_stats1]
+    versions = {}
+    for name in set().union(*lookups):
+        values = [sorted(lookups[0].get(name, ())), lookups[1].get(name), lookups[2].get(name), lookups[3].get(name)]
+        versions[name] = hashlib.sha256(json.dumps(values, sort_keys=True, default=str).encode()).hexdigest()[:16]
+    return versions
+
+
+class FeatureStore:
+    """
+    Persistent feature table updated with the battles not seen before.
+
+    Args:
+        directory: folder holding the table, the registry and the metadata (created if missing).
+        flag_test, difference, tree, divide_turns, spec: feature set, as in generate_features.
+    """
+
+    def __init__(self, directory: str, flag_test: bool = False, difference: bool = True, tree: bool = True,
+                 divide_turns: bool = True, spec: dict = None):
+        self.directory = directory
+        self.spec = feature_spec(spec) if spec is not None else None
+        self.calls = extractor_calls(flag_test, difference=difference, tree=tree, divide_turns=divide_turns, spec=spec)
+        self.calls_key = hashlib.sha256(json.dumps(
+            {'version': CACHE_VERSION, 'calls': [(extractor if isinstance(extractor, str) else extractor.__name__, kwargs)
+                                                  for extractor, kwargs in self.calls]},
+            sort_keys=True, default=str).encode()).hexdigest()
+        os.makedirs(directory, exist_ok=True)
+
+        self.table = None
+        self.registry = None
+        self.meta = {}
+        if os.path.exists(self._path('meta.json')):
+            with open(self._path('meta.json'), 'r') as f:
+                self.meta = json.load(f)
+            self.table = load_frame(self._path('features.npz'))
+            self.registry = PokedexRegistry.from_file(self._path('registry.json'))
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def __len__(self) -> int:
+        return 0 if self.table is None else len(self.table)
+
+    @property
+    def battle_ids(self) -> set:
+        return set() if self.table is None else set(self.table['battle_id'])
+
+    def features(self) -> pd.DataFrame:
+        """The stored features, in the order the battles were added."""
+        if self.table is None:
+            return pd.DataFrame()
+        df = self.table.drop(columns=[SOURCE, POSITION, SPECIES])
+        return df if self.spec is None else select_columns(df, self.spec)
+
+    def update(self, file_path: str) -> dict:
+        """
+        Featurize the battles of file_path not in the table yet, recompute the
+        stored battles affected by a change of the lookups, and save the table.
+
+        Returns the counts of new, recomputed and stored battles.
+        """
+        known = self.battle_ids
+        new, positions = [], []
+        for position, battle in enumerate(iter_battles(file_path)):
+            if battle['battle_id'] not in known:
+                known.add(battle['battle_id'])
+                new.append(battle)
+                positions.append(position)
+
+        if self.registry is None and not new:
+            return {'new': 0, 'recomputed': 0, 'stored': len(self)}
+        registry = self.registry
+        if new:
+            # same registry as PokedexRegistry.from_data on all the battles seen so far
+            entries = [self.registry.entries] if self.registry is not None else []
+            registry = PokedexRegistry(pd.concat(entries + [pokedex(new)], ignore_index=True).drop_duplicates())
+        versions = lookup_versions(registry)
+
+        engine = FusedFeatureEngine(self.calls, ctx=FeatureContext(None, registry=registry))
+        stale = self._stale(versions)
+        table = self.table
+        refreshed = pd.DataFrame()
+        if len(stale):
+            stored = self.table.loc[stale]
+            refreshed = self._frame(engine, self._read_back(stale), stored[SOURCE].tolist(), stored[POSITION].tolist(), index=stale)
+            # recomputed rows keep their place in the table (a new feature set replaces all of them)
+            kept = table.drop(index=stale)
+            table = refreshed if kept.empty else pd.concat([kept, refreshed]).sort_index()
+
+        added = self._frame(engine, new, [os.path.abspath(file_path)] * len(new), positions)
+        self.table = pd.concat([df for df in (table, added) if df is not None], ignore_index=True)
+        self.registry = registry
+        self.meta = {'version': CACHE_VERSION, 'calls': self.calls_key, 'lookups': versions}
+        self._save()
+        return {'new': len(added), 'recomputed': len(refreshed), 'stored': len(self.table)}
+
+    def _stale(self, versions: dict) -> pd.Index:
+        """Index of the stored rows to recompute with the new lookups."""
+        if self.table is None:
+            return pd.Index([])
+        if self.meta.get('calls') != self.calls_key or self.meta.get('version') != CACHE_VERSION:
+            return self.table.index
+        old = self.meta.get('lookups', {})
+        changed = {name for name in set(old) | set(versions) if old.get(name) != versions.get(name)}
+        if not changed:
+            return pd.Index([])
+        affected = self.table[SPECIES].map(lambda names: not changed.isdisjoint(str(names).split(',')))
+        return self.table.index[affected.to_numpy(dtype=bool)]
+
+    def _read_back(self, stale: pd.Index) -> list[dict]:
+        """Raw battles of the stale rows, read from their source files."""
+        battles = {}
+        for source, rows in self.table.loc[stale].groupby(SOURCE, sort=False):
+            if not os.path.exists(source):
+                raise FileNotFoundError(f"Source file {source} of {len(rows)} stored battles is needed to recompute them")
+            wanted = dict(zip(rows[POSITION].astype(int), rows.index))
+            for position, battle in enumerate(iter_battles(source)):
+                if position in wanted:
+                    row = wanted[position]
+                    if battle['battle_id'] != self.table.at[row, 'battle_id']:
+                        raise ValueError(f"{source} changed since it was stored: battle {position} has a different battle_id")
+                    battles[row] = battle
+        return [battles[row] for row in stale]
+
+    def _frame(self, engine: FusedFeatureEngine, battles: list[dict], sources: list, positions: list, index=None) -> pd.DataFrame:
+        """
+        Feature rows of battles, computed in one engine scan, with their
+        bookkeeping columns (battles dropped by an extractor are skipped).
+        """
+        features = {row['battle_id']: row for row in engine.rows(battles)}
+        index = range(len(battles)) if index is None else index
+        rows, kept = [], []
+        for battle, source, position, i in zip(battles, sources, positions, index):
+            row = features.get(battle['battle_id'])
+            if row is not None:
+                row.update({SOURCE: source, POSITION: position, SPECIES: ','.join(battle_species(battle))})
+                rows.append(row)
+                kept.append(i)
+        return pd.DataFrame(rows, index=kept)
+
+    def _save(self):
+        save_frame(self.table, self._path('features.npz'))
+        self.registry.save(self._path('registry.json'))
+        tmp_path = self._path('meta.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(self.meta, f)
+        os.replace(tmp_path, self._path('meta.json'))  # written last: the table is consistent with it
@@ -0,0 +1,289 @@
+# feature_engineering/online.py
+"""
+Online (turn by turn) featurization of a live battle.
+
+BattleState drives the accumulators of the fused engine one turn at a time:
+update(turn) feeds a single turn to every accumulator, so it costs the same
+O(1) work as one step of the engine scan, and features() returns at any
+moment the features of the battle as if it had stopped at the last turn
+received, i.e. the same row generate_features computes on the truncated
+timeline. predict_proba() scores that row with a fitted pipeline.
+
+The 'last_10' segment of the divide_turns features slides with the
+timeline, so it cannot be kept as a running sum: the last 10 parsed turns are
+kept in a buffer and replayed into a second set of accumulators when the features
+are requested (at most 10 updates, independently of the battle length).
+"""
+import inspect
+import warnings
+from collections import deque
+import numpy as np
+import pandas as pd
+from .engine import TURN_SEGMENTS, ACCUMULATORS, FeatureContext, SegmentedAccumulator, TurnView
+from .pokedex_registry import PokedexRegistry
+from .Aggregator import extractor_calls
+from .feature_sets import call_columns
+from .tensor_store import BattleTensorStore
+from .segments import (avg_effectiveness2_from_store, avg_stab_multiplier_from_store, avg_stat_diff_per_turn_from_store,
+                       accuracy_avg_from_store)
+from .matchups import avg_approx_damage_from_store, category_impact_score_from_store
+from .turn_tensors import avg_boost_diff_per_turn_from_store, granular_turn_counts_from_store, team_hp_advantage_flip_count_from_store
+
+
+def online_extractor_calls(difference: bool = True, tree: bool = True, divide_turns: bool = True) -> list[tuple]:
+    """
+    The extractor calls of generate_features(flag_test=False, ...) without the
+    label, so the online features have the columns (and order) of the training
+    frame once battle_id and player_won are dropped.
+    """
+    calls = extractor_calls(False, difference=difference, tree=tree, divide_turns=divide_turns)
+    return [(extractor, {**kwargs, 'test': True}) for extractor, kwargs in calls]
+
+
+class BattleState:
+    """
+    Running features of one battle, updated as its turns arrive.
+
+    Args:
+        battle: battle header with p1_team_details and p2_lead_details
+                (a battle_timeline, if present, is ignored: feed it with update).
+        registry: PokedexRegistry of the training data, or a FeatureContext to share
+                  its memoized lookups across many states.
+        calls: list of (extractor, kwargs) pairs (default: online_extractor_calls()).
+        model: optional fitted pipeline used by predict_proba.
+    """
+
+    def __init__(self, battle: dict, registry, calls: list[tuple] = None, model=None):
+        self.model = model
+        self.ctx = registry if isinstance(registry, FeatureContext) else FeatureContext(None, registry=registry)
+        self.calls = calls if calls is not None else online_extractor_calls()
+        self._columns = None
+        self._checked_model = None
+
+        self.accumulators = self._build()
+        self._updates = [acc.update for acc in self.accumulators if acc.per_turn]
+
+        # segments resolved by turn index (first_10, middle_10) are kept as running sums,
+        # segments counted from the end of the timeline (last_10) are replayed from a buffer
+        self._fixed = [(s, start, end) for s, (start, end) in enumerate(TURN_SEGMENTS.values()) if start >= 0]
+        self._tail = [(s, start) for s, (start, end) in enumerate(TURN_SEGMENTS.values()) if start < 0]
+        self._replay = {}
+        if self._tail:
+            self._replay = {i: type(acc)(self.ctx, **self.calls[i][1]) for i, acc in enumerate(self.accumulators)
+                            if isinstance(acc, SegmentedAccumulator) and acc.divide_turns}
+        window = max([-start for _, start in self._tail], default=0)
+        self._window = deque(maxlen=window)
+        self.reset(battle)
+
+    def _build(self) -> list:
+        accumulators = []
+        for i, (_, kwargs) in enumerate(self.calls):
+            name = self._name(i)
+            if name not in ACCUMULATORS:
+                raise ValueError(f"No fused accumulator registered for extractor '{name}'")
+            accumulators.append(ACCUMULATORS[name](self.ctx, **kwargs))
+        return accumulators
+
+    def reset(self, battle: dict):
+        """
+        Start over with a new battle, reusing the accumulators (and the matchup
+        values they memoize) of the previous one.
+        """
+        self.battle = battle
+        self.n_turns = 0
+        self._window.clear()
+        for acc in self.accumulators:
+            acc.start(battle, 0)
+
+    def update(self, turn: dict):
+        """Feed the next turn of the timeline."""
+        i = self.n_turns
+        segments = tuple(s for s, start, end in self._fixed if start <= i and (end is None or i < end))
+        view = TurnView(i, turn, segments)
+        for update in self._updates:
+            update(view)
+        self._window.append(view)
+        self.n_turns += 1
+
+    def _tail_results(self) -> dict:
+        """finish() of the segmented accumulators replayed over the last turns only."""
+        if not self._replay:
+            return {}
+        for acc in self._replay.values():
+            acc.start(self.battle, self.n_turns)
+
+        for view in self._window:
+            # the buffered views already went through the running sums, retag them for the tail segments
+            view.segments = tuple(s for s, start in self._tail if view.index >= self.n_turns + start)
+            for acc in self._replay.values():
+                acc.update(view)
+        return {i: acc.finish(self.battle) for i, acc in self._replay.items()}
+
+    def _name(self, i: int) -> str:
+        extractor = self.calls[i][0]
+        return extractor if isinstance(extractor, str) else extractor.__name__
+
+    def features(self) -> dict:
+        """Feature columns of the battle truncated at the last turn received."""
+        if self.n_turns == 0:
+            raise ValueError("No turn received yet, call update(turn) first")
+
+        tail = self._tail_results()
+        row = {}
+        for i, acc in enumerate(self.accumulators):
+            acc.resize(self.n_turns)
+            cols = acc.result(self.battle)
+            if cols is None:
+                raise ValueError(f"'{self._name(i)}' produces no row for this battle")
+            if i in tail:
+                # the columns come slot by slot: take the tail slots from the replayed accumulator
+                names = list(cols)
+                per_slot = len(names) // acc.slots
+                for s, _ in self._tail:
+                    for name in names[s * per_slot:(s + 1) * per_slot]:
+                        cols[name] = tail[i][name]
+            row.update(cols)
+        return row
+
+    def vector(self) -> np.ndarray:
+        """features() as a (1, n_features) float array."""
+        row = self.features()
+        if self._columns is None:
+            self._columns = list(row)
+        return np.array([list(row.values())], dtype=np.float64)
+
+    def frame(self) -> pd.DataFrame:
+        """features() as a one-row DataFrame, the input of a fitted pipeline."""
+        vector = self.vector()
+        return pd.DataFrame(vector, columns=self._columns)
+
+    def predict_proba(self, model=None) -> float:
+        """
+        Probability that player 1 wins, scored by model (default: the model given at construction).
+
+        The model is fed a plain array: the column names are checked once against
+        the names it was fitted with (feature_names_in_), which skips the per-column
+        validation sklearn runs on every DataFrame and dominates the latency of a
+        one-row prediction.
+        """
+        model = model if model is not None else self.model
+        if model is None:
+            raise ValueError("No model to score the battle state with")
+        vector = self.vector()
+        if model is not self._checked_model:
+            fitted = getattr(model, 'feature_names_in_', None)
+            if fitted is not None and list(fitted) != self._columns:
+                raise ValueError("The model was fitted on different feature columns than the ones of this BattleState")
+            self._checked_model = model
+        with warnings.catch_warnings():
+            # fitted on a DataFrame, scored on an array with the same (checked) columns
+            warnings.filterwarnings('ignore', message='X does not have valid feature names')
+            return float(model.predict_proba(vector)[0, 1])
+
+
+# Default cutoffs of prefix_features: the battle stopped at turn 5, 10, ..., 30
+PREFIX_CUTOFFS = (5, 10, 15, 20, 25, 30)
+
+# Extractors that prefix_features computes on the BattleTensorStore: sums over
+# the turns, read at every cutoff from the prefix sums of a TurnSegmenter
+STORE_EXTRACTORS = {
+    'avg_effectiveness2': avg_effectiveness2_from_store,
+    'avg_stab_multiplier': avg_stab_multiplier_from_store,
+    'category_impact_score': category_impact_score_from_store,
+    'avg_stat_diff_per_turn': avg_stat_diff_per_turn_from_store,
+    'accuracy_avg': accuracy_avg_from_store,
+    'avg_approx_damage': avg_approx_damage_from_store,
+    'avg_boost_diff_per_turn': avg_boost_diff_per_turn_from_store,
+    'granular_turn_counts': granular_turn_counts_from_store,
+    'team_hp_advantage_flip_count': team_hp_advantage_flip_count_from_store,
+}
+
+
+def _store_block(name: str, store: BattleTensorStore, registry: PokedexRegistry, kwargs: dict, exact: bool, cutoffs: tuple) -> pd.DataFrame:
+    """Output of a STORE_EXTRACTORS function for an extractor call, stacked cutoff by cutoff."""
+    function = STORE_EXTRACTORS[name]
+    parameters = inspect.signature(function).parameters
+    kwargs = {key: value for key, value in kwargs.items() if key in parameters}
+    if 'registry' in parameters:
+        kwargs['registry'] = registry
+    if 'exact' in parameters:
+        kwargs['exact'] = exact
+    return function(store, cutoffs=cutoffs, **kwargs)
+
+
+def prefix_features(battle_data: list[dict], cutoffs: tuple = PREFIX_CUTOFFS, difference: bool = True, tree: bool = True,
+                    divide_turns: bool = True, registry: PokedexRegistry = None, exact: bool = False) -> tuple:
+    """
+    Features of every battle as if it had stopped at each cutoff turn.
+
+    The features that are sums over the turns (STORE_EXTRACTORS) are computed
+    for all the battles at once on a BattleTensorStore of cutoffs[-1] turns:
+    every per-turn array and its cumulative sums are computed once, and each
+    cutoff only indexes them (TurnSegmenter with cutoffs); the segment
+    averages are prefix-sum differences, equal to the extractors within a few
+    ulps (bit for bit with exact=True). The other features (team HP, switches,
+    first KO, pokemon encoding, ...) are read from one BattleState per battle,
+    fed its turns once in order and read at every cutoff it reaches.
+
+    Slice k of the output is the feature matrix of
+    generate_features(battles truncated at cutoffs[k], flag_test=False, ...)
+    without battle_id and player_won. A battle shorter than a cutoff keeps the
+    features of its full timeline; a battle without turns gets NaN rows.
+
+    Args:
+        battle_data: list of battles.
+        cutoffs: increasing turn counts.
+        difference, tree, divide_turns: feature set, as in generate_features.
+        registry: PokedexRegistry shared by the extractors (built from battle_data when None).
+        exact: If True, the segment averages are bit-identical to the extractors.
+
+    Returns:
+        (features, battle_ids, columns): features has shape
+        (n_battles, n_cutoffs, n_features); e.g. the training matrix of the
+        model for cutoffs[k] is pd.DataFrame(features[:, k], columns=columns).
+    """
+    cutoffs = sorted(cutoffs)
+    ctx = FeatureContext(battle_data, registry=registry)
+    calls = online_extractor_calls(difference=difference, tree=tree, divide_turns=divide_turns)
+    names = [extractor if isinstance(extractor, str) else extractor.__name__ for extractor, _ in calls]
+    store_calls = [i for i, name in enumerate(names) if name in STORE_EXTRACTORS]
+    state_calls = [calls[i] for i in range(len(calls)) if i not in store_calls]
+
+    columns = [column for extractor, kwargs in calls for column in call_columns(extractor, kwargs)]
+    position = {column: j for j, column in enumerate(columns)}
+    features = np.full((len(battle_data), len(cutoffs), len(columns)), np.nan)
+
+    if store_calls and cutoffs:
+        store = BattleTensorStore.from_battles(battle_data, max_turns=cutoffs[-1])
+        for i in store_calls:
+            block = _store_block(names[i], store, ctx.registry, calls[i][1], exact, cutoffs)
+            block = block.drop(columns=[c for c in ('battle_id', 'player_won') if c in block.columns])
+            values = block.to_numpy(dtype=np.float64).reshape(len(cutoffs), len(battle_data), -1)
+            features[:, :, [position[c] for c in block.columns]] = values.transpose(1, 0, 2)
+
+    state = None
+    state_positions = None
+    for b, battle in enumerate(battle_data):
+        timeline = battle.get('battle_timeline') or []
+        if not timeline:
+            features[b] = np.nan
+            continue
+        if not state_calls:
+            continue
+        if state is None:
+            state = BattleState(battle, ctx, state_calls)
+        else:
+            state.reset(battle)
+        turn = 0
+        row = None
+        for k, cutoff in enumerate(cutoffs):
+            if row is None or turn < min(cutoff, len(timeline)):
+                while turn < min(cutoff, len(timeline)):
+                    state.update(timeline[turn])
+                    turn += 1
+                row = state.vector()
+            if state_positions is None:
+                state_positions = [position[c] for c in state._columns]
+            features[b, k, state_positions] = row[0]
+
+    return features, [battle['battle_id'] for battle in battle_data], columns
@@ -0,0 +1,111 @@
+# feature_engineering/pokedex_registry.py
+"""
+Pokedex registry.
+
+get_dict_def_types, get_dict_attacker_types, get_dict_base_stats and
+get_dict_base_stats1 each rebuild utils.pokedex(data) with a full scan of the
+battles. PokedexRegistry scans the data once (or loads a cached file), gives
+every species an integer id and exposes:
+
+- array lookups by id: type_ids (n_species x 2, index in constants.types,
+  -1 for 'notype') and stats (n_species x 6, base hp/atk/def/spa/spd/spe);
+- the same dictionaries returned by the get_dict_* helpers (def_types,
+  att_types, base_stats, base_stats1), built once and shared by all the
+  extractors that receive the registry.
+"""
+import hashlib
+import json
+import numpy as np
+import pandas as pd
+from .constants import type_to_index, base_stat_names
+from .utils import (pokedex, get_dict_def_types, get_dict_attacker_types,
+                    get_dict_base_stats, get_dict_base_stats1)
+
+
+class PokedexRegistry:
+    """
+    Species lookup tables built from the pokedex of a dataset.
+
+    Args:
+        entries: the distinct rows of utils.pokedex(data)
+                 (columns name, level, type1, type2, base_hp, ..., base_spe).
+    """
+
+    def __init__(self, entries: pd.DataFrame):
+        self.entries = entries.reset_index(drop=True)
+        self._dicts = {}
+
+        known = self.entries.dropna(subset=['name']).drop_duplicates(subset=['name'], keep='last')
+        self.names = sorted(known['name'])
+        self.name_to_id = {name: i for i, name in enumerate(self.names)}
+
+        known = known.set_index('name').loc[self.names]
+        self.type_ids = np.full((len(self.names), 2), -1, dtype=np.int8)
+        for col, column in enumerate(['type1', 'type2']):
+            self.type_ids[:, col] = [type_to_index.get(str(t).lower(), -1) for t in known[column]]
+        self.stats = known[[f'base_{stat}' for stat in base_stat_names]].to_numpy(dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, name) -> bool:
+        return name in self.name_to_id
+
+    def id(self, name: str) -> int:
+        """Integer id of a species, -1 if it is not in the registry."""
+        return self.name_to_id.get(name, -1)
+
+    def ids(self, names) -> np.ndarray:
+        """Integer ids of a sequence of species names (-1 for unknown names)."""
+        return np.array([self.name_to_id.get(name, -1) for name in names], dtype=np.int64)
+
+    def fingerprint(self) -> str:
+        """SHA-256 of the entries (order independent): registries with the same lookups have the same fingerprint."""
+        records = sorted(json.dumps(record, sort_keys=True, default=str) for record in self.entries.to_dict(orient='records'))
+        return hashlib.sha256('\n'.join(records).encode()).hexdigest()
+
+    # -------------------------------------------------------------- build
+
+    @classmethod
+    def from_data(cls, data: list[dict]) -> 'PokedexRegistry':
+        """Build the registry with a single scan of the battles."""
+        return cls(pokedex(data).drop_duplicates())
+
+    @classmethod
+    def from_file(cls, path: str) -> 'PokedexRegistry':
+        """Load a registry written by save()."""
+        with open(path, 'r') as f:
+            records = json.load(f)
+        return cls(pd.DataFrame(records))
+
+    def save(self, path: str):
+        """Cache the registry as a JSON list of pokedex rows."""
+        with open(path, 'w') as f:
+            json.dump(self.entries.to_dict(orient='records'), f)
+
+    # ------------------------------------------- dictionaries of utils.get_dict_*
+
+    def _lookup(self, key, builder) -> dict:
+        if key not in self._dicts:
+            self._dicts[key] = builder(self.entries)
+        return self._dicts[key]
+
+    @property
+    def def_types(self) -> dict:
+        """Same as get_dict_def_types(data): name -> set of types."""
+        return self._lookup('def_types', get_dict_def_types)
+
+    @property
+    def att_types(self) -> dict:
+        """Same as get_dict_attacker_types(data): name -> list of types."""
+        return self._lookup('att_types', get_dict_attacker_types)
+
+    @property
+    def base_stats(self) -> dict:
+        """Same as get_dict_base_stats(data): name -> [atk, def, spa, spd]."""
+        return self._lookup('base_stats', get_dict_base_stats)
+
+    @property
+    def base_stats1(self) -> dict:
+        """Same as get_dict_base_stats1(data): name -> {base_hp: ..., base_spe: ...}."""
+        return self._lookup('base_stats1', get_dict_base_stats1)
@@ -0,0 +1,91 @@
+# feature_engineering/profiler.py
+"""
+Opt-in profiler for generate_features.
+
+Pass an ExtractorProfiler to generate_features(..., profiler=profiler) and
+every extractor call, plus the final assembly of the frames, is recorded
+with its wall time, CPU time, peak traced memory (tracemalloc) and output
+shape. The records are available as a DataFrame (report()) or as JSON lines,
+appended to a file as they are produced when jsonl_path is given.
+"""
+import json
+import time
+import tracemalloc
+from datetime import datetime, timezone
+import pandas as pd
+
+
+class ExtractorProfiler:
+    """
+    Collects one record per profiled step.
+
+    Args:
+        trace_memory: If True, measures the peak memory allocated during each
+                      step with tracemalloc (slows the steps down).
+        jsonl_path: optional file where every record is appended as a JSON line.
+        tags: optional dict added to every record (e.g. {'run': 'train', 'tree': True}).
+    """
+
+    def __init__(self, trace_memory: bool = True, jsonl_path: str = None, tags: dict = None):
+        self.trace_memory = trace_memory
+        self.jsonl_path = jsonl_path
+        self.tags = tags or {}
+        self.records = []
+
+    def measure(self, step: str, fn, *args, kwargs: dict = None, **fn_kwargs):
+        """
+        Call fn(*args, **fn_kwargs), record its cost under `step` and return its result.
+        kwargs are the extractor parameters stored in the record (default: fn_kwargs).
+        """
+        started_tracing = False
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                started_tracing = True
+            tracemalloc.reset_peak()
+            mem_before = tracemalloc.get_traced_memory()[0]
+
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            result = fn(*args, **fn_kwargs)
+        finally:
+            wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+            peak = tracemalloc.get_traced_memory()[1] - mem_before if self.trace_memory else None
+            if started_tracing:
+                tracemalloc.stop()
+
+        shape = getattr(result, 'shape', (None, None))
+        params = fn_kwargs if kwargs is None else kwargs
+        self._record({
+            'step': step,
+            'kwargs': json.dumps({k: v for k, v in params.items() if k != 'registry'}, sort_keys=True, default=str),
+            'wall_s': wall,
+            'cpu_s': cpu,
+            'peak_mem_mb': peak / 2**20 if peak is not None else None,
+            'rows': shape[0],
+            'cols': shape[1] if len(shape) > 1 else None,
+        })
+        return result
+
+    def _record(self, record: dict):
+        record = {'timestamp': datetime.now(timezone.utc).isoformat(), **self.tags, **record}
+        self.records.append(record)
+        if self.jsonl_path:
+            with open(self.jsonl_path, 'a') as f:
+                f.write(json.dumps(record, default=str) + '\n')
+
+    def report(self, sort_by: str = None) -> pd.DataFrame:
+        """Records as a DataFrame, optionally sorted (descending) by a column such as 'wall_s'."""
+        df = pd.DataFrame(self.records)
+        if sort_by is not None and not df.empty:
+            df = df.sort_values(sort_by, ascending=False).reset_index(drop=True)
+        return df
+
+    def to_jsonl(self, path: str):
+        """Write all the records to path as JSON lines."""
+        with open(path, 'w') as f:
+            for record in self.records:
+                f.write(json.dumps(record, default=str) + '\n')
+
+    def reset(self):
+        self.records = []
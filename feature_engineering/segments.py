@@ -0,0 +1,338 @@
+# feature_engineering/segments.py
+"""
+Turn segmentation with prefix sums.
+
+The divide_turns extractors (avg_effectiveness2, category_impact_score,
+avg_stab_multiplier, avg_stat_diff_per_turn, accuracy_avg) slice
+timeline[start:end] for every segment and walk each slice again. Here the
+per-turn quantity is computed once for all the battles of a
+BattleTensorStore, turned into cumulative sums along the turns, and the sum
+over any segment is read with one subtraction: sums[hi] - sums[lo].
+
+Segments are given as a dict name -> (start, end) with the semantics of
+timeline[start:end] (negative and None bounds included), so any list of
+segments can be asked for, not only constants.TURN_SEGMENTS.
+
+The *_from_store functions below, and category_impact_score_from_store in
+matchups (which reads its per-turn impacts from a MatchupTable), all go
+through a TurnSegmenter. This is the BattleTensorStore path, used by
+online.prefix_features and by callers that already hold a store:
+generate_features does not build a store, and its divide_turns features still
+come from the extractors (or from the SegmentedAccumulator of the fused engine,
+which keeps running sums over the single pass of the timeline).
+
+Prefix-sum differences round differently from the `total += x` loops of the
+extractors (within a few ulps); that is the default. With exact=True every
+segment is instead accumulated left to right, which reproduces the extractors
+bit for bit at O(n_turns) per segment.
+
+damage_efficiency_ratio restarts the team HP at the start of every segment,
+so it is not a sum of per-turn quantities and is not covered here.
+"""
+import numpy as np
+import pandas as pd
+from .constants import TURN_SEGMENTS, NO_TYPE, base_stat_names
+from .utils import effectiveness_batch
+from .pokedex_registry import PokedexRegistry
+from .tensor_store import BattleTensorStore
+
+
+# Segment used when divide_turns=False: the whole timeline
+WHOLE_TIMELINE = {'all': (0, None)}
+
+
+def _resolve(index, n_turns: np.ndarray, default: np.ndarray) -> np.ndarray:
+    """Position of a slice bound in timelines of n_turns turns, as Python slicing does."""
+    if index is None:
+        return default.copy()
+    if index < 0:
+        return np.maximum(n_turns + index, 0)
+    return np.minimum(index, n_turns)
+
+
+def segment_bounds(n_turns, segments: dict = TURN_SEGMENTS) -> dict:
+    """
+    For every segment, the (lo, hi) arrays of the turn indices covered by
+    timeline[start:end] in each battle (lo <= hi, empty when lo == hi).
+    """
+    n_turns = np.asarray(n_turns, dtype=np.int64)
+    bounds = {}
+    for name, (start, end) in segments.items():
+        lo = _resolve(start, n_turns, np.zeros_like(n_turns))
+        hi = _resolve(end, n_turns, n_turns)
+        bounds[name] = (lo, np.maximum(hi, lo))
+    return bounds
+
+
+class TurnSegmenter:
+    """
+    Segment sums and means of per-turn quantities for a batch of battles.
+
+    Args:
+        n_turns: timeline length of every battle (e.g. store.n_turns).
+        segments: dict name -> (start, end), see segment_bounds.
+        exact: If True, sums every segment left to right (bit-identical to the
+               extractors), otherwise subtracts prefix sums (O(1) per segment).
+        cutoffs: If given, the rows of the results are the battles truncated
+                 at every cutoff turn, cutoff by cutoff (len(cutoffs) * n_battles
+                 rows), all read from the prefix sums of the full timelines.
+    """
+
+    def __init__(self, n_turns, segments: dict = TURN_SEGMENTS, exact: bool = False, cutoffs: tuple = None):
+        self.battle_turns = np.asarray(n_turns, dtype=np.int64)
+        battles = np.arange(len(self.battle_turns))
+        if cutoffs is None:
+            self.rows = battles
+            self.n_turns = self.battle_turns
+        else:
+            cutoffs = np.asarray(cutoffs, dtype=np.int64)
+            self.rows = np.tile(battles, len(cutoffs))
+            self.n_turns = np.minimum(self.battle_turns[self.rows], np.repeat(cutoffs, len(battles)))
+        self.segments = dict(segments)
+        self.exact = exact
+        self.bounds = segment_bounds(self.n_turns, self.segments)
+        self.counts = {name: hi - lo for name, (lo, hi) in self.bounds.items()}
+
+    @staticmethod
+    def _turn_mask(values: np.ndarray, n_turns: np.ndarray) -> np.ndarray:
+        """True on the turns before the end of each timeline, broadcastable to values."""
+        mask = np.arange(values.shape[1])[None, :] < n_turns[:, None]
+        return mask.reshape(mask.shape + (1,) * (values.ndim - 2))
+
+    def _valid(self, values: np.ndarray) -> np.ndarray:
+        """values with the padding turns (after the end of each timeline) set to 0."""
+        return np.where(self._turn_mask(values, self.battle_turns), values, 0)
+
+    def prefix_sums(self, values: np.ndarray, dtype=np.float64) -> np.ndarray:
+        """(n_battles, n_turns + 1, ...) cumulative sums, column t = sum of the first t turns."""
+        values = self._valid(np.asarray(values, dtype=dtype))
+        prefix = np.zeros((values.shape[0], values.shape[1] + 1) + values.shape[2:], dtype=dtype)
+        np.cumsum(values, axis=1, out=prefix[:, 1:])
+        return prefix
+
+    def totals(self, values: np.ndarray) -> np.ndarray:
+        """
+        Sum over the whole (truncated) timeline of every row, accumulated left
+        to right like the `total += x` loops of the extractors; integer (and
+        boolean) quantities are summed as int64, so counts stay exact.
+        """
+        values = np.asarray(values)
+        dtype = np.int64 if values.dtype.kind in 'biu' else np.float64
+        return self.prefix_sums(values, dtype=dtype)[self.rows, self.n_turns]
+
+    def sums(self, values: np.ndarray) -> dict:
+        """Sum of a (n_battles, max_turns) per-turn quantity over every segment."""
+        values = np.asarray(values, dtype=np.float64)
+        if self.exact:
+            values = values[self.rows]
+            values = np.where(self._turn_mask(values, self.n_turns), values, 0.0)
+            turn_index = np.arange(values.shape[1])[None, :]
+            result = {}
+            for name, (lo, hi) in self.bounds.items():
+                masked = np.where((turn_index >= lo[:, None]) & (turn_index < hi[:, None]), values, 0.0)
+                result[name] = np.cumsum(masked, axis=1)[:, -1] if values.shape[1] else np.zeros(len(values))
+            return result
+
+        prefix = self.prefix_sums(values)
+        return {name: prefix[self.rows, hi] - prefix[self.rows, lo] for name, (lo, hi) in self.bounds.items()}
+
+    def means(self, values: np.ndarray) -> dict:
+        """Average of a per-turn quantity over every segment (0.0 for an empty segment)."""
+        means = {}
+        for name, total in self.sums(values).items():
+            turns = self.counts[name].astype(np.float64)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                means[name] = np.where(turns > 0, total / turns, 0.0)
+        return means
+
+    def take(self, values) -> np.ndarray:
+        """Per-battle values repeated on the rows of the results (e.g. battle_id)."""
+        return np.asarray(values)[self.rows]
+
+
+# ------------------------------------------------------- per-turn quantities
+
+def _species_ids(store: BattleTensorStore, registry: PokedexRegistry) -> np.ndarray:
+    """Registry id of every store species code, with a trailing -1 slot for padding (-1)."""
+    return np.append(registry.ids(store.vocab['species']), -1)
+
+
+def _registry_rows(table: np.ndarray, ids: np.ndarray, fill) -> np.ndarray:
+    """table[ids] with `fill` rows where the id is -1 (species not in the registry)."""
+    padded = np.concatenate([table, np.full((1,) + table.shape[1:], fill, dtype=table.dtype)])
+    return padded[ids]
+
+
+def move_used(store: BattleTensorStore, player: str) -> np.ndarray:
+    """True on the turns where the player used a move (the move has a known category)."""
+    return store[f'{player}_move_category'] >= 0
+
+
+def stab_per_turn(store: BattleTensorStore, registry: PokedexRegistry, player: str) -> np.ndarray:
+    """STAB multiplier of every turn as in avg_stab_multiplier: 1.5 when the move type is one of the attacker's types."""
+    species = _species_ids(store, registry)[store[f'{player}_pokemon']]
+    attacker_types = _registry_rows(registry.type_ids, species, -1)
+    move_type = store[f'{player}_move_type']
+    is_stab = (move_type >= 0) & ((attacker_types[..., 0] == move_type) | (attacker_types[..., 1] == move_type))
+    return np.where(move_used(store, player) & is_stab, 1.5, 1.0)
+
+
+def effectiveness_per_turn(store: BattleTensorStore, registry: PokedexRegistry, player: str) -> np.ndarray:
+    """Type multiplier of the player's move on the opponent of every turn, 0.0 when no move is used."""
+    opponent = 'p2' if player == 'p1' else 'p1'
+    species = _species_ids(store, registry)[store[f'{opponent}_pokemon']]
+    defender_types = _registry_rows(registry.type_ids, species, -1).astype(np.int64)
+    defender_types[defender_types < 0] = NO_TYPE
+    move_type = store[f'{player}_move_type'].astype(np.int64)
+    used = move_used(store, player) & (move_type >= 0)
+    return np.where(used, effectiveness_batch(np.maximum(move_type, 0), defender_types), 0.0)
+
+
+def stat_diff_per_turn(store: BattleTensorStore, registry: PokedexRegistry, stat: str) -> np.ndarray:
+    """P1 - P2 base stat of the active pokemon of every turn, as in avg_stat_diff_per_turn (hp scaled by hp_pct)."""
+    ids = _species_ids(store, registry)
+    column = base_stat_names.index(stat)
+    stat_1 = _registry_rows(registry.stats, ids, 0.0)[store.p1_pokemon][..., column]
+    stat_2 = _registry_rows(registry.stats, ids, 0.0)[store.p2_pokemon][..., column]
+    if stat == 'hp':
+        return stat_1 * np.nan_to_num(store.p1_hp_pct) - stat_2 * np.nan_to_num(store.p2_hp_pct)
+    return stat_1 - stat_2
+
+
+# ------------------------------------------------- extractors on the store
+
+def _segmenter(store: BattleTensorStore, divide_turns: bool, segments: dict, exact: bool, cutoffs: tuple) -> TurnSegmenter:
+    return TurnSegmenter(store.n_turns, segments if divide_turns else WHOLE_TIMELINE, exact=exact, cutoffs=cutoffs)
+
+
+def avg_effectiveness2_from_store(store: BattleTensorStore, registry: PokedexRegistry, difference: bool = False, divide_turns: bool = True,
+                                  segments: dict = TURN_SEGMENTS, exact: bool = False, test: bool = False, cutoffs: tuple = None) -> pd.DataFrame:
+    """
+    extractors.avg_effectiveness2 over a BattleTensorStore.
+
+    Args:
+        store: battles as a BattleTensorStore.
+        registry: PokedexRegistry of the dataset.
+        difference: If True, returns the difference (P1 - P2).
+        divide_turns: If True, computes one average per segment.
+        segments: dict name -> (start, end) of the segments (default: first, middle and last 10 turns).
+        exact: If True, bit-identical to the extractor (O(n_turns) per segment); otherwise, the default,
+               O(1) prefix-sum segments, equal to the extractor within a few ulps.
+        test: If True, excludes player_won from output
+        cutoffs: If given, the battles truncated at every cutoff turn, stacked cutoff by cutoff (see TurnSegmenter).
+    """
+    segmenter = _segmenter(store, divide_turns, segments, exact, cutoffs)
+    eff_p1 = segmenter.means(effectiveness_per_turn(store, registry, 'p1'))
+    eff_p2 = segmenter.means(effectiveness_per_turn(store, registry, 'p2'))
+
+    result = {'battle_id': segmenter.take(store.battle_id)}
+    for name in segmenter.segments:
+        suffix = f'_{name}' if divide_turns else ''
+        if difference:
+            result[f'avg_effectiveness_diff{suffix}'] = eff_p1[name] - eff_p2[name]
+        else:
+            result[f'avg_effectiveness_p1{suffix}'] = eff_p1[name]
+            result[f'avg_effectiveness_p2{suffix}'] = eff_p2[name]
+    if not test:
+        result['player_won'] = store.labels(segmenter.rows)
+    return pd.DataFrame(result)
+
+
+def avg_stab_multiplier_from_store(store: BattleTensorStore, registry: PokedexRegistry, difference: bool = False, divide_turns: bool = True,
+                                   segments: dict = TURN_SEGMENTS, exact: bool = False, test: bool = False, cutoffs: tuple = None) -> pd.DataFrame:
+    """
+    extractors.avg_stab_multiplier over a BattleTensorStore.
+
+    Args:
+        store: battles as a BattleTensorStore.
+        registry: PokedexRegistry of the dataset.
+        difference: If True, returns the difference (P1 - P2) in average STAB multipliers
+        divide_turns: If True, computes one average per segment.
+        segments: dict name -> (start, end) of the segments (default: first, middle and last 10 turns).
+        exact: If True, bit-identical to the extractor (O(n_turns) per segment); otherwise, the default,
+               O(1) prefix-sum segments, equal to the extractor within a few ulps.
+        test: If True, excludes player_won from output
+        cutoffs: If given, the battles truncated at every cutoff turn, stacked cutoff by cutoff (see TurnSegmenter).
+    """
+    segmenter = _segmenter(store, divide_turns, segments, exact, cutoffs)
+    stab_p1 = segmenter.means(stab_per_turn(store, registry, 'p1'))
+    stab_p2 = segmenter.means(stab_per_turn(store, registry, 'p2'))
+
+    result = {'battle_id': segmenter.take(store.battle_id)}
+    for name in segmenter.segments:
+        prefix = f'{name}_' if divide_turns else 'avg_'
+        if difference:
+            result[f'{prefix}stab_diff'] = stab_p1[name] - stab_p2[name]
+        else:
+            result[f'{prefix}stab_p1'] = stab_p1[name]
+            result[f'{prefix}stab_p2'] = stab_p2[name]
+    if not test:
+        result['player_won'] = store.labels(segmenter.rows)
+    return pd.DataFrame(result)
+
+
+def avg_stat_diff_per_turn_from_store(store: BattleTensorStore, registry: PokedexRegistry, stats: list[str], divide_turns: bool = True,
+                                      segments: dict = TURN_SEGMENTS, exact: bool = False, test: bool = False, cutoffs: tuple = None) -> pd.DataFrame:
+    """
+    extractors.avg_stat_diff_per_turn over a BattleTensorStore.
+
+    Args:
+        store: battles as a BattleTensorStore.
+        registry: PokedexRegistry of the dataset.
+        stats: List of stat names to calculate ('hp', 'atk', 'def', 'spa', 'spd', 'spe')
+        divide_turns: If True, computes one average per segment.
+        segments: dict name -> (start, end) of the segments (default: first, middle and last 10 turns).
+        exact: If True, bit-identical to the extractor (O(n_turns) per segment); otherwise, the default,
+               O(1) prefix-sum segments, equal to the extractor within a few ulps.
+        test: If True, excludes player_won from output
+        cutoffs: If given, the battles truncated at every cutoff turn, stacked cutoff by cutoff (see TurnSegmenter).
+    """
+    segmenter = _segmenter(store, divide_turns, segments, exact, cutoffs)
+    means = {stat: segmenter.means(stat_diff_per_turn(store, registry, stat)) for stat in stats}
+
+    result = {'battle_id': segmenter.take(store.battle_id)}
+    for name in segmenter.segments:
+        for stat in stats:
+            column = f'{name}_{stat}_diff' if divide_turns else f'avg_{stat}_diff_per_turn'
+            result[column] = means[stat][name]
+    if not test:
+        result['player_won'] = store.labels(segmenter.rows)
+    return pd.DataFrame(result)
+
+
+def accuracy_avg_from_store(store: BattleTensorStore, difference: bool = False, divide_turns: bool = True,
+                            segments: dict = TURN_SEGMENTS, exact: bool = False, test: bool = False, cutoffs: tuple = None) -> pd.DataFrame:
+    """
+    extractors.accuracy_avg over a BattleTensorStore (accuracy, priority and
+    base power are 0 on the turns without a move, as in the extractor).
+
+    Args:
+        store: battles as a BattleTensorStore.
+        difference: If True, returns the difference (P1 - P2) in average accuracy and priority
+        divide_turns: If True, computes one average per segment.
+        segments: dict name -> (start, end) of the segments (default: first, middle and last 10 turns).
+        exact: If True, bit-identical to the extractor (O(n_turns) per segment); otherwise, the default,
+               O(1) prefix-sum segments, equal to the extractor within a few ulps.
+        test: If True, excludes player_won from output
+        cutoffs: If given, the battles truncated at every cutoff turn, stacked cutoff by cutoff (see TurnSegmenter).
+    """
+    segmenter = _segmenter(store, divide_turns, segments, exact, cutoffs)
+    accuracy_p1 = segmenter.means(store.p1_move_accuracy)
+    accuracy_p2 = segmenter.means(store.p2_move_accuracy)
+    priority_p1 = segmenter.means(store.p1_move_priority)
+    priority_p2 = segmenter.means(store.p2_move_priority)
+
+    result = {'battle_id': segmenter.take(store.battle_id)}
+    for name in segmenter.segments:
+        prefix = f'{name}_' if divide_turns else 'avg_'
+        if difference:
+            result[f'{prefix}accuracy_diff'] = accuracy_p1[name] - accuracy_p2[name]
+            result[f'{prefix}priority_diff'] = priority_p1[name] - priority_p2[name]
+        else:
+            result[f'{prefix}accuracy_p1'] = accuracy_p1[name]
+            result[f'{prefix}accuracy_p2'] = accuracy_p2[name]
+            result[f'{prefix}priority_p1'] = priority_p1[name]
+            result[f'{prefix}priority_p2'] = priority_p2[name]
+    if not test:
+        result['player_won'] = store.labels(segmenter.rows)
+    return pd.DataFrame(result)
@@ -0,0 +1,114 @@
+# feature_engineering/team_masks.py
+"""
+Team state as bitmasks.
+
+get_p1_bench, get_last_hp, tot_pok_used, pokemon_encoding and
+last_turn_status_extractor build sets and dicts of pokemon names for every
+battle. With at most 64 species every team state fits in a uint64 whose bit s
+stands for species id s of the store vocabulary, and BattleTensorStore computes
+them once per battle at ingestion, over the same first max_turns turns as the
+turn fields (see tensor_store.BATTLE_FIELDS; with more species the store has no
+masks and the functions below raise a ValueError):
+
+- p1_team_mask: species of p1_team_details;
+- <player>_seen_mask: species that appeared in the timeline;
+- <player>_fainted_mask: species observed with hp_pct == 0.0;
+- <player>_alive_mask: species whose last observed hp_pct is > 0;
+- <player>_status_mask[:, k]: species whose last observed status is status_list[k].
+
+Set operations are then bitwise operations over whole arrays (the P1 bench is
+p1_team_mask & ~p1_seen_mask) and set sizes are popcounts. The results are
+identical to the extractors on timelines of at most max_turns turns.
+"""
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+from .constants import pokemon_list, status_list
+from .tensor_store import BattleTensorStore
+from .extractors import ACTIVE_STATUSES, ONEHOT_KINDS, pokemon_onehot_columns
+
+
+def popcount(masks: np.ndarray) -> np.ndarray:
+    """Number of set bits of every mask, as int64."""
+    return np.bitwise_count(np.asarray(masks)).astype(np.int64)
+
+
+def mask_names(store: BattleTensorStore, mask: int) -> set:
+    """Species names of the bits set in one mask."""
+    return {name for code, name in enumerate(store.vocab['species']) if int(mask) >> code & 1}
+
+
+def bench_mask(store: BattleTensorStore) -> np.ndarray:
+    """P1 species that never appeared in the timeline (mask version of utils.get_p1_bench)."""
+    return store.p1_team_mask & ~store.p1_seen_mask
+
+
+def tot_pok_used_from_store(store: BattleTensorStore, test: bool = False) -> pd.DataFrame:
+    """
+    extractors.tot_pok_used over a BattleTensorStore.
+
+    Args:
+        store: battles as a BattleTensorStore.
+        test: If True, excludes player_won from output
+    """
+    result = {'battle_id': np.asarray(store.battle_id),
+              'pok_used_diff': popcount(store.p1_seen_mask) - popcount(store.p2_seen_mask)}
+    if not test:
+        result['player_won'] = store.labels()
+    return pd.DataFrame(result)
+
+
+def last_turn_status_from_store(store: BattleTensorStore, test: bool = False) -> pd.DataFrame:
+    """
+    extractors.last_turn_status_extractor over a BattleTensorStore.
+
+    Args:
+        store: battles as a BattleTensorStore.
+        test: If True, excludes player_won from output
+    """
+    result = {'battle_id': np.asarray(store.battle_id)}
+    for status in ACTIVE_STATUSES:
+        k = status_list.index(status)
+        result[f"status_{status}_diff"] = popcount(store.p1_status_mask[:, k]) - popcount(store.p2_status_mask[:, k])
+    if not test:
+        result['player_won'] = store.labels()
+    return pd.DataFrame(result)
+
+
+def _onehot(store: BattleTensorStore) -> np.ndarray:
+    """Boolean (n_battles, 80) one-hot columns of pokemon_encoding, in pokemon_onehot_columns order."""
+    # names are lowercased by pokemon_encoding: every listed species may have several ids
+    species = np.zeros(len(pokemon_list), dtype=np.uint64)
+    for code, name in enumerate(store.vocab['species']):
+        if name.lower() in pokemon_list:
+            species[pokemon_list.index(name.lower())] |= np.uint64(1 << code)
+    masks = [store.p1_seen_mask, store.p1_fainted_mask, store.p2_seen_mask, store.p2_fainted_mask]
+    onehot = np.zeros((len(store), len(pokemon_list), len(ONEHOT_KINDS)), dtype=bool)
+    for k, mask in enumerate(masks):
+        onehot[:, :, k] = (mask[:, None] & species[None, :]) != 0
+    return onehot.reshape(len(store), -1)
+
+
+def pokemon_onehot_matrix_from_store(store: BattleTensorStore) -> csr_matrix:
+    """extractors.pokemon_onehot_matrix over a BattleTensorStore."""
+    return csr_matrix(_onehot(store).astype(np.int64))
+
+
+def pokemon_encoding_from_store(store: BattleTensorStore, sparse: bool = False, test: bool = False) -> pd.DataFrame:
+    """
+    extractors.pokemon_encoding(one_hot=True) over a BattleTensorStore (the
+    index encoding needs the order of appearance, which the masks do not keep).
+
+    Args:
+        store: battles as a BattleTensorStore.
+        sparse: If True, the one-hot columns are pd.SparseDtype(int64, 0)
+        test: If True, excludes player_won from output
+    """
+    if sparse:
+        df = pd.DataFrame.sparse.from_spmatrix(pokemon_onehot_matrix_from_store(store), columns=pokemon_onehot_columns())
+    else:
+        df = pd.DataFrame(_onehot(store).astype(np.int64), columns=pokemon_onehot_columns())
+    df.insert(0, 'battle_id', np.asarray(store.battle_id))
+    if not test:
+        df['player_won'] = store.labels()
+    return df
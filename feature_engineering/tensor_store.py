@@ -0,0 +1,366 @@
+# feature_engineering/tensor_store.py
+"""
+Columnar battle store.
+
+The extractors work on the nested dictionaries returned by get_dict_from_json.
+BattleTensorStore parses the battles once into dense NumPy arrays
+(struct-of-arrays): one (n_battles x max_turns) array per turn field, plus
+per-battle team arrays, so features can be computed as vectorized reductions.
+The store can be saved to a single .npz file or to a folder of .npy files that
+are memory-mapped on load, so the JSON never has to be parsed again.
+"""
+import json
+import os
+import numpy as np
+from .constants import (type_to_index, pokemon_list, status_list, effect_list,
+                        move_categories, boost_types, base_stat_names)
+
+
+# Fields stored for each player, with shape (n_battles, max_turns[, ...]) and dtype
+TURN_FIELDS = {
+    'pokemon': ((), np.int16),          # species id of the active pokemon (-1 = padding)
+    'hp_pct': ((), np.float64),         # NaN on padded turns
+    'boosts': ((len(boost_types),), np.int8),
+    'status': ((), np.int8),            # index in vocab['status'] (-1 = padding)
+    'effects': ((), np.uint32),         # bit i set <=> vocab['effects'][i] is active
+    'move_base_power': ((), np.int16),
+    'move_accuracy': ((), np.float64),
+    'move_priority': ((), np.int8),
+    'move_category': ((), np.int8),     # index in move_categories, -1 = no move
+    'move_type': ((), np.int8),         # index in constants.types, -1 = no move
+}
+
+# Per-battle fields, with the shape of one battle and dtype
+BATTLE_FIELDS = {
+    'battle_id': ((), np.int64),
+    'player_won': ((), np.int8),        # -1 when the label is missing (test set)
+    'n_turns': ((), np.int16),
+    'p1_team': ((6,), np.int16),        # species ids, -1 = empty slot
+    'p1_team_level': ((6,), np.int16),
+    'p2_lead': ((), np.int16),
+    'p2_lead_level': ((), np.int16),
+    # Team state bitmasks over the species ids (bit s <=> species s), from the stored (first max_turns) turns
+    'p1_team_mask': ((), np.uint64),    # species of p1_team_details
+    'p1_seen_mask': ((), np.uint64),    # species that appeared in the timeline
+    'p2_seen_mask': ((), np.uint64),
+    'p1_fainted_mask': ((), np.uint64), # species observed with hp_pct == 0.0
+    'p2_fainted_mask': ((), np.uint64),
+    'p1_alive_mask': ((), np.uint64),   # species whose last observed hp_pct is > 0
+    'p2_alive_mask': ((), np.uint64),
+    'p1_status_mask': ((len(status_list),), np.uint64),  # [k]: last observed status is status_list[k]
+    'p2_status_mask': ((len(status_list),), np.uint64),
+}
+
+
+# Species that fit in the team state bitmasks
+MASK_BITS = 64
+MASK_FIELDS = tuple(field for field in BATTLE_FIELDS if field.endswith('_mask'))
+
+
+def _type_code(type_name) -> int:
+    """Index of a type in constants.types, -1 for 'notype' or a missing type."""
+    if not type_name:
+        return -1
+    return type_to_index.get(type_name.lower(), -1)
+
+
+class _Vocabulary:
+    """Name -> code mapping that starts from the known values and grows on unseen ones."""
+
+    def __init__(self, names):
+        self.names = list(names)
+        self.index = {n: i for i, n in enumerate(self.names)}
+
+    def code(self, name) -> int:
+        if name not in self.index:
+            self.index[name] = len(self.names)
+            self.names.append(name)
+        return self.index[name]
+
+
+class BattleTensorStore:
+    """
+    Dense struct-of-arrays view of a battle dataset.
+
+    Turn fields are stored per player as '<player>_<field>' (e.g. 'p1_hp_pct',
+    'p2_move_type') with shape (n_battles, max_turns) or
+    (n_battles, max_turns, 5) for the boosts. Turns after the end of a timeline
+    are padding: see turn_mask. Move fields follow the defaults of the
+    extractors: when no move is used base_power, accuracy and priority are 0;
+    a move without 'accuracy' counts as 100.
+
+    Per-battle fields: battle_id, player_won, n_turns, p1_team, p1_team_level,
+    p2_lead, p2_lead_level, and the team state bitmasks of BATTLE_FIELDS
+    (uint64, bit s set <=> species id s; see team_masks), computed from the
+    same first max_turns turns as the turn fields. The masks exist only when
+    the data has at most MASK_BITS distinct species names (a missing name
+    counts as one): otherwise the rest of the store is built as usual and
+    reading a mask raises a ValueError. The species table (species_base_stats with columns
+    hp/atk/def/spa/spd/spe and species_types with two type codes) is taken from
+    the team details observed in the data.
+
+    Categorical codes are resolved with the vocabularies in `vocab`
+    ('species', 'status', 'effects').
+
+    Args:
+        arrays: dict field name -> np.ndarray.
+        vocab: dict vocabulary name -> list of names.
+    """
+
+    def __init__(self, arrays: dict, vocab: dict):
+        self.arrays = arrays
+        self.vocab = vocab
+
+    def __len__(self) -> int:
+        return len(self.arrays['battle_id'])
+
+    def __getitem__(self, field: str) -> np.ndarray:
+        if field in MASK_FIELDS and field not in self.arrays:
+            self._no_masks()
+        return self.arrays[field]
+
+    def __getattr__(self, field: str) -> np.ndarray:
+        arrays = self.__dict__.get('arrays', {})
+        if field in arrays:
+            return arrays[field]
+        if field in MASK_FIELDS and 'battle_id' in arrays:
+            self._no_masks()
+        raise AttributeError(field)
+
+    @property
+    def has_masks(self) -> bool:
+        """True if the team state bitmasks were computed (at most MASK_BITS species)."""
+        return all(field in self.arrays for field in MASK_FIELDS)
+
+    def _no_masks(self):
+        raise ValueError(f"This store has no team state bitmasks: they need at most {MASK_BITS} distinct species "
+                         f"(the store has {len(self.vocab['species'])}) and are not kept by head()")
+
+    @property
+    def max_turns(self) -> int:
+        return self.arrays['p1_hp_pct'].shape[1]
+
+    @property
+    def turn_mask(self) -> np.ndarray:
+        """Boolean (n_battles, max_turns) array, True on the turns that exist."""
+        return np.arange(self.max_turns)[None, :] < self.arrays['n_turns'][:, None]
+
+    def head(self, max_turns: int) -> 'BattleTensorStore':
+        """
+        The store cut at the first max_turns turns, as if every timeline
+        stopped there: the turn fields are NumPy views (no copy) and n_turns is
+        capped. The team state bitmasks cover all the stored turns, so they are
+        left out.
+        """
+        turn_fields = {f'{player}_{field}' for player in ('p1', 'p2') for field in TURN_FIELDS}
+        arrays = {name: array[:, :max_turns] if name in turn_fields else array
+                  for name, array in self.arrays.items() if name not in MASK_FIELDS}
+        arrays['n_turns'] = np.minimum(self.arrays['n_turns'], max_turns).astype(self.arrays['n_turns'].dtype)
+        return BattleTensorStore(arrays, self.vocab)
+
+    def labels(self, rows: np.ndarray = None) -> list:
+        """player_won of every battle (or of the given rows) as the extractors output it: True/False, None when missing."""
+        won = self.arrays['player_won'] if rows is None else self.arrays['player_won'][rows]
+        return [None if w < 0 else bool(w) for w in won]
+
+    def species_names(self, ids: np.ndarray) -> np.ndarray:
+        """Decode species ids into names ('' for -1)."""
+        names = np.array(self.vocab['species'] + [''], dtype=object)
+        return names[np.asarray(ids)]
+
+    # ------------------------------------------------------------------ build
+
+    @classmethod
+    def from_battles(cls, data, max_turns: int = 30) -> 'BattleTensorStore':
+        """Build the store from battle dictionaries (a list or any iterable)."""
+        if not hasattr(data, '__len__'):
+            data = list(data)
+        builder = _StoreBuilder(len(data), max_turns)
+        for b, battle in enumerate(data):
+            builder.add(b, battle)
+        return builder.build()
+
+    @classmethod
+    def from_jsonl(cls, file_path: str, max_turns: int = 30) -> 'BattleTensorStore':
+        """Parse a JSONL file line by line straight into the arrays."""
+        with open(file_path, 'r') as f:
+            n_battles = sum(1 for line in f if line.strip())
+        builder = _StoreBuilder(n_battles, max_turns)
+        with open(file_path, 'r') as f:
+            b = 0
+            for line in f:
+                if line.strip():
+                    builder.add(b, json.loads(line))
+                    b += 1
+        return builder.build()
+
+    # ------------------------------------------------------------ persistence
+
+    def save(self, path: str):
+        """
+        Save the store.
+
+        A path ending in '.npz' writes a single (uncompressed) archive; any other
+        path is used as a folder with one .npy file per field, which load() can
+        memory-map.
+        """
+        vocab_arrays = {f'vocab_{name}': np.array(names, dtype=str) for name, names in self.vocab.items()}
+        if path.endswith('.npz'):
+            np.savez(path, **self.arrays, **vocab_arrays)
+            return
+        os.makedirs(path, exist_ok=True)
+        for name, array in {**self.arrays, **vocab_arrays}.items():
+            np.save(os.path.join(path, f'{name}.npy'), array)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> 'BattleTensorStore':
+        """
+        Load a store written by save().
+
+        From a folder the arrays are memory-mapped read-only when mmap is True,
+        so only the pages that are actually used get read from disk.
+        """
+        if path.endswith('.npz'):
+            with np.load(path) as archive:
+                loaded = {name: archive[name] for name in archive.files}
+        else:
+            mmap_mode = 'r' if mmap else None
+            loaded = {
+                file[:-len('.npy')]: np.load(os.path.join(path, file), mmap_mode=mmap_mode)
+                for file in sorted(os.listdir(path)) if file.endswith('.npy')
+            }
+        vocab = {name[len('vocab_'):]: [str(v) for v in array]
+                 for name, array in loaded.items() if name.startswith('vocab_')}
+        arrays = {name: array for name, array in loaded.items() if not name.startswith('vocab_')}
+        return cls(arrays, vocab)
+
+
+class _StoreBuilder:
+    """Fills preallocated arrays one battle at a time."""
+
+    def __init__(self, n_battles: int, max_turns: int):
+        self.max_turns = max_turns
+        self.arrays = {}
+        for player in ('p1', 'p2'):
+            for field, (shape, dtype) in TURN_FIELDS.items():
+                self.arrays[f'{player}_{field}'] = np.zeros((n_battles, max_turns) + shape, dtype=dtype)
+            self.arrays[f'{player}_pokemon'][:] = -1
+            self.arrays[f'{player}_hp_pct'][:] = np.nan
+            self.arrays[f'{player}_status'][:] = -1
+            self.arrays[f'{player}_move_category'][:] = -1
+            self.arrays[f'{player}_move_type'][:] = -1
+        for field, (shape, dtype) in BATTLE_FIELDS.items():
+            self.arrays[field] = np.zeros((n_battles,) + shape, dtype=dtype)
+        self.arrays['p1_team'][:] = -1
+        self.arrays['p2_lead'][:] = -1
+        self.arrays['player_won'][:] = -1
+
+        self.species = _Vocabulary(pokemon_list)
+        self.status = _Vocabulary(status_list)
+        self.effects = _Vocabulary(effect_list)
+        self.category_index = {c: i for i, c in enumerate(move_categories)}
+        self.species_details = {}  # species id -> (base stats, type codes)
+
+    def _species(self, details: dict) -> int:
+        """Species id of a team/lead entry, recording its base stats and types."""
+        sid = self.species.code(details.get('name'))
+        if sid not in self.species_details:
+            types = (details.get('types') or []) + ['notype', 'notype']
+            self.species_details[sid] = (
+                [details.get(f'base_{stat}', 0) for stat in base_stat_names],
+                [_type_code(types[0]), _type_code(types[1])],
+            )
+        return sid
+
+    def _effects_mask(self, effects) -> int:
+        mask = 0
+        for effect in effects or []:
+            code = self.effects.code(effect)
+            if code >= 32:
+                raise ValueError(f"Too many distinct effects to fit in a 32-bit mask ({effect})")
+            mask |= 1 << code
+        return mask
+
+    def _species_bit(self, name) -> int:
+        """Bit of a species in the masks, 0 once there are more than MASK_BITS species (masks dropped at build)."""
+        code = self.species.code(name)
+        return 1 << code if code < MASK_BITS else 0
+
+    def _team_state(self, b: int, battle: dict, timeline: list):
+        """Team state bitmasks of a battle, from the stored turns of its timeline."""
+        a = self.arrays
+        for pokemon in battle.get('p1_team_details') or []:
+            a['p1_team_mask'][b] |= self._species_bit(pokemon.get('name'))
+        for player in ('p1', 'p2'):
+            seen = fainted = 0
+            last = {}  # species bit -> last observed state
+            for turn in timeline:
+                state = turn.get(f'{player}_pokemon_state') or {}
+                bit = self._species_bit(state.get('name'))
+                seen |= bit
+                if state.get('hp_pct') == 0.0:
+                    fainted |= bit
+                last[bit] = state
+            a[f'{player}_seen_mask'][b] = seen
+            a[f'{player}_fainted_mask'][b] = fainted
+            for bit, state in last.items():
+                if (state.get('hp_pct') or 0) > 0:
+                    a[f'{player}_alive_mask'][b] |= bit
+                code = self.status.code(state.get('status', 'nostatus'))
+                if code < len(status_list):
+                    a[f'{player}_status_mask'][b, code] |= bit
+
+    def add(self, b: int, battle: dict):
+        a = self.arrays
+        a['battle_id'][b] = battle['battle_id']
+        if battle.get('player_won') is not None:
+            a['player_won'][b] = int(battle['player_won'])
+
+        for slot, pokemon in enumerate(battle.get('p1_team_details', [])[:6]):
+            a['p1_team'][b, slot] = self._species(pokemon)
+            a['p1_team_level'][b, slot] = pokemon.get('level') or 0
+        p2_lead = battle.get('p2_lead_details')
+        if p2_lead:
+            a['p2_lead'][b] = self._species(p2_lead)
+            a['p2_lead_level'][b] = p2_lead.get('level') or 0
+
+        timeline = (battle.get('battle_timeline') or [])[:self.max_turns]
+        a['n_turns'][b] = len(timeline)
+        for t, turn in enumerate(timeline):
+            for player in ('p1', 'p2'):
+                state = turn.get(f'{player}_pokemon_state') or {}
+                a[f'{player}_pokemon'][b, t] = self.species.code(state.get('name'))
+                a[f'{player}_hp_pct'][b, t] = state.get('hp_pct', np.nan)
+                boosts = state.get('boosts') or {}
+                a[f'{player}_boosts'][b, t] = [boosts.get(k, 0) for k in boost_types]
+                a[f'{player}_status'][b, t] = self.status.code(state.get('status', 'nostatus'))
+                a[f'{player}_effects'][b, t] = self._effects_mask(state.get('effects'))
+
+                move = turn.get(f'{player}_move_details')
+                if move:
+                    a[f'{player}_move_base_power'][b, t] = move.get('base_power', 0)
+                    a[f'{player}_move_accuracy'][b, t] = move.get('accuracy', 100)
+                    a[f'{player}_move_priority'][b, t] = move.get('priority', 0)
+                    a[f'{player}_move_category'][b, t] = self.category_index.get((move.get('category') or '').upper(), -1)
+                    a[f'{player}_move_type'][b, t] = _type_code(move.get('type'))
+        self._team_state(b, battle, timeline)
+
+    def build(self) -> BattleTensorStore:
+        n_species = len(self.species.names)
+        species_base_stats = np.zeros((n_species, len(base_stat_names)), dtype=np.float64)
+        species_types = np.full((n_species, 2), -1, dtype=np.int8)
+        for sid, (stats, types) in self.species_details.items():
+            species_base_stats[sid] = stats
+            species_types[sid] = types
+        self.arrays['species_base_stats'] = species_base_stats
+        self.arrays['species_types'] = species_types
+        if n_species > MASK_BITS:
+            for field in MASK_FIELDS:
+                del self.arrays[field]
+
+        vocab = {
+            'species': [str(n) for n in self.species.names],
+            'status': list(self.status.names),
+            'effects': list(self.effects.names),
+        }
+        return BattleTensorStore(self.arrays, vocab)
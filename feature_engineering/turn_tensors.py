@@ -0,0 +1,206 @@
+# feature_engineering/turn_tensors.py
+"""
+Whole-timeline counts and averages as sums over turn tensors.
+
+avg_boost_diff_per_turn walks every turn and the five boost keys with dict
+lookups, granular_turn_counts fills four defaultdicts per battle and checks
+list membership for every effect. Over a BattleTensorStore both are a sum
+along the turns (TurnSegmenter.totals, which also reads them at several
+cutoffs from one cumulative sum):
+
+- boosts: the (n_battles x max_turns x 5) boost tensor of each player, 0 on
+  the padded turns;
+- statuses / effects: one-hot tensors (n_battles x max_turns x k) built from
+  the status codes and the effect bitmasks (padded turns match nothing).
+
+Counts and boost totals are integers, so the results are identical to the
+extractors. The effects of a turn are a set in the store: an effect listed
+twice in the same turn counts once.
+
+team_hp_advantage_flip_count needs the team HP at every turn: the last known
+HP of every pokemon seen so far is forward-filled along the turns, one slot per
+pokemon in order of first appearance, and the slots are added in that order,
+which is the order np.sum adds the dict values in the extractor (so the ties
+between the two teams are the same).
+"""
+import numpy as np
+import pandas as pd
+from .constants import boost_types
+from .utils import TeamHP
+from .tensor_store import BattleTensorStore
+from .segments import TurnSegmenter, WHOLE_TIMELINE
+
+# Statuses and negative effects counted by granular_turn_counts
+GRANULAR_STATUSES = ['slp', 'par', 'psn', 'brn', 'frz']
+NEGATIVE_EFFECTS = ['clamp', 'confusion', 'disable', 'firespin', 'wrap']
+
+
+def status_onehot(store: BattleTensorStore, player: str, statuses: list[str]) -> np.ndarray:
+    """Boolean (n_battles, max_turns, len(statuses)) tensor: the active pokemon has statuses[k] (case-insensitive)."""
+    codes = store[f'{player}_status']
+    names = [str(name).lower() for name in store.vocab['status']]
+    onehot = np.zeros(codes.shape + (len(statuses),), dtype=bool)
+    for k, status in enumerate(statuses):
+        matching = [code for code, name in enumerate(names) if name == status]
+        onehot[..., k] = np.isin(codes, matching)
+    return onehot
+
+
+def effect_onehot(store: BattleTensorStore, player: str, effects: list[str]) -> np.ndarray:
+    """Boolean (n_battles, max_turns, len(effects)) tensor: effects[k] is active on the pokemon."""
+    masks = store[f'{player}_effects']
+    onehot = np.zeros(masks.shape + (len(effects),), dtype=bool)
+    for k, effect in enumerate(effects):
+        if effect in store.vocab['effects']:
+            bit = np.uint32(1 << store.vocab['effects'].index(effect))
+            onehot[..., k] = (masks & bit) != 0
+    return onehot
+
+
+def avg_boost_diff_per_turn_from_store(store: BattleTensorStore, test: bool = False, cutoffs: tuple = None) -> pd.DataFrame:
+    """
+    extractors.avg_boost_diff_per_turn over a BattleTensorStore.
+
+    Args:
+        store: battles as a BattleTensorStore.
+        test: If True, excludes player_won from output
+        cutoffs: If given, the battles truncated at every cutoff turn, stacked cutoff by cutoff (see TurnSegmenter).
+    """
+    segmenter = TurnSegmenter(store.n_turns, WHOLE_TIMELINE, cutoffs=cutoffs)
+    n_turns = segmenter.n_turns.astype(np.float64)
+    totals_p1 = segmenter.totals(store.p1_boosts)
+    totals_p2 = segmenter.totals(store.p2_boosts)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        avg_p1 = np.where(n_turns[:, None] > 0, totals_p1 / n_turns[:, None], 0.0)
+        avg_p2 = np.where(n_turns[:, None] > 0, totals_p2 / n_turns[:, None], 0.0)
+
+    result = {'battle_id': segmenter.take(store.battle_id)}
+    for k, boost_type in enumerate(boost_types):
+        result[f'avg_{boost_type}_boost_diff'] = avg_p1[:, k] - avg_p2[:, k]
+    if not test:
+        result['player_won'] = store.labels(segmenter.rows)
+    return pd.DataFrame(result)
+
+
+def granular_turn_counts_from_store(store: BattleTensorStore, difference: bool = False, test: bool = False, cutoffs: tuple = None) -> pd.DataFrame:
+    """
+    extractors.granular_turn_counts over a BattleTensorStore.
+
+    Args:
+        store: battles as a BattleTensorStore.
+        difference: If True, returns the difference (P1 - P2) of the turn counts
+        test: If True, excludes player_won from output
+        cutoffs: If given, the battles truncated at every cutoff turn, stacked cutoff by cutoff (see TurnSegmenter).
+    """
+    segmenter = TurnSegmenter(store.n_turns, WHOLE_TIMELINE, cutoffs=cutoffs)
+    status_p1 = segmenter.totals(status_onehot(store, 'p1', GRANULAR_STATUSES))
+    status_p2 = segmenter.totals(status_onehot(store, 'p2', GRANULAR_STATUSES))
+    effect_p1 = segmenter.totals(effect_onehot(store, 'p1', NEGATIVE_EFFECTS))
+    effect_p2 = segmenter.totals(effect_onehot(store, 'p2', NEGATIVE_EFFECTS))
+
+    result = {'battle_id': segmenter.take(store.battle_id)}
+    for names, counts_p1, counts_p2 in ((GRANULAR_STATUSES, status_p1, status_p2), (NEGATIVE_EFFECTS, effect_p1, effect_p2)):
+        for k, name in enumerate(names):
+            if difference:
+                result[f'{name}_turn_diff'] = counts_p1[:, k] - counts_p2[:, k]
+            else:
+                result[f'p1_{name}_turns'] = counts_p1[:, k]
+                result[f'p2_{name}_turns'] = counts_p2[:, k]
+    if not test:
+        result['player_won'] = store.labels(segmenter.rows)
+    return pd.DataFrame(result)
+
+
+def team_hp_slots(store: BattleTensorStore, player: str) -> tuple:
+    """
+    Last known HP of every pokemon of a player's team at every turn.
+
+    Returns (hp, seen): (n_battles, max_turns, n_slots) arrays, slot k being
+    the k-th pokemon of the battle in order of first appearance; seen[b, t, k]
+    is False until that pokemon appears (hp is then 0.0).
+    """
+    ids = np.asarray(store[f'{player}_pokemon'], dtype=np.int64)
+    hp = np.asarray(store[f'{player}_hp_pct'], dtype=np.float64)
+    names = store.vocab['species']
+    invalid = [code for code, name in enumerate(names) if name in ('', 'None')]
+    # the extractor only records a pokemon with a name and an hp_pct
+    valid = (ids >= 0) & ~np.isin(ids, invalid) & ~np.isnan(hp)
+
+    n_battles, max_turns = ids.shape
+    turns = np.arange(max_turns)
+    # first turn of every species in every battle (max_turns if never seen)
+    first = np.full((n_battles, len(names) + 1), max_turns, dtype=np.int64)
+    codes = np.where(valid, ids, len(names))
+    np.minimum.at(first, (np.repeat(np.arange(n_battles), max_turns), codes.ravel()), np.tile(turns, n_battles))
+    first[:, -1] = max_turns
+    # slot of a species = number of species that appeared before it
+    rank = np.argsort(np.argsort(first, axis=1, kind='stable'), axis=1, kind='stable')
+    slot = np.take_along_axis(rank, codes, axis=1)
+    n_slots = int((first < max_turns).sum(axis=1).max(initial=0))
+
+    slots_hp = np.zeros((n_battles, max_turns, n_slots))
+    slots_seen = np.zeros((n_battles, max_turns, n_slots), dtype=bool)
+    for k in range(n_slots):
+        last = np.where(valid & (slot == k), turns, -1)
+        last = np.maximum.accumulate(last, axis=1)
+        slots_seen[..., k] = last >= 0
+        slots_hp[..., k] = np.where(last >= 0, np.take_along_axis(hp, np.maximum(last, 0), axis=1), 0.0)
+    return slots_hp, slots_seen
+
+
+def _team_average(store: BattleTensorStore, player: str, team_size: int) -> tuple:
+    """(n_battles, max_turns) average team HP as in the extractor, and the number of pokemon seen."""
+    slots_hp, slots_seen = team_hp_slots(store, player)
+    total = np.zeros(slots_hp.shape[:2])
+    for k in range(slots_hp.shape[2]):
+        total = total + slots_hp[..., k]  # value by value, in order of appearance
+    seen = slots_seen.sum(axis=2)
+    return (total + (team_size - seen) * 1.0) / team_size, seen
+
+
+def _exact_states(store: BattleTensorStore, b: int, team_size: int) -> np.ndarray:
+    """Advantage states of one battle with TeamHP trackers (teams of 8+ pokemon, summed pairwise by numpy)."""
+    states = np.zeros(store.max_turns, dtype=np.int64)
+    teams = {'p1': TeamHP(team_size), 'p2': TeamHP(team_size)}
+    names = store.vocab['species']
+    for t in range(int(store.n_turns[b])):
+        for player, team in teams.items():
+            code, hp = int(store[f'{player}_pokemon'][b, t]), float(store[f'{player}_hp_pct'][b, t])
+            if code >= 0 and names[code] not in ('', 'None') and not np.isnan(hp):
+                team.set(code, hp)
+        states[t] = teams['p1'].compare(teams['p2'])
+    return states
+
+
+def team_hp_advantage_flip_count_from_store(store: BattleTensorStore, team_size: int = 6, test: bool = False, cutoffs: tuple = None) -> pd.DataFrame:
+    """
+    extractors.team_hp_advantage_flip_count over a BattleTensorStore.
+
+    Args:
+        store: battles as a BattleTensorStore.
+        team_size: The number of Pokémon per team (default 6).
+        test: If True, excludes player_won from output
+        cutoffs: If given, the battles truncated at every cutoff turn, stacked cutoff by cutoff (see TurnSegmenter).
+    """
+    avg_p1, seen_p1 = _team_average(store, 'p1', team_size)
+    avg_p2, seen_p2 = _team_average(store, 'p2', team_size)
+    # 1 if P1 has more avg HP, -1 if P2 has more, 0 if equal
+    states = (avg_p1 > avg_p2).astype(np.int64) - (avg_p2 > avg_p1)
+    for b in np.flatnonzero((seen_p1.max(axis=1, initial=0) >= 8) | (seen_p2.max(axis=1, initial=0) >= 8)):
+        states[b] = _exact_states(store, b, team_size)
+
+    # last non-tie state before every turn
+    turns = np.arange(states.shape[1])
+    last = np.maximum.accumulate(np.where(states != 0, turns, -1), axis=1)
+    previous = np.zeros_like(states)
+    previous[:, 1:] = np.where(last[:, :-1] >= 0, np.take_along_axis(states, np.maximum(last[:, :-1], 0), axis=1), 0)
+
+    flips = (states != previous) & (previous != 0) & store.turn_mask
+    segmenter = TurnSegmenter(store.n_turns, WHOLE_TIMELINE, cutoffs=cutoffs)
+    result = {'battle_id': segmenter.take(store.battle_id),
+              'total_team_hp_adv_flips': segmenter.totals(flips),
+              'p1_gained_team_adv_count': segmenter.totals(flips & (states == 1)),
+              'p2_gained_team_adv_count': segmenter.totals(flips & (states == -1))}
+    if not test:
+        result['player_won'] = store.labels(segmenter.rows)
+    return pd.DataFrame(result)
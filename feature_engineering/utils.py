@@ -3,7 +3,30 @@
 import json
 import numpy as np
 import pandas as pd
-from .constants import type_chart, type_to_index # Import constants
+from .constants import type_chart, type_to_index, dual_type_chart, NO_TYPE # Import constants
+
+def iter_battles(file_path: str):
+    """Yield the battles of a JSONL file one at a time, without keeping the whole file in memory."""
+    with open(file_path, 'r') as f:
+        for line in f:
+            if line.strip():
+                # json.loads() parses one line (one JSON object) into a Python dictionary
+                yield json.loads(line)
+
+
+def iter_battle_chunks(file_path: str, chunk_size: int):
+    """Yield the battles of a JSONL file in lists of at most chunk_size battles."""
+    if chunk_size < 1:
+        raise ValueError(f"chunk_size must be a positive integer, got {chunk_size}")
+    chunk = []
+    for battle in iter_battles(file_path):
+        chunk.append(battle)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
 
 def get_dict_from_json(file_path):
     l=[]
@@ -54,6 +77,14 @@ def pokedex(data: list[dict]) -> pd.DataFrame:
     return pd.DataFrame(pokedex)
 
 
+def pokedex_frame(data) -> pd.DataFrame:
+    """Return pokedex(data), or data itself when it already is a pokedex DataFrame,
+    so the get_dict_* helpers can share a single scan of the battles."""
+    if isinstance(data, pd.DataFrame):
+        return data
+    return pokedex(data)
+
+
 def opponents_pokemon(data: list[dict]) -> pd.DataFrame:
     """Create a simple DataFrame with basic features for each observed opponent's pokemon """
     pokedex = []
@@ -73,8 +104,9 @@ def opponents_pokemon(data: list[dict]) -> pd.DataFrame:
 def get_all_def_types(data: list[dict]) -> pd.DataFrame:
     """Create a DataFrame with all unique pokemon defense types observed in the dataset"""
 
-    t1 = pokedex(data)['type1'].drop_duplicates().reset_index(drop=True)
-    t2 = pokedex(data)['type2'].drop_duplicates().reset_index(drop=True)
+    dex = pokedex_frame(data)
+    t1 = dex['type1'].drop_duplicates().reset_index(drop=True)
+    t2 = dex['type2'].drop_duplicates().reset_index(drop=True)
     all_types = pd.concat([t1, t2]).dropna().drop_duplicates().reset_index(drop=True)
     
     return all_types
@@ -93,11 +125,63 @@ def effectiveness(attacking_type: str, defending_types: list[str]) -> float:
     return mult
 
 
+# type name (lower or upper case) -> type code, with 'notype' mapped to NO_TYPE
+_TYPE_CODES = {**type_to_index, **{t.upper(): i for t, i in type_to_index.items()}, 'notype': NO_TYPE, 'NOTYPE': NO_TYPE}
+
+
+def _type_code(type_name) -> int:
+    code = _TYPE_CODES.get(type_name)
+    if code is None:
+        if not type_name:
+            return NO_TYPE
+        code = NO_TYPE if type_name.lower() == 'notype' else type_to_index[type_name.lower()]
+    return code
+
+
+def type_codes(type_names) -> np.ndarray:
+    """Convert type names into integer codes (index in constants.types).
+    'notype', None and empty names become NO_TYPE; an unknown name raises KeyError like effectiveness."""
+    return np.array([_type_code(t) for t in type_names], dtype=np.intp)
+
+
+def def_type_codes(defending_types: list) -> np.ndarray:
+    """Convert a list of defender type lists/sets (at most two types each) into an (n, 2) array of type codes."""
+    pairs = {}  # the same type lists come up again and again
+    first, second = [], []
+    for def_types in defending_types:
+        key = tuple(def_types or ())
+        pair = pairs.get(key)
+        if pair is None:
+            known = [code for code in map(_type_code, key) if code != NO_TYPE]
+            if len(known) > 2:
+                raise ValueError(f"A pokemon has at most two types, got {def_types}")
+            pair = pairs[key] = (known + [NO_TYPE, NO_TYPE])[:2]
+        first.append(pair[0])
+        second.append(pair[1])
+    return np.stack([np.array(first, dtype=np.intp), np.array(second, dtype=np.intp)], axis=-1)
+
+
+def effectiveness_batch(attacking_codes, defending_codes) -> np.ndarray:
+    """Vectorized effectiveness: one gather in constants.dual_type_chart.
+
+    Args:
+        attacking_codes: array of attacking type codes (see type_codes), any shape.
+        defending_codes: array of defender type pairs with shape attacking_codes.shape + (2,)
+                         (see def_type_codes), NO_TYPE for a missing type.
+
+    Returns an array of multipliers with the shape of attacking_codes, equal to
+    effectiveness(attacking_type, defending_types) element by element.
+    """
+    attacking_codes = np.asarray(attacking_codes)
+    defending_codes = np.asarray(defending_codes)
+    return dual_type_chart[attacking_codes, defending_codes[..., 0], defending_codes[..., 1]]
+
+
 def get_dict_def_types(data: list[dict]) -> dict: 
     """Create a dictionary with pokemon name as key and a set of its types as value"""
 
     pokemon_def_types = dict()
-    pokemons = pokedex(data)[['name','type1','type2']].drop_duplicates().sort_values('name').reset_index(drop=True)
+    pokemons = pokedex_frame(data)[['name','type1','type2']].drop_duplicates().sort_values('name').reset_index(drop=True)
 
     # Create the dictionary
     pokemon_def_types = pokemons.set_index('name').apply(lambda row: {t.lower() for t in row if t != 'notype'}, axis=1).to_dict()
@@ -110,7 +194,7 @@ def get_dict_attacker_types(data: list[dict]) -> dict:
     as get_dict_def_types the only difference is we use a list instead of a set and the names is different to clarify the use case"""
 
     # Use pokedex to get the types of the attacking Pokémon (which are on the field)
-    pokemons = pokedex(data)[['name','type1','type2']].drop_duplicates().sort_values('name').reset_index(drop=True)
+    pokemons = pokedex_frame(data)[['name','type1','type2']].drop_duplicates().sort_values('name').reset_index(drop=True)
     
     # Create the dictionary: name -> [type1, type2]
     # We use a list instead of a set/tuple here because we need to check both types for STAB.
@@ -123,7 +207,7 @@ def get_dict_base_stats(data: list[dict]) -> dict:
     """Create a dictionary with pokemon name as key and a list of its stats as value: base_atk	base_def base_spa base_spd"""
 
     pokemon_stats = dict()
-    pokemons = pokedex(data)[['name','base_atk','base_def','base_spa','base_spd']].drop_duplicates().sort_values('name').reset_index(drop=True)
+    pokemons = pokedex_frame(data)[['name','base_atk','base_def','base_spa','base_spd']].drop_duplicates().sort_values('name').reset_index(drop=True)
 
     # Create the dictionary
     pokemon_stats = pokemons.set_index('name').apply(lambda row: [t for t in row ], axis=1).to_dict()
@@ -133,7 +217,7 @@ def get_dict_base_stats(data: list[dict]) -> dict:
 
 def get_dict_base_stats1(data: list[dict]) -> dict: 
     """Return a dict mapping pokemon name -> dict of base stats (base_hp, base_atk, base_def, base_spa, base_spd, base_spe)."""
-    pokemons = pokedex(data)[['name','base_hp','base_atk','base_def','base_spa','base_spd','base_spe']].drop_duplicates().sort_values('name').reset_index(drop=True)
+    pokemons = pokedex_frame(data)[['name','base_hp','base_atk','base_def','base_spa','base_spd','base_spe']].drop_duplicates().sort_values('name').reset_index(drop=True)
 
     # Create nested dict: name -> { stat_name: value, ... }
     stats_dict = pokemons.set_index('name').to_dict(orient='index')
@@ -222,6 +306,93 @@ def get_last_hp(battle: dict, include_fainted: bool = False) -> dict:
     return result
 
 
+def small_sum(values: list) -> float:
+    """
+    Same result as np.sum(values), without building an array for a handful of floats.
+
+    numpy only switches to pairwise summation from 8 elements: below that it
+    adds the values one by one starting from 0.0, exactly like the builtin sum.
+    """
+    return sum(values) if len(values) < 8 else np.sum(values)
+
+
+def small_mean_var(values: list) -> tuple:
+    """Same result as (np.mean(values), np.var(values)), see small_sum."""
+    n = len(values)
+    if n >= 8:
+        return np.mean(values), np.var(values)
+    mean = sum(values) / n
+    return mean, sum([(x - mean) * (x - mean) for x in values]) / n
+
+
+# Average team HPs closer than this are re-added value by value before being compared (see TeamHP.compare)
+TIE_TOLERANCE = 1e-9
+
+
+class TeamHP:
+    """
+    Last known hp_pct of every pokemon of a team, with their running total.
+
+    set(name, hp) updates the total by the change of that pokemon's HP, so the
+    team HP is read in O(1) instead of summing the dict values every turn.
+    Pokemon not seen yet count as full HP (1.0) in the team total.
+
+    Args:
+        team_size: number of pokemon per team.
+        names: pokemon known from the start, at full HP (e.g. p1_team_details).
+    """
+
+    def __init__(self, team_size: int = 6, names=()):
+        self.team_size = team_size
+        self.hp = {}      # name -> last hp_pct, in order of first appearance
+        self.total = 0.0  # running sum of self.hp values
+        for name in names:
+            self.set(name, 1.0)
+
+    def __len__(self) -> int:
+        return len(self.hp)
+
+    def get(self, name, default=None):
+        return self.hp.get(name, default)
+
+    def set(self, name, hp, default=1.0):
+        """Record the HP of a pokemon and return its previous HP (default if it was not seen)."""
+        previous = self.hp.get(name)
+        self.hp[name] = hp
+        self.total += (hp or 0.0) - (previous or 0.0)
+        return default if previous is None else previous
+
+    def values(self) -> list:
+        return list(self.hp.values())
+
+    def team_total(self) -> float:
+        """Running HP total of the team, unseen pokemon counting 1.0."""
+        return self.total + (self.team_size - len(self.hp)) * 1.0
+
+    def exact_team_total(self) -> float:
+        """Team total added value by value in order of appearance, i.e. np.sum(values) + unseen * 1.0."""
+        return small_sum(self.values()) + (self.team_size - len(self.hp)) * 1.0
+
+    def compare(self, other: 'TeamHP') -> int:
+        """
+        1 if this team has the higher average HP, -1 if other has, 0 if equal.
+
+        The running totals decide when they are clearly apart; near ties are
+        decided on the totals re-added value by value, so the result is the one
+        of comparing np.sum(values) / team_size of both teams.
+        """
+        gap = self.team_total() / self.team_size - other.team_total() / other.team_size
+        if abs(gap) > TIE_TOLERANCE:
+            return 1 if gap > 0 else -1
+        avg_self = self.exact_team_total() / self.team_size
+        avg_other = other.exact_team_total() / other.team_size
+        if avg_self > avg_other:
+            return 1
+        if avg_other > avg_self:
+            return -1
+        return 0
+
+
 def get_p1_bench(battle: dict) -> set:
     """
     Finds the set of Pokémon on P1's team that never appeared in the
@@ -296,34 +467,34 @@ def team_potential(A: list[str], B: list[str], type_dict: dict) -> dict:
     # This is the standard "in-progress" battle.
     # We run your full calculation (with safety checks).
     else:
-        best_vs = []
-        redundancy = []
-        
-        for b_name in B:
+        # eff[b, a] = best effectiveness of attacker a against defender b, from a single gather
+        eff = np.ones((len(B), len(A)))
+        def_ok = np.zeros(len(B), dtype=bool)
+        def_codes = np.full((len(B), 2), NO_TYPE, dtype=np.intp)
+        for i, b_name in enumerate(B):
             # Safety check for dictionary lookup
-            def_types = list(type_dict.get(b_name, ['notype']))
-            
-            eff_list = []
-            for a_name in A:
-                # Safety check for dictionary lookup
-                att_types = list(type_dict.get(a_name, ['notype']))
-                
-                try:
-                    # We assume effectiveness() exists and works
-                    eff = max(effectiveness(att_type, def_types) for att_type in att_types)
-                except Exception:
-                    eff = 1.0 # Default fallback
-                eff_list.append(eff)
-            
-            # This is safe, since 'A' is not empty
-            best_val = max(eff_list)
-            strong_count = sum(e >= 2.0 for e in eff_list)
-            best_vs.append(best_val)
-            redundancy.append(strong_count)
-        
-        # This is safe, since 'B' is not empty
-        best_vs_np = np.array(best_vs, dtype=float)
-        redundancy_np = np.array(redundancy, dtype=float)
+            try:
+                def_codes[i] = def_type_codes([type_dict.get(b_name, ['notype'])])[0]
+                def_ok[i] = True
+            except Exception:
+                pass  # default fallback: effectiveness 1.0 against this defender
+
+        for j, a_name in enumerate(A):
+            # Safety check for dictionary lookup
+            att_types = list(type_dict.get(a_name, ['notype']))
+            try:
+                if not att_types or any(t.lower() == 'notype' for t in att_types):
+                    raise KeyError(att_types)
+                att_codes = type_codes(att_types)
+            except Exception:
+                continue  # default fallback: effectiveness 1.0
+            # (n_defenders, n_attack_types) multipliers, best attack type per defender
+            mult = effectiveness_batch(att_codes[None, :], def_codes[:, None, :])
+            eff[def_ok, j] = mult[def_ok].max(axis=1)
+
+        # This is safe, since 'A' and 'B' are not empty
+        best_vs_np = eff.max(axis=1)
+        redundancy_np = (eff >= 2.0).sum(axis=1).astype(float)
 
         # --- Aggregates ---
         avg_best = float(np.mean(best_vs_np))
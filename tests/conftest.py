@@ -0,0 +1,41 @@
+# tests/conftest.py
+import json
+import pandas as pd
+import pytest
+from sklearn.datasets import make_classification
+from benchmarks.synthetic import generate_battles
+from feature_engineering import PokedexRegistry, BattleTensorStore
+
+
+@pytest.fixture(scope='session')
+def battles():
+    """Synthetic battles of 30, 12 and 3 turns, so the turn segments are full, partial and empty."""
+    return (list(generate_battles(60))
+            + list(generate_battles(20, seed=1, n_turns=12, start_id=1000))
+            + list(generate_battles(5, seed=2, n_turns=3, start_id=2000)))
+
+
+@pytest.fixture(scope='session')
+def registry(battles):
+    return PokedexRegistry.from_data(battles)
+
+
+@pytest.fixture(scope='session')
+def store(battles):
+    return BattleTensorStore.from_battles(battles)
+
+
+@pytest.fixture(scope='session')
+def battles_file(battles, tmp_path_factory):
+    """The battles written to a JSONL file."""
+    path = tmp_path_factory.mktemp('data') / 'battles.jsonl'
+    path.write_text(''.join(json.dumps(battle) + '\n' for battle in battles))
+    return str(path)
+
+
+@pytest.fixture(scope='session')
+def model_data():
+    """A synthetic binary problem as two feature views sharing three columns, and its labels."""
+    X, y = make_classification(n_samples=200, n_features=8, n_informative=5, random_state=0)
+    df = pd.DataFrame(X, columns=[f'f{i}' for i in range(8)])
+    return {'main': df[[f'f{i}' for i in range(6)]], 'tree': df[[f'f{i}' for i in range(3, 8)]]}, y
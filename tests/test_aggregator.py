@@ -0,0 +1,65 @@
+# tests/test_aggregator.py
+import pandas as pd
+import pytest
+from feature_engineering import (generate_features, generate_features_chunked, extractor_calls, extractor_blocks, concat_features,
+                                 assemble_features, feature_spec, FeatureCache, ExtractorProfiler)
+
+SPARSE_SPEC = feature_spec(family='linear', params={'pokemon_encoding': {'sparse': True}})
+
+
+@pytest.mark.parametrize('tree', [False, True])
+def test_parallel_shards(battles, registry, tree):
+    pd.testing.assert_frame_equal(generate_features(battles, flag_test=False, tree=tree, registry=registry, fused=True, n_jobs=2),
+                                  generate_features(battles, flag_test=False, tree=tree, registry=registry), check_exact=True)
+
+
+def test_parallel_shards_need_the_fused_engine(battles):
+    with pytest.raises(ValueError):
+        generate_features(battles, flag_test=False, n_jobs=2)
+
+
+@pytest.mark.parametrize('tree', [False, True])
+@pytest.mark.parametrize('flag_test', [False, True])
+def test_concat_matches_the_merge_chain(battles, registry, tree, flag_test):
+    kwargs = dict(flag_test=flag_test, tree=tree, registry=registry)
+    pd.testing.assert_frame_equal(generate_features(battles, assemble='concat', **kwargs),
+                                  generate_features(battles, assemble='merge', **kwargs), check_exact=True)
+
+
+def test_concat_aligns_blocks_that_dropped_battles(battles, registry):
+    blocks = extractor_blocks(extractor_calls(flag_test=False), battles, registry=registry)
+    # one extractor skipped a battle, another returned its rows in a different order
+    blocks[1] = blocks[1].drop(index=3)
+    blocks[2] = blocks[2].iloc[::-1]
+    expected = assemble_features(blocks, assemble='merge')
+    assert len(expected) == len(battles) - 1
+    pd.testing.assert_frame_equal(concat_features(blocks), expected, check_exact=True)
+
+
+def test_concat_rejects_duplicated_columns():
+    df = pd.DataFrame({'battle_id': [1, 2], 'x': [0.5, 1.5]})
+    with pytest.raises(ValueError):
+        concat_features([df, df])
+
+
+@pytest.mark.parametrize('flag_test', [False, True])
+def test_sparse_one_hot_on_every_path(battles, registry, battles_file, tmp_path, flag_test):
+    expected = generate_features(battles, flag_test=flag_test, spec=SPARSE_SPEC, registry=registry)
+    assert sum(isinstance(dtype, pd.SparseDtype) for dtype in expected.dtypes) == 80
+
+    cache = FeatureCache(str(tmp_path / 'cache'))
+    outputs = [
+        generate_features(battles, flag_test=flag_test, spec=SPARSE_SPEC, registry=registry, fused=True),
+        generate_features(battles, flag_test=flag_test, spec=SPARSE_SPEC, registry=registry, fused=True, n_jobs=2),
+        generate_features(battles, flag_test=flag_test, spec=SPARSE_SPEC, registry=registry, profiler=ExtractorProfiler()),
+        generate_features(battles, flag_test=flag_test, spec=SPARSE_SPEC, registry=registry, fused=True, cache=cache),
+        generate_features(battles, flag_test=flag_test, spec=SPARSE_SPEC, registry=registry, fused=True, cache=cache),
+        generate_features_chunked(battles_file, flag_test=flag_test, spec=SPARSE_SPEC, registry=registry, chunk_size=30),
+    ]
+    assert cache.hits > 0
+    for df in outputs:
+        pd.testing.assert_frame_equal(df, expected, check_exact=True)
+
+    dense = generate_features(battles, flag_test=flag_test, spec=feature_spec(family='linear'), registry=registry)
+    sparse_columns = {c: 'int64' for c, dtype in expected.dtypes.items() if isinstance(dtype, pd.SparseDtype)}
+    pd.testing.assert_frame_equal(expected.astype(sparse_columns), dense, check_exact=True)
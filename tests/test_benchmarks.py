@@ -0,0 +1,37 @@
+# tests/test_benchmarks.py
+import pandas as pd
+from benchmarks.synthetic import generate_battles, write_jsonl
+from benchmarks.suite import save_baseline, compare_baseline
+from feature_engineering import get_dict_from_json
+from feature_engineering.constants import pokemon_list
+
+
+def test_synthetic_battles_follow_the_schema():
+    battles = list(generate_battles(5, seed=3, n_turns=7, start_id=100))
+    assert battles == list(generate_battles(5, seed=3, n_turns=7, start_id=100))  # deterministic
+    assert [battle['battle_id'] for battle in battles] == list(range(100, 105))
+    for battle in battles:
+        assert set(battle) == {'battle_id', 'player_won', 'p1_team_details', 'p2_lead_details', 'battle_timeline'}
+        assert len(battle['p1_team_details']) == 6
+        assert all(pokemon['name'] in pokemon_list for pokemon in battle['p1_team_details'])
+        assert [turn['turn'] for turn in battle['battle_timeline']] == list(range(1, 8))
+        for turn in battle['battle_timeline']:
+            for player in ('p1', 'p2'):
+                state = turn[f'{player}_pokemon_state']
+                assert {'name', 'hp_pct', 'status', 'effects', 'boosts'} <= set(state)
+                assert 0.0 <= state['hp_pct'] <= 1.0
+
+
+def test_write_jsonl(tmp_path):
+    path = str(tmp_path / 'battles.jsonl')
+    write_jsonl(path, 4, seed=1)
+    assert get_dict_from_json(path) == list(generate_battles(4, seed=1))
+
+
+def test_baseline_comparison_flags_regressions(tmp_path):
+    path = str(tmp_path / 'baseline.json')
+    baseline = pd.DataFrame({'benchmark': ['a', 'b'], 'battles_per_sec': [100.0, 100.0]})
+    save_baseline(baseline, path, n_battles=10, seed=0)
+    current = pd.DataFrame({'benchmark': ['a', 'b'], 'battles_per_sec': [90.0, 50.0]})
+    compared = compare_baseline(current, path, tolerance=0.2)
+    assert list(compared['regression']) == [False, True]
@@ -0,0 +1,59 @@
+# tests/test_cache.py
+import numpy as np
+import pandas as pd
+import pytest
+from feature_engineering import generate_features, FeatureCache, data_hash
+from feature_engineering import cache as cache_module
+from feature_engineering.cache import save_frame, load_frame
+from feature_engineering.engine import ACCUMULATORS, AvgFinalHPPct
+from feature_engineering.extractors import avg_final_HP_pct
+
+
+@pytest.mark.parametrize('fused', [False, True])
+def test_cached_features(battles, registry, tmp_path, fused):
+    cache = FeatureCache(str(tmp_path))
+    expected = generate_features(battles, flag_test=False, registry=registry)
+    first = generate_features(battles, flag_test=False, registry=registry, fused=fused, cache=cache)
+    assert cache.hits == 0 and cache.misses > 0
+    second = generate_features(battles, flag_test=False, registry=registry, fused=fused, cache=cache)
+    assert cache.hits == cache.misses
+    pd.testing.assert_frame_equal(first, expected, check_exact=True)
+    pd.testing.assert_frame_equal(second, expected, check_exact=True)
+
+
+def test_key_follows_the_code_that_computed_the_block(tmp_path, monkeypatch):
+    cache = FeatureCache(str(tmp_path))
+    kwargs = {'difference': True, 'test': False}
+    loop = cache.key('data', avg_final_HP_pct, kwargs, registry_key='r')
+    fused = cache.key('data', avg_final_HP_pct, kwargs, registry_key='r', accumulator=AvgFinalHPPct)
+    assert loop != fused
+    assert cache.key('data', avg_final_HP_pct, kwargs, registry_key='other') != loop
+    assert cache.key('data', avg_final_HP_pct, {**kwargs, 'difference': False}, registry_key='r') != loop
+    # a fused-only fix of the accumulator must invalidate its blocks
+    source_hash = cache_module.source_hash
+    monkeypatch.setattr(cache_module, 'source_hash', lambda obj: 'edited' if obj is AvgFinalHPPct else source_hash(obj))
+    assert cache.key('data', avg_final_HP_pct, kwargs, registry_key='r') == loop
+    assert cache.key('data', avg_final_HP_pct, kwargs, registry_key='r', accumulator=AvgFinalHPPct) != fused
+    assert ACCUMULATORS['avg_final_HP_pct'] is AvgFinalHPPct
+
+
+def test_frames_round_trip_without_pickle(tmp_path):
+    df = pd.DataFrame({
+        'battle_id': np.arange(4),
+        'x': [0.5, np.nan, 1.5, 2.0],
+        'name': ['a', None, 'c', 'd'],
+        'flag': [True, False, True, True],
+        'one_hot': pd.arrays.SparseArray([0, 1, 0, 1], dtype=pd.SparseDtype(np.int64, 0)),
+    })
+    path = str(tmp_path / 'frame.npz')
+    save_frame(df, path)
+    pd.testing.assert_frame_equal(load_frame(path), df, check_exact=True)
+    with pytest.raises(ValueError):
+        save_frame(pd.DataFrame({'obj': [{'a': 1}, None]}), str(tmp_path / 'bad.npz'))
+
+
+def test_eviction_keeps_the_cache_under_its_cap(battles, tmp_path):
+    cache = FeatureCache(str(tmp_path), max_bytes=1)
+    generate_features(battles[:10], flag_test=False, cache=cache, data_key=data_hash(battles[:10]))
+    assert cache.evictions > 0
+    assert cache.stats['entries'] == 1
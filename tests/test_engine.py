@@ -0,0 +1,46 @@
+# tests/test_engine.py
+import inspect
+import itertools
+import pandas as pd
+import pytest
+from feature_engineering import generate_features, FusedFeatureEngine, FeatureContext
+from feature_engineering.engine import ACCUMULATORS, FeatureAccumulator
+from feature_engineering.feature_sets import FEATURES, FAMILIES, feature_spec, feature_calls
+
+
+def all_calls() -> list[tuple]:
+    """Every distinct (extractor, kwargs) call the catalogue makes, over all the generate_features options."""
+    calls = {}
+    for family, difference, divide_turns, flag_test in itertools.product(FAMILIES, (True, False), (True, False), (True, False)):
+        spec = feature_spec(family=family, difference=difference, divide_turns=divide_turns, include=list(FEATURES))
+        for extractor, kwargs in feature_calls(spec, flag_test):
+            calls[(extractor.__name__, repr(sorted(kwargs.items())))] = (extractor, kwargs)
+    return list(calls.values())
+
+
+def test_every_extractor_has_an_accumulator():
+    assert set(ACCUMULATORS) == set(FEATURES)
+    assert all(issubclass(accumulator, FeatureAccumulator) for accumulator in ACCUMULATORS.values())
+
+
+@pytest.mark.parametrize('extractor, kwargs', all_calls(), ids=lambda value: getattr(value, '__name__', None))
+def test_accumulator_matches_its_extractor(battles, registry, extractor, kwargs):
+    engine = FusedFeatureEngine([(extractor, kwargs)], ctx=FeatureContext(battles, registry=registry))
+    if 'registry' in inspect.signature(extractor).parameters:
+        expected = extractor(battles, registry=registry, **kwargs)
+    else:
+        expected = extractor(battles, **kwargs)
+    pd.testing.assert_frame_equal(engine.blocks(battles)[0], expected, check_exact=True)
+
+
+@pytest.mark.parametrize('tree', [False, True])
+@pytest.mark.parametrize('flag_test', [False, True])
+def test_fused_matches_the_extractor_loop(battles, registry, tree, flag_test):
+    expected = generate_features(battles, flag_test=flag_test, tree=tree, registry=registry)
+    pd.testing.assert_frame_equal(generate_features(battles, flag_test=flag_test, tree=tree, registry=registry, fused=True),
+                                  expected, check_exact=True)
+
+
+def test_accumulators_must_define_finish():
+    with pytest.raises(TypeError):
+        FeatureAccumulator(None)
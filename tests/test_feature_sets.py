@@ -0,0 +1,106 @@
+# tests/test_feature_sets.py
+import json
+import pandas as pd
+import pytest
+from feature_engineering import generate_features
+from feature_engineering.feature_sets import (FEATURE_CATALOG, FEATURES, feature_spec, load_feature_spec, selected_features,
+                                              feature_columns, feature_calls, select_columns)
+
+
+def names(calls):
+    return [extractor.__name__ for extractor, _ in calls]
+
+
+def test_spec_defaults():
+    spec = feature_spec()
+    assert spec == {'family': 'tree', 'difference': True, 'divide_turns': True,
+                    'include': None, 'exclude': [], 'params': {}, 'columns': None}
+    assert feature_spec({'family': 'tree'}, family='linear')['family'] == 'linear'
+
+
+@pytest.mark.parametrize('spec, message', [
+    ({'famly': 'tree'}, 'Unknown feature spec keys'),
+    ({'family': 'forest'}, 'family must be one of'),
+    ({'include': ['accuracy_avg', 'no_such_feature']}, 'Unknown features'),
+    ({'exclude': ['no_such_feature']}, 'Unknown features'),
+    ({'params': {'no_such_feature': {}}}, 'Unknown features'),
+])
+def test_invalid_specs_raise(spec, message):
+    with pytest.raises(ValueError, match=message):
+        feature_spec(spec)
+
+
+def test_load_json_and_yaml(tmp_path):
+    spec = {'family': 'linear', 'exclude': ['tot_pok_used'], 'params': {'pokemon_encoding': {'one_hot': False}}}
+    path = tmp_path / 'spec.json'
+    path.write_text(json.dumps(spec))
+    assert load_feature_spec(str(path)) == feature_spec(spec)
+
+    yaml = pytest.importorskip('yaml')
+    path = tmp_path / 'spec.yaml'
+    path.write_text(yaml.safe_dump(spec))
+    assert load_feature_spec(str(path)) == feature_spec(spec)
+
+
+def test_family_defaults_follow_the_catalogue():
+    for family in ('linear', 'tree'):
+        expected = [feature.name for feature in FEATURE_CATALOG if family in feature.families]
+        assert [feature.name for feature in selected_features({'family': family})] == expected
+    assert 'first_KO_momentum_feature' not in [feature.name for feature in selected_features({'family': 'linear'})]
+
+
+def test_include_keeps_catalogue_order_once():
+    spec = {'include': ['tot_pok_used', 'accuracy_avg', 'tot_pok_used'], 'exclude': ['tot_pok_used']}
+    assert names(feature_calls(spec, flag_test=True)) == ['accuracy_avg']
+    spec = {'include': ['tot_pok_used', 'accuracy_avg', 'tot_pok_used']}
+    assert names(feature_calls(spec, flag_test=True)) == ['accuracy_avg', 'tot_pok_used']
+
+
+def test_label_only_on_the_last_training_call():
+    calls = feature_calls({}, flag_test=False)
+    assert [kwargs['test'] for _, kwargs in calls] == [True] * (len(calls) - 1) + [False]
+    assert all(kwargs['test'] for _, kwargs in feature_calls({}, flag_test=True))
+
+
+def test_overrides():
+    tree = dict(feature_calls({'family': 'tree'}, flag_test=True))
+    linear = dict(feature_calls({'family': 'linear'}, flag_test=True))
+    assert tree[FEATURES['damage_efficiency_ratio'].extractor]['divide_turns'] is False
+    assert linear[FEATURES['damage_efficiency_ratio'].extractor]['divide_turns'] is True
+    assert tree[FEATURES['pokemon_encoding'].extractor]['one_hot'] is False
+    assert linear[FEATURES['pokemon_encoding'].extractor]['one_hot'] is True
+
+    params = {'params': {'pokemon_encoding': {'one_hot': True}}}
+    assert dict(feature_calls(params, flag_test=True))[FEATURES['pokemon_encoding'].extractor]['one_hot'] is True
+
+
+def test_train_overrides_of_avg_effectiveness2():
+    spec = {'family': 'linear', 'divide_turns': False}
+    extractor = FEATURES['avg_effectiveness2'].extractor
+    assert dict(feature_calls(spec, flag_test=False))[extractor]['divide_turns'] is True
+    assert dict(feature_calls(spec, flag_test=True))[extractor]['divide_turns'] is False
+    assert dict(feature_calls(spec, flag_test=True))[FEATURES['accuracy_avg'].extractor]['divide_turns'] is False
+
+
+def test_columns_keep_only_the_producing_extractors():
+    columns = feature_columns({})
+    wanted = [columns['accuracy_avg'][0], columns['tot_pok_used'][0]]
+    calls = feature_calls({'columns': wanted}, flag_test=False)
+    assert names(calls) == ['accuracy_avg', 'tot_pok_used']
+    assert calls[-1][1]['test'] is False
+    with pytest.raises(ValueError, match='Columns not produced'):
+        feature_calls({'columns': ['no_such_column']}, flag_test=True)
+
+
+def test_select_columns():
+    df = pd.DataFrame({'battle_id': [1], 'a': [0.0], 'b': [1.0], 'player_won': [True]})
+    assert select_columns(df, {}) is df
+    assert list(select_columns(df, {'columns': ['b']}).columns) == ['battle_id', 'b', 'player_won']
+
+
+def test_generate_features_with_a_spec(battles, registry):
+    full = generate_features(battles, flag_test=False, registry=registry)
+    columns = [c for c in full.columns if c.startswith('first_10_')]
+    df = generate_features(battles, flag_test=False, registry=registry, spec={'columns': columns})
+    pd.testing.assert_frame_equal(df, full[['battle_id'] + columns + ['player_won']])
+    assert list(generate_features(battles, flag_test=False, registry=registry, spec={}).columns) == list(full.columns)
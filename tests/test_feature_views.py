@@ -0,0 +1,61 @@
+# tests/test_feature_views.py
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import cross_val_score, StratifiedKFold
+from Models import FeatureViews, CustomVoter
+
+
+def multiindex(views):
+    return pd.concat(views, axis=1)
+
+
+def test_views_match_the_multiindex_frame(model_data):
+    views, _ = model_data
+    # the tree view reversed: its columns are no longer stored in its order
+    views = {'main': views['main'], 'tree': views['tree'][views['tree'].columns[::-1]]}
+    df = multiindex(views)
+    for feature_views in (FeatureViews(views), FeatureViews.from_frame(df)):
+        for name in views:
+            np.testing.assert_array_equal(feature_views[name], df[name].to_numpy())
+            assert feature_views.columns(name) == list(df[name].columns)
+            pd.testing.assert_frame_equal(feature_views.frame(name), df[name].reset_index(drop=True))
+        # f3..f5 are stored once
+        assert feature_views.shape == (len(df), 8)
+        assert feature_views.is_contiguous('main') and not feature_views.is_contiguous('tree')
+        assert np.shares_memory(feature_views['main'], feature_views.values)
+
+
+def test_rows(model_data):
+    views, _ = model_data
+    feature_views = FeatureViews(views)
+    rows = np.array([5, 0, 17, 3])
+    selected = feature_views[rows]
+    assert len(selected) == len(rows)
+    for name in views:
+        np.testing.assert_array_equal(selected[name], views[name].to_numpy()[rows])
+
+
+def test_invalid_views_raise(model_data):
+    views, _ = model_data
+    changed = views['tree'].assign(f3=views['tree']['f3'] + 1)
+    with pytest.raises(ValueError, match="Column 'f3'"):
+        FeatureViews({'main': views['main'], 'tree': changed})
+    with pytest.raises(ValueError, match='same number of rows'):
+        FeatureViews({'main': views['main'], 'tree': views['tree'].iloc[:10]})
+    with pytest.raises(KeyError):
+        FeatureViews(views)['other']
+
+
+def test_custom_voter_on_views(model_data):
+    views, y = model_data
+    voter = CustomVoter([('a', LogisticRegression()), ('b', LogisticRegression(C=0.1))], views={'a': 'main', 'b': 'tree'})
+    cv = StratifiedKFold(n_splits=4, shuffle=True, random_state=0)
+    np.testing.assert_array_equal(cross_val_score(voter, FeatureViews(views), y, cv=cv),
+                                  cross_val_score(voter, multiindex(views), y, cv=cv))
+
+    fitted = voter.fit(FeatureViews(views), y)
+    reordered = {'main': views['main'][views['main'].columns[::-1]], 'tree': views['tree']}
+    with pytest.raises(ValueError, match="view 'main'"):
+        fitted.predict_proba(FeatureViews(reordered))
@@ -0,0 +1,121 @@
+# tests/test_heterogeneus_ensembles.py
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import GridSearchCV
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+import Models.Heterogeneus_ensembles as ensembles
+from Models import CustomVoter, OOFCache, FeatureViews, evaluate_model
+
+VIEWS = {'lr': 'main', 'rf': 'tree'}
+
+
+def estimators():
+    return [('lr', Pipeline([('scaler', StandardScaler()), ('model', LogisticRegression())])),
+            ('rf', Pipeline([('model', RandomForestClassifier(n_estimators=20, random_state=0, n_jobs=1))]))]
+
+
+def voter(**params):
+    return CustomVoter(estimators(), weights=[2, 1], views=VIEWS, **params)
+
+
+@pytest.mark.parametrize('backend', ['threads', 'processes'])
+@pytest.mark.parametrize('n_jobs', [2, -1])
+def test_concurrent_estimators_match_the_serial_ones(model_data, backend, n_jobs):
+    X, y = model_data
+    expected = voter().fit(X, y).predict_proba(X)
+    np.testing.assert_array_equal(voter(n_jobs=n_jobs, backend=backend).fit(X, y).predict_proba(X), expected)
+
+
+def test_thread_budget_goes_to_clones(model_data):
+    X, y = model_data
+    ensemble = voter(thread_budget={'lr': 4, 'rf': 3}).fit(X, y)
+    assert ensemble.trained_models_['rf'].get_params()['model__n_jobs'] == 3
+    # LogisticRegression is skipped and the estimators passed are not modified
+    assert ensemble.trained_models_['lr'].get_params()['model__n_jobs'] is None
+    assert ensemble.estimators[1][1].get_params()['model__n_jobs'] == 1
+
+    split = voter(n_jobs=2, thread_budget=4).fit(X, y)
+    assert split.trained_models_['rf'].get_params()['model__n_jobs'] == 2
+
+
+def test_unknown_backend_raises(model_data):
+    X, y = model_data
+    with pytest.raises(ValueError, match='backend'):
+        voter(n_jobs=2, backend='gpu').fit(X, y)
+
+
+def test_nested_params():
+    ensemble = voter(final_estimator=LogisticRegression())
+    shallow = ensemble.get_params(deep=False)
+    assert set(shallow) == {'estimators', 'weights', 'n_jobs', 'thread_budget', 'backend', 'views', 'final_estimator', 'stack_cv'}
+    deep = ensemble.get_params()
+    assert deep['rf'] is ensemble.estimators[1][1]
+    assert deep['rf__model__n_estimators'] == 20
+    assert deep['lr__model__C'] == 1.0
+    assert deep['final_estimator__C'] == 1.0
+
+    ensemble.set_params(rf__model__max_depth=3, final_estimator__C=0.5, weights=[1, 1])
+    assert ensemble.estimators[1][1].get_params()['model__max_depth'] == 3
+    assert ensemble.final_estimator.C == 0.5 and ensemble.weights == [1, 1]
+    replacement = LogisticRegression(C=2.0)
+    ensemble.set_params(lr=replacement)
+    assert ensemble.estimators[0] == ('lr', replacement)
+
+
+def test_grid_search_over_nested_params(model_data):
+    X, y = model_data
+    search = GridSearchCV(voter(), {'rf__model__max_depth': [2, None], 'lr__model__C': [0.1, 1.0]}, cv=3)
+    search.fit(FeatureViews(X), y)
+    assert set(search.best_params_) == {'rf__model__max_depth', 'lr__model__C'}
+
+
+@pytest.fixture(scope='module')
+def oof(model_data, tmp_path_factory):
+    X, y = model_data
+    path = str(tmp_path_factory.mktemp('oof') / 'oof.npz')
+    return OOFCache(voter(), cv_splits=4, path=path).fit(FeatureViews(X), y)
+
+
+def test_oof_score_matches_evaluate_model(model_data, oof):
+    X, y = model_data
+    for weights in ([1, 1], [3, 1], [0, 1]):
+        expected = evaluate_model(voter().set_params(weights=weights), FeatureViews(X), y, cv_splits=4)
+        np.testing.assert_allclose(oof.score(weights), expected, rtol=1e-12)
+
+
+def test_oof_cache_is_read_back(model_data, oof, monkeypatch):
+    X, y = model_data
+    monkeypatch.setattr(ensembles, 'out_of_fold_probas', lambda *args: pytest.fail('recomputed'))
+    cached = OOFCache(voter(), cv_splits=4, path=oof.path).fit(FeatureViews(X), y)
+    np.testing.assert_array_equal(cached.probas_, oof.probas_)
+    monkeypatch.undo()
+    # other data: the cache is recomputed
+    other = OOFCache(voter(), cv_splits=4, path=oof.path).fit(FeatureViews(X), 1 - y)
+    assert not np.array_equal(other.probas_, oof.probas_)
+
+
+def test_optimize_weights(oof):
+    weights, mean, std = oof.optimize_weights(step=0.25)
+    assert np.isclose(weights.sum(), 1) and mean >= oof.score([1, 1])[0]
+    assert (mean, std) == oof.score(weights)
+    weights, _, _ = oof.optimize_weights(method='scipy')
+    assert np.isclose(weights.sum(), 1) and (weights >= 0).all()
+    with pytest.raises(ValueError):
+        oof.optimize_weights(method='random')
+
+
+def test_stacking(model_data, oof):
+    X, y = model_data
+    views = FeatureViews(X)
+    stacked = voter(final_estimator=LogisticRegression(), stack_cv=4).fit(views, y)
+    final = OOFCache(voter(), cv_splits=4).fit(views, y).fit_final_estimator(LogisticRegression())
+    np.testing.assert_allclose(stacked.final_estimator_.coef_, final.coef_)
+
+    prefit = voter(final_estimator=final, stack_cv='prefit').fit(views, y)
+    probas = prefit.base_probas(views)
+    np.testing.assert_array_equal(prefit.predict_proba(views), final.predict_proba(probas[:, :, 1].T))
+    mean, std = oof.stacking_score(LogisticRegression())
+    assert 0.5 < mean <= 1.0
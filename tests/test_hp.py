@@ -0,0 +1,48 @@
+# tests/test_hp.py
+import random
+import numpy as np
+import pandas as pd
+import pytest
+from feature_engineering import FusedFeatureEngine, FeatureContext
+from feature_engineering.extractors import avg_final_HP_pct, team_hp_advantage_flip_count, damage_efficiency_ratio
+from feature_engineering.turn_tensors import team_hp_advantage_flip_count_from_store
+from feature_engineering.utils import small_sum, small_mean_var, TeamHP
+
+
+@pytest.mark.parametrize('n', [1, 2, 5, 7, 8, 9, 13])
+def test_small_sum_and_mean_var_match_numpy(n):
+    values = [random.Random(n).random() for _ in range(n)]
+    assert small_sum(values) == np.sum(values)
+    assert small_mean_var(values) == (np.mean(values), np.var(values))
+
+
+def test_team_hp_running_total():
+    rng = random.Random(0)
+    team, other = TeamHP(names=['a', 'b']), TeamHP()
+    for _ in range(200):
+        team.set(rng.choice('abcdef'), rng.choice([0.0, 0.25, 0.5, 1.0, rng.random()]))
+        other.set(rng.choice('abcdef'), rng.choice([0.0, 0.25, 0.5, 1.0, rng.random()]))
+        unseen = 6 - len(team)
+        assert team.exact_team_total() == np.sum(team.values()) + unseen * 1.0
+        assert team.team_total() == pytest.approx(team.exact_team_total(), abs=1e-9)
+        avg_team = team.exact_team_total() / 6
+        avg_other = other.exact_team_total() / 6
+        assert team.compare(other) == (avg_team > avg_other) - (avg_other > avg_team)
+
+
+@pytest.mark.parametrize('extractor, kwargs', [
+    (avg_final_HP_pct, {'difference': True}),
+    (avg_final_HP_pct, {'difference': False}),
+    (team_hp_advantage_flip_count, {}),
+    (damage_efficiency_ratio, {'difference': True}),
+    (damage_efficiency_ratio, {'difference': False, 'divide_turns': False}),
+])
+def test_fused_accumulators_match_the_extractors(battles, registry, extractor, kwargs):
+    engine = FusedFeatureEngine([(extractor, kwargs)], ctx=FeatureContext(battles, registry=registry))
+    pd.testing.assert_frame_equal(engine.blocks(battles)[0], extractor(battles, **kwargs), check_exact=True)
+
+
+@pytest.mark.parametrize('team_size', [6, 3])
+def test_flip_count_from_store(battles, store, team_size):
+    pd.testing.assert_frame_equal(team_hp_advantage_flip_count_from_store(store, team_size=team_size),
+                                  team_hp_advantage_flip_count(battles, team_size=team_size), check_exact=True)
@@ -0,0 +1,63 @@
+# tests/test_incremental.py
+import json
+import pandas as pd
+from benchmarks.synthetic import pokemon_details
+from feature_engineering import generate_features, PokedexRegistry
+from feature_engineering.incremental import FeatureStore, battle_species
+
+
+def write(path, battles):
+    path.write_text(''.join(json.dumps(battle) + '\n' for battle in battles))
+    return str(path)
+
+
+def assert_features_equal(store, battles):
+    expected = generate_features(battles, flag_test=False)
+    pd.testing.assert_frame_equal(store.features().reset_index(drop=True), expected, check_dtype=False)
+
+
+def test_updates_compute_only_the_new_battles(battles, tmp_path):
+    first = write(tmp_path / 'first.jsonl', battles[:40])
+    # overlaps the first file: its first 10 battles are already stored
+    second = write(tmp_path / 'second.jsonl', battles[30:])
+
+    store = FeatureStore(str(tmp_path / 'store'))
+    assert store.update(first) == {'new': 40, 'recomputed': 0, 'stored': 40}
+    assert_features_equal(store, battles[:40])
+    assert store.update(first) == {'new': 0, 'recomputed': 0, 'stored': 40}
+
+    counts = store.update(second)
+    assert counts['new'] == len(battles) - 40
+    assert counts['stored'] == len(battles)
+    assert_features_equal(store, battles)
+
+    reopened = FeatureStore(str(tmp_path / 'store'))
+    assert reopened.battle_ids == {battle['battle_id'] for battle in battles}
+    pd.testing.assert_frame_equal(reopened.features(), store.features())
+
+
+def test_changed_lookups_recompute_the_affected_battles(battles, tmp_path):
+    # the pokedex only records some pokemon of every battle: a species seen in the
+    # timelines of the stored battles gets its lookups from a later battle
+    old = battles[:10]
+    known = PokedexRegistry.from_data(old).def_types
+    missing = sorted(set().union(*map(battle_species, old)) - set(known))[0]
+    store = FeatureStore(str(tmp_path / 'store'))
+    store.update(write(tmp_path / 'old.jsonl', old))
+
+    new = {**battles[10], 'p2_lead_details': pokemon_details(missing)}
+    counts = store.update(write(tmp_path / 'new.jsonl', [new]))
+
+    affected = sum(missing in battle_species(battle) for battle in old)
+    assert 0 < affected < len(old)
+    assert counts == {'new': 1, 'recomputed': affected, 'stored': len(old) + 1}
+    assert_features_equal(store, old + [new])
+
+
+def test_a_new_feature_set_recomputes_everything(battles, tmp_path):
+    path = write(tmp_path / 'battles.jsonl', battles)
+    FeatureStore(str(tmp_path / 'store')).update(path)
+    store = FeatureStore(str(tmp_path / 'store'), tree=False)
+    assert store.update(path) == {'new': 0, 'recomputed': len(battles), 'stored': len(battles)}
+    expected = generate_features(battles, flag_test=False, tree=False)
+    pd.testing.assert_frame_equal(store.features().reset_index(drop=True), expected, check_dtype=False)
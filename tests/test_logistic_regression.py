@@ -0,0 +1,38 @@
+# tests/test_logistic_regression.py
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import sparse as sp
+from feature_engineering import generate_features, feature_spec
+from Models import to_sparse_matrix, create_model_pipeline, create_model_pipeline_PCA
+
+
+@pytest.fixture(scope='module')
+def sparse_frame(battles, registry):
+    spec = feature_spec(family='linear', params={'pokemon_encoding': {'sparse': True}})
+    df = generate_features(battles, flag_test=False, spec=spec, registry=registry)
+    return df.drop(columns=['battle_id', 'player_won']), df['player_won'].astype(int)
+
+
+def test_to_sparse_matrix_keeps_the_columns(sparse_frame):
+    X, _ = sparse_frame
+    matrix = to_sparse_matrix(X)
+    assert sp.issparse(matrix) and matrix.format == 'csr'
+    dense = X.astype({c: 'int64' for c, dtype in X.dtypes.items() if isinstance(dtype, pd.SparseDtype)})
+    np.testing.assert_array_equal(matrix.toarray(), dense.to_numpy(dtype=np.float64))
+    assert (to_sparse_matrix(matrix) != matrix).nnz == 0
+
+
+@pytest.mark.parametrize('create', [create_model_pipeline, lambda **kw: create_model_pipeline_PCA(n_components=5, **kw)])
+def test_sparse_pipeline_matches_the_dense_one(sparse_frame, create):
+    X, y = sparse_frame
+    is_sparse = [isinstance(dtype, pd.SparseDtype) for dtype in X.dtypes]
+    # the sparse pipelines put the dense columns first
+    columns = [c for c, s in zip(X.columns, is_sparse) if not s] + [c for c, s in zip(X.columns, is_sparse) if s]
+    dense = X[columns].astype({c: 'int64' for c, s in zip(X.columns, is_sparse) if s})
+
+    # equal up to the solver tolerance: solve both to convergence
+    solver = {'model__tol': 1e-10, 'model__max_iter': 10000}
+    sparse_model = create(sparse=True).set_params(**solver).fit(X, y)
+    dense_model = create().set_params(**solver).fit(dense, y)
+    np.testing.assert_allclose(sparse_model.predict_proba(X), dense_model.predict_proba(dense), atol=1e-6)
@@ -0,0 +1,22 @@
+# tests/test_matchups.py
+import pandas as pd
+import pytest
+from feature_engineering.extractors import avg_approx_damage, category_impact_score
+from feature_engineering.matchups import avg_approx_damage_from_store, category_impact_score_from_store
+
+
+@pytest.mark.parametrize('difference', [True, False])
+@pytest.mark.parametrize('test', [False, True])
+def test_avg_approx_damage(battles, registry, store, difference, test):
+    pd.testing.assert_frame_equal(avg_approx_damage_from_store(store, registry, difference=difference, test=test),
+                                  avg_approx_damage(battles, difference=difference, test=test, registry=registry), check_exact=True)
+
+
+@pytest.mark.parametrize('difference', [True, False])
+@pytest.mark.parametrize('divide_turns', [True, False])
+def test_category_impact_score(battles, registry, store, difference, divide_turns):
+    expected = category_impact_score(battles, difference=difference, divide_turns=divide_turns, registry=registry)
+    exact = category_impact_score_from_store(store, registry, difference=difference, divide_turns=divide_turns, exact=True)
+    pd.testing.assert_frame_equal(exact, expected, check_exact=True)
+    prefix = category_impact_score_from_store(store, registry, difference=difference, divide_turns=divide_turns)
+    pd.testing.assert_frame_equal(prefix, expected, check_exact=False, rtol=1e-12, atol=1e-12)
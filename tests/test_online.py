@@ -0,0 +1,56 @@
+# tests/test_online.py
+import numpy as np
+import pandas as pd
+import pytest
+from feature_engineering import generate_features, BattleState, FeatureContext, online_extractor_calls
+from Models import create_model_pipeline
+
+
+def assert_state_equals(state: BattleState, expected: pd.DataFrame):
+    """The state row (float64, as fed to the models) against the generate_features row."""
+    pd.testing.assert_frame_equal(state.frame(), expected.astype(np.float64), check_exact=True)
+
+
+def truncated_features(battle: dict, registry, n_turns: int, tree: bool) -> pd.DataFrame:
+    truncated = {**battle, 'battle_timeline': battle['battle_timeline'][:n_turns]}
+    return generate_features([truncated], flag_test=False, tree=tree, registry=registry).drop(columns=['battle_id', 'player_won'])
+
+
+@pytest.mark.parametrize('tree', [False, True])
+def test_state_after_n_turns_is_the_truncated_battle(battles, registry, tree):
+    for battle in (battles[0], battles[65]):  # a 30 and a 12-turn battle
+        state = BattleState(battle, registry, online_extractor_calls(tree=tree))
+        for n, turn in enumerate(battle['battle_timeline'], start=1):
+            state.update(turn)
+            if n in (1, 5, 10, 11, 20, 21, 29, len(battle['battle_timeline'])):
+                assert_state_equals(state, truncated_features(battle, registry, n, tree))
+
+
+def test_reset_reuses_the_state(battles, registry):
+    ctx = FeatureContext(None, registry=registry)
+    state = BattleState(battles[1], ctx)
+    for turn in battles[1]['battle_timeline']:
+        state.update(turn)
+    state.reset(battles[2])
+    with pytest.raises(ValueError):
+        state.features()
+    for turn in battles[2]['battle_timeline'][:15]:
+        state.update(turn)
+    assert_state_equals(state, truncated_features(battles[2], registry, 15, tree=True))
+
+
+def test_predict_proba_matches_the_pipeline(battles, registry):
+    X = generate_features(battles, flag_test=False, tree=False, registry=registry)
+    y = X.pop('player_won').astype(int)
+    model = create_model_pipeline(c_value=0.1).fit(X.drop(columns='battle_id'), y)
+
+    battle = battles[3]
+    state = BattleState(battle, registry, online_extractor_calls(tree=False), model=model)
+    for turn in battle['battle_timeline'][:10]:
+        state.update(turn)
+    expected = model.predict_proba(truncated_features(battle, registry, 10, tree=False))[0, 1]
+    assert state.predict_proba() == pytest.approx(expected, abs=1e-12)
+    # a model fitted on other columns is rejected
+    other = create_model_pipeline().fit(X[['battle_id']], y)
+    with pytest.raises(ValueError):
+        state.predict_proba(other)
@@ -0,0 +1,37 @@
+# tests/test_pokedex_registry.py
+import numpy as np
+import pytest
+from feature_engineering import PokedexRegistry
+from feature_engineering.constants import type_to_index
+from feature_engineering.extractors import avg_effectiveness2
+from feature_engineering.utils import get_dict_def_types, get_dict_attacker_types, get_dict_base_stats, get_dict_base_stats1
+
+
+@pytest.mark.parametrize('name, builder', [('def_types', get_dict_def_types), ('att_types', get_dict_attacker_types),
+                                           ('base_stats', get_dict_base_stats), ('base_stats1', get_dict_base_stats1)])
+def test_lookups_match_the_helpers(battles, registry, name, builder):
+    assert getattr(registry, name) == builder(battles)
+
+
+def test_array_lookups(registry):
+    stats = registry.base_stats1
+    for name in registry.names:
+        i = registry.id(name)
+        assert list(registry.stats[i]) == [stats[name][f'base_{s}'] for s in ('hp', 'atk', 'def', 'spa', 'spd', 'spe')]
+        assert set(registry.type_ids[i][registry.type_ids[i] >= 0]) == {type_to_index[t] for t in registry.att_types[name] if t in type_to_index}
+    np.testing.assert_array_equal(registry.ids(['unknown', registry.names[0]]), [-1, 0])
+
+
+def test_save_and_load(registry, tmp_path):
+    path = str(tmp_path / 'registry.json')
+    registry.save(path)
+    loaded = PokedexRegistry.from_file(path)
+    assert loaded.names == registry.names
+    assert loaded.fingerprint() == registry.fingerprint()
+    assert loaded.def_types == registry.def_types
+
+
+def test_a_given_registry_is_used(battles, registry, monkeypatch):
+    # the extractors must not rebuild the registry they are given
+    monkeypatch.setattr(PokedexRegistry, 'from_data', classmethod(lambda cls, data: pytest.fail('registry rebuilt')))
+    avg_effectiveness2(battles[:5], registry=registry)
@@ -0,0 +1,47 @@
+# tests/test_prefix.py
+import inspect
+import numpy as np
+import pandas as pd
+import pytest
+from feature_engineering import generate_features, prefix_features
+from feature_engineering.online import STORE_EXTRACTORS
+
+CUTOFFS = (5, 10, 20, 30)
+
+
+def per_cutoff(battles, registry, tree):
+    slices = []
+    for cutoff in CUTOFFS:
+        truncated = [{**battle, 'battle_timeline': battle['battle_timeline'][:cutoff]} for battle in battles]
+        df = generate_features(truncated, flag_test=False, tree=tree, registry=registry)
+        slices.append(df.drop(columns=['battle_id', 'player_won']).to_numpy(dtype=np.float64))
+    return np.stack(slices, axis=1), list(df.drop(columns=['battle_id', 'player_won']).columns)
+
+
+@pytest.mark.parametrize('tree', [False, True])
+def test_prefix_features_match_the_truncated_runs(battles, registry, tree):
+    expected, columns = per_cutoff(battles, registry, tree)
+    features, battle_ids, prefix_columns = prefix_features(battles, cutoffs=CUTOFFS, tree=tree, registry=registry)
+    assert prefix_columns == columns
+    assert battle_ids == [battle['battle_id'] for battle in battles]
+    np.testing.assert_allclose(features, expected, rtol=1e-12, atol=1e-12)
+    exact, _, _ = prefix_features(battles, cutoffs=CUTOFFS, tree=tree, registry=registry, exact=True)
+    np.testing.assert_array_equal(exact, expected)
+
+
+def test_empty_timeline_gives_nan_rows(battles, registry):
+    empty = {**battles[0], 'battle_timeline': []}
+    features, _, _ = prefix_features([empty, battles[1]], cutoffs=CUTOFFS, registry=registry)
+    assert np.isnan(features[0]).all()
+    assert not np.isnan(features[1]).all()
+
+
+@pytest.mark.parametrize('name', sorted(STORE_EXTRACTORS))
+def test_store_cutoffs_stack_the_truncated_stores(store, registry, name):
+    function = STORE_EXTRACTORS[name]
+    kwargs = {'registry': registry} if 'registry' in inspect.signature(function).parameters else {}
+    if name == 'avg_stat_diff_per_turn':
+        kwargs['stats'] = ['hp', 'atk']
+    stacked = function(store, cutoffs=CUTOFFS, **kwargs)
+    expected = pd.concat([function(store.head(cutoff), **kwargs) for cutoff in CUTOFFS], ignore_index=True)
+    pd.testing.assert_frame_equal(stacked, expected, check_dtype=False, rtol=1e-12, atol=1e-12)
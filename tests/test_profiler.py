@@ -0,0 +1,34 @@
+# tests/test_profiler.py
+import json
+import pandas as pd
+import pytest
+from feature_engineering import generate_features, extractor_calls, ExtractorProfiler
+
+
+@pytest.mark.parametrize('fused', [False, True])
+def test_profiled_run_is_unchanged_and_records_every_call(battles, tmp_path, fused):
+    path = tmp_path / 'profile.jsonl'
+    profiler = ExtractorProfiler(jsonl_path=str(path), tags={'run': 'train'})
+    df = generate_features(battles, flag_test=False, fused=fused, profiler=profiler)
+    pd.testing.assert_frame_equal(df, generate_features(battles, flag_test=False), check_exact=True)
+
+    report = profiler.report()
+    calls = extractor_calls(flag_test=False)
+    assert list(report['step']) == ['pokedex_registry'] + [extractor.__name__ for extractor, _ in calls] + ['assemble']
+    assert (report['run'] == 'train').all()
+    assert (report['wall_s'] >= 0).all() and report['peak_mem_mb'].notna().all()
+    assert list(report['rows'].iloc[1:]) == [len(battles)] * (len(calls) + 1)
+    assert report['cols'].iloc[-1] == df.shape[1]
+    # kwargs of the extractor calls, without the shared registry
+    assert [json.loads(k) for k in report['kwargs'].iloc[1:-1]] == [kwargs for _, kwargs in calls]
+    assert [json.loads(line)['step'] for line in path.read_text().splitlines()] == list(report['step'])
+
+
+def test_report_sorting_and_reset():
+    profiler = ExtractorProfiler(trace_memory=False)
+    profiler.measure('fast', sum, [1, 2])
+    profiler.measure('slow', sorted, range(200000))
+    assert profiler.report(sort_by='wall_s')['step'].iloc[0] == 'slow'
+    assert profiler.report()['peak_mem_mb'].isna().all()
+    profiler.reset()
+    assert profiler.report().empty
@@ -0,0 +1,72 @@
+# tests/test_segments.py
+import numpy as np
+import pandas as pd
+import pytest
+from feature_engineering.extractors import avg_effectiveness2, avg_stab_multiplier, avg_stat_diff_per_turn, accuracy_avg
+from feature_engineering.segments import (TurnSegmenter, avg_effectiveness2_from_store, avg_stab_multiplier_from_store,
+                                          avg_stat_diff_per_turn_from_store, accuracy_avg_from_store)
+
+STATS = ['hp', 'atk', 'def', 'spa', 'spd', 'spe']
+
+PAIRS = {
+    'avg_effectiveness2': (lambda data, registry, **kw: avg_effectiveness2(data, difference=True, registry=registry, **kw),
+                           lambda store, registry, **kw: avg_effectiveness2_from_store(store, registry, difference=True, **kw)),
+    'avg_stab_multiplier': (lambda data, registry, **kw: avg_stab_multiplier(data, difference=True, registry=registry, **kw),
+                            lambda store, registry, **kw: avg_stab_multiplier_from_store(store, registry, difference=True, **kw)),
+    'avg_stat_diff_per_turn': (lambda data, registry, **kw: avg_stat_diff_per_turn(data, stats=STATS, registry=registry, **kw),
+                               lambda store, registry, **kw: avg_stat_diff_per_turn_from_store(store, registry, stats=STATS, **kw)),
+    'accuracy_avg': (lambda data, registry, **kw: accuracy_avg(data, **kw),
+                     lambda store, registry, **kw: accuracy_avg_from_store(store, **kw)),
+}
+
+
+@pytest.mark.parametrize('name', list(PAIRS))
+@pytest.mark.parametrize('divide_turns', [True, False])
+def test_exact_is_bit_identical(battles, registry, store, name, divide_turns):
+    extractor, from_store = PAIRS[name]
+    pd.testing.assert_frame_equal(from_store(store, registry, divide_turns=divide_turns, exact=True),
+                                  extractor(battles, registry, divide_turns=divide_turns), check_exact=True)
+
+
+@pytest.mark.parametrize('name', list(PAIRS))
+@pytest.mark.parametrize('divide_turns', [True, False])
+def test_prefix_sums_within_ulps(battles, registry, store, name, divide_turns):
+    extractor, from_store = PAIRS[name]
+    pd.testing.assert_frame_equal(from_store(store, registry, divide_turns=divide_turns),
+                                  extractor(battles, registry, divide_turns=divide_turns), check_exact=False, rtol=1e-12, atol=1e-12)
+
+
+def test_segment_sums_match_the_slices():
+    rng = np.random.default_rng(0)
+    n_turns = np.array([30, 12, 3, 0])
+    values = rng.random((len(n_turns), 30))
+    segments = {f'turns_{start}_{start + 5}': (start, start + 5) for start in range(26)}
+    exact = TurnSegmenter(n_turns, segments, exact=True).sums(values)
+    prefix = TurnSegmenter(n_turns, segments).sums(values)
+    for name, (start, end) in segments.items():
+        expected = [values[b, start:min(end, n)].sum() if start < n else 0.0 for b, n in enumerate(n_turns)]
+        np.testing.assert_allclose(exact[name], expected, rtol=1e-12, atol=1e-12)
+        np.testing.assert_allclose(prefix[name], expected, rtol=1e-12, atol=1e-12)
+
+
+@pytest.mark.parametrize('exact', [False, True])
+def test_cutoffs_stack_the_truncated_timelines(exact):
+    rng = np.random.default_rng(1)
+    n_turns = np.array([30, 12, 3, 0])
+    values = rng.random((len(n_turns), 30))
+    counts = rng.integers(0, 3, size=(len(n_turns), 30, 2))
+    cutoffs = (5, 10, 30)
+    stacked = TurnSegmenter(n_turns, exact=exact, cutoffs=cutoffs)
+    np.testing.assert_array_equal(stacked.rows, np.tile(np.arange(len(n_turns)), len(cutoffs)))
+    for k, cutoff in enumerate(cutoffs):
+        rows = slice(k * len(n_turns), (k + 1) * len(n_turns))
+        truncated = TurnSegmenter(np.minimum(n_turns, cutoff), exact=exact)
+        for name, total in truncated.sums(values).items():
+            np.testing.assert_allclose(stacked.sums(values)[name][rows], total, rtol=1e-12, atol=1e-12)
+        np.testing.assert_array_equal(stacked.totals(counts)[rows], truncated.totals(counts))
+
+
+def test_store_labels(store):
+    won = np.asarray(store.player_won)
+    assert store.labels() == [None if w < 0 else bool(w) for w in won]
+    assert store.labels(np.array([1, 0])) == store.labels()[1::-1]
@@ -0,0 +1,28 @@
+# tests/test_streaming.py
+import pandas as pd
+import pytest
+from feature_engineering import generate_features, generate_features_chunked, get_dict_from_json, iter_battle_chunks
+
+
+def test_get_dict_from_json(battles, battles_file):
+    assert get_dict_from_json(battles_file) == battles
+
+
+@pytest.mark.parametrize('chunk_size', [1, 30, 1000])
+def test_chunks_cover_the_file_in_order(battles, battles_file, chunk_size):
+    chunks = list(iter_battle_chunks(battles_file, chunk_size))
+    assert all(len(chunk) == chunk_size for chunk in chunks[:-1])
+    assert 0 < len(chunks[-1]) <= chunk_size
+    assert [battle for chunk in chunks for battle in chunk] == battles
+
+
+def test_chunk_size_must_be_positive(battles_file):
+    with pytest.raises(ValueError):
+        next(iter_battle_chunks(battles_file, 0))
+
+
+@pytest.mark.parametrize('tree', [False, True])
+@pytest.mark.parametrize('flag_test', [False, True])
+def test_chunked_features(battles, battles_file, registry, tree, flag_test):
+    pd.testing.assert_frame_equal(generate_features_chunked(battles_file, flag_test=flag_test, tree=tree, chunk_size=30),
+                                  generate_features(battles, flag_test=flag_test, tree=tree, registry=registry), check_exact=True)
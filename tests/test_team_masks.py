@@ -0,0 +1,80 @@
+# tests/test_team_masks.py
+import json
+import pandas as pd
+import pytest
+from benchmarks.synthetic import generate_battles
+from feature_engineering import (BattleTensorStore, PokedexRegistry, avg_stab_multiplier_from_store, avg_effectiveness2_from_store,
+                                 category_impact_score_from_store, avg_approx_damage_from_store, team_hp_advantage_flip_count_from_store)
+from feature_engineering.extractors import (tot_pok_used, last_turn_status_extractor, pokemon_encoding, pokemon_onehot_matrix,
+                                            team_hp_advantage_flip_count)
+from feature_engineering.team_masks import (tot_pok_used_from_store, last_turn_status_from_store, pokemon_encoding_from_store,
+                                            pokemon_onehot_matrix_from_store)
+
+
+def test_tot_pok_used(battles, store):
+    pd.testing.assert_frame_equal(tot_pok_used_from_store(store), tot_pok_used(battles), check_exact=True)
+
+
+def test_last_turn_status(battles, store):
+    pd.testing.assert_frame_equal(last_turn_status_from_store(store), last_turn_status_extractor(battles), check_exact=True)
+
+
+@pytest.mark.parametrize('sparse', [False, True])
+def test_pokemon_encoding_one_hot(battles, store, sparse):
+    pd.testing.assert_frame_equal(pokemon_encoding_from_store(store, sparse=sparse),
+                                  pokemon_encoding(battles, one_hot=True, sparse=sparse), check_exact=True)
+
+
+def test_onehot_matrix(battles, store):
+    assert (pokemon_onehot_matrix_from_store(store) != pokemon_onehot_matrix(battles)).nnz == 0
+
+
+def test_masks_follow_the_stored_turns(battles):
+    # the masks of a store cut at 10 turns are the ones of the first 10 turns
+    truncated = [{**battle, 'battle_timeline': battle['battle_timeline'][:10]} for battle in battles]
+    pd.testing.assert_frame_equal(tot_pok_used_from_store(BattleTensorStore.from_battles(battles, max_turns=10)),
+                                  tot_pok_used(truncated), check_exact=True)
+
+
+def wide_battles(n_battles: int) -> list[dict]:
+    """Synthetic battles whose P1 pokemon are renamed per battle: 6 new species each."""
+    battles = json.loads(json.dumps(list(generate_battles(n_battles))))
+    for i, battle in enumerate(battles):
+        names = {pokemon['name']: f'fake_{i}_{j}' for j, pokemon in enumerate(battle['p1_team_details'])}
+        for pokemon in battle['p1_team_details']:
+            pokemon['name'] = names[pokemon['name']]
+        for turn in battle['battle_timeline']:
+            state = turn['p1_pokemon_state']
+            state['name'] = names.get(state['name'], state['name'])
+    return battles
+
+
+def test_no_masks_past_64_species(store):
+    wide = BattleTensorStore.from_battles(wide_battles(12))
+    assert len(wide.vocab['species']) > 64
+    assert not wide.has_masks
+    with pytest.raises(ValueError):
+        wide.p1_seen_mask
+    with pytest.raises(ValueError):
+        store.head(10)['p1_seen_mask']
+
+
+def test_species_ids_past_127(tmp_path):
+    battles = wide_battles(25)
+    wide = BattleTensorStore.from_battles(battles)
+    assert len(wide.vocab['species']) > 150
+    assert wide.p1_pokemon.max() > 127
+    for b, battle in enumerate(battles):
+        assert list(wide.species_names(wide.p1_team[b])) == [pokemon['name'] for pokemon in battle['p1_team_details']]
+        assert wide.species_names(wide.p2_lead[b]) == battle['p2_lead_details']['name']
+        names = [turn['p1_pokemon_state']['name'] for turn in battle['battle_timeline']]
+        assert list(wide.species_names(wide.p1_pokemon[b, :len(names)])) == names
+
+    wide.save(str(tmp_path / 'wide.npz'))
+    assert (BattleTensorStore.load(str(tmp_path / 'wide.npz')).p1_pokemon == wide.p1_pokemon).all()
+
+    pd.testing.assert_frame_equal(team_hp_advantage_flip_count_from_store(wide), team_hp_advantage_flip_count(battles), check_exact=True)
+    registry = PokedexRegistry.from_data(battles)
+    for frame in (avg_stab_multiplier_from_store(wide, registry), avg_effectiveness2_from_store(wide, registry),
+                  category_impact_score_from_store(wide, registry), avg_approx_damage_from_store(wide, registry)):
+        assert len(frame) == len(battles)
@@ -0,0 +1,47 @@
+# tests/test_tensor_store.py
+import numpy as np
+import pytest
+from feature_engineering import BattleTensorStore
+from feature_engineering.constants import boost_types
+
+
+def test_turn_fields_match_the_timelines(battles, store):
+    assert len(store) == len(battles)
+    for b, battle in enumerate(battles):
+        timeline = battle['battle_timeline']
+        assert store.battle_id[b] == battle['battle_id']
+        assert store.player_won[b] == int(battle['player_won'])
+        assert store.n_turns[b] == len(timeline)
+        for t, turn in enumerate(timeline):
+            for player in ('p1', 'p2'):
+                state = turn[f'{player}_pokemon_state']
+                assert store.species_names(store[f'{player}_pokemon'][b, t]) == state['name']
+                assert store[f'{player}_hp_pct'][b, t] == state['hp_pct']
+                assert list(store[f'{player}_boosts'][b, t]) == [state['boosts'][k] for k in boost_types]
+                assert store.vocab['status'][store[f'{player}_status'][b, t]] == state['status']
+                move = turn[f'{player}_move_details']
+                assert store[f'{player}_move_base_power'][b, t] == (move['base_power'] if move else 0)
+        # padding after the end of the timeline
+        assert np.isnan(store.p1_hp_pct[b, len(timeline):]).all()
+        assert (store.p1_pokemon[b, len(timeline):] == -1).all()
+
+
+@pytest.mark.parametrize('file_name', ['store.npz', 'store'])
+def test_save_and_load_round_trip(store, tmp_path, file_name):
+    path = str(tmp_path / file_name)
+    store.save(path)
+    loaded = BattleTensorStore.load(path)
+    assert loaded.vocab == store.vocab
+    assert set(loaded.arrays) == set(store.arrays)
+    for name, array in store.arrays.items():
+        np.testing.assert_array_equal(loaded[name], array)
+
+
+def test_head_is_the_store_of_the_truncated_timelines(battles, store):
+    truncated = [{**battle, 'battle_timeline': battle['battle_timeline'][:10]} for battle in battles]
+    expected = BattleTensorStore.from_battles(truncated, max_turns=10)
+    head = store.head(10)
+    assert not head.has_masks
+    for name, array in expected.arrays.items():
+        if not name.endswith('_mask'):
+            np.testing.assert_array_equal(head[name], array)
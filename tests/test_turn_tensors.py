@@ -0,0 +1,17 @@
+# tests/test_turn_tensors.py
+import pandas as pd
+import pytest
+from feature_engineering.extractors import avg_boost_diff_per_turn, granular_turn_counts
+from feature_engineering.turn_tensors import avg_boost_diff_per_turn_from_store, granular_turn_counts_from_store
+
+
+@pytest.mark.parametrize('test', [False, True])
+def test_avg_boost_diff_per_turn(battles, store, test):
+    pd.testing.assert_frame_equal(avg_boost_diff_per_turn_from_store(store, test=test),
+                                  avg_boost_diff_per_turn(battles, test=test), check_exact=True)
+
+
+@pytest.mark.parametrize('difference', [False, True])
+def test_granular_turn_counts(battles, store, difference):
+    pd.testing.assert_frame_equal(granular_turn_counts_from_store(store, difference=difference),
+                                  granular_turn_counts(battles, difference=difference), check_exact=True)
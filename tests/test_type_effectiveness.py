@@ -0,0 +1,23 @@
+# tests/test_type_effectiveness.py
+import itertools
+import numpy as np
+import pytest
+from feature_engineering.constants import types
+from feature_engineering.utils import effectiveness, effectiveness_batch, type_codes, def_type_codes
+
+
+def test_batch_matches_the_scalar_kernel():
+    defenders = [[t, 'notype'] for t in types] + [list(pair) for pair in itertools.combinations(types, 2)]
+    attacking, defending = zip(*itertools.product(types, defenders))
+    expected = np.array([effectiveness(a, d) for a, d in zip(attacking, defending)])
+    np.testing.assert_array_equal(effectiveness_batch(type_codes(attacking), def_type_codes(defending)), expected)
+
+
+def test_codes_accept_any_case_and_missing_types():
+    np.testing.assert_array_equal(type_codes([types[0].upper(), types[1]]), [0, 1])
+    np.testing.assert_array_equal(def_type_codes([{types[0]}, [types[0], 'notype'], None])[:, 0], [0, 0, type_codes(['notype'])[0]])
+
+
+def test_unknown_type_raises():
+    with pytest.raises(KeyError):
+        type_codes(['plasma'])
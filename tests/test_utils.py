@@ -0,0 +1,96 @@
+# tests/test_utils.py
+import os
+import numpy as np
+import pytest
+from sklearn.linear_model import LogisticRegression
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+from sklearn.model_selection import StratifiedKFold, cross_val_score, HalvingGridSearchCV
+from Models import evaluate_model, perform_grid_search, create_model_pipeline, create_model_pipeline_PCA
+
+FOLD_COLUMNS = ['fold', 'accuracy', 'fit_s', 'score_s', 'peak_mem_mb', 'n_train', 'n_test', 'resumed']
+
+
+@pytest.mark.parametrize('n_jobs, backend', [(1, 'loky'), (2, 'loky'), (2, 'threading')])
+def test_evaluate_model_matches_cross_val_score(model_data, n_jobs, backend):
+    X, y = model_data[0]['main'], model_data[1]
+    pipeline = create_model_pipeline()
+    expected = cross_val_score(pipeline, X, y, cv=StratifiedKFold(n_splits=5, shuffle=True, random_state=0))
+    mean, std, folds = evaluate_model(pipeline, X, y, n_jobs=n_jobs, backend=backend, return_folds=True)
+    assert list(folds.columns) == FOLD_COLUMNS
+    np.testing.assert_array_equal(folds['accuracy'], expected)
+    assert (mean, std) == (np.mean(expected), np.std(expected))
+    assert folds['peak_mem_mb'].isna().all()
+
+
+def test_checkpoints_resume_the_missing_folds(model_data, tmp_path):
+    X, y = model_data[0]['main'], model_data[1]
+    pipeline = create_model_pipeline()
+    first = evaluate_model(pipeline, X, y, n_jobs=2, checkpoint_dir=str(tmp_path), return_folds=True)
+    assert not first[2]['resumed'].any()
+
+    second = evaluate_model(pipeline, X, y, n_jobs=2, checkpoint_dir=str(tmp_path), return_folds=True)
+    assert second[2]['resumed'].all()
+    assert second[:2] == first[:2]
+
+    # a run that died after 3 folds: only the other 2 are computed
+    folder = os.path.join(str(tmp_path), os.listdir(str(tmp_path))[0])
+    for fold in (1, 4):
+        os.remove(os.path.join(folder, f'fold_{fold}.json'))
+    resumed = evaluate_model(pipeline, X, y, checkpoint_dir=str(tmp_path), return_folds=True)
+    assert resumed[2]['resumed'].tolist() == [True, False, True, True, False]
+    assert resumed[:2] == first[:2]
+
+    # other parameters: other checkpoints
+    other = evaluate_model(create_model_pipeline(c_value=0.01), X, y, checkpoint_dir=str(tmp_path), return_folds=True)
+    assert not other[2]['resumed'].any()
+    assert len(os.listdir(str(tmp_path))) == 2
+
+
+def test_trace_memory(model_data):
+    X, y = model_data[0]['main'], model_data[1]
+    _, _, folds = evaluate_model(LogisticRegression(), X, y, cv_splits=3, trace_memory=True, return_folds=True)
+    assert (folds['peak_mem_mb'] > 0).all()
+
+
+GRID = {'pca__n_components': [2, 3, 4, 5], 'model__C': [0.001, 0.01, 0.1, 1.0]}
+
+
+@pytest.fixture(scope='module')
+def grid_report(model_data):
+    X, y = model_data[0]['main'], model_data[1]
+    return perform_grid_search(create_model_pipeline_PCA(), GRID, X, y, search='grid', return_report=True)[1]
+
+
+def test_prune_finds_the_grid_best_with_fewer_fits(model_data, grid_report):
+    X, y = model_data[0]['main'], model_data[1]
+    best, report = perform_grid_search(create_model_pipeline_PCA(), GRID, X, y, search='prune', prune_after=2,
+                                       prune_margin=0.02, return_report=True)
+    assert grid_report['n_fits'] == 16 * 5
+    assert report['n_fits'] < grid_report['n_fits']
+    assert report['best_params'] == grid_report['best_params']
+    assert report['best_score'] == pytest.approx(grid_report['best_score'])
+    assert best.get_params()['pca__n_components'] == report['best_params']['pca__n_components']
+
+
+def test_halving_keeps_the_best_of_the_last_round(model_data, monkeypatch):
+    X, y = model_data[0]['main'], model_data[1]
+    searches = []
+    fit = HalvingGridSearchCV.fit
+    monkeypatch.setattr(HalvingGridSearchCV, 'fit', lambda self, *args: searches.append(self) or fit(self, *args))
+    best, report = perform_grid_search(create_model_pipeline_PCA(), GRID, X, y, search='halving', return_report=True)
+
+    results = searches[0].cv_results_
+    assert report['n_fits'] == len(results['params']) * 5
+    assert report['best_params'] == searches[0].best_params_
+    assert report['best_score'] == results['mean_test_score'][searches[0].best_index_]
+    assert report['fit_cost'] == pytest.approx(np.sum(results['n_resources']) * 5 / len(y))
+    assert best.get_params()['model__C'] == report['best_params']['model__C']
+
+
+def test_invalid_searches_raise(model_data):
+    X, y = model_data[0]['main'], model_data[1]
+    for prune_after in (0, 5):
+        with pytest.raises(ValueError, match='prune_after'):
+            perform_grid_search(create_model_pipeline_PCA(), GRID, X, y, search='prune', prune_after=prune_after)
+    with pytest.raises(ValueError, match='search'):
+        perform_grid_search(create_model_pipeline_PCA(), GRID, X, y, search='random')